@@ -76,23 +76,20 @@ class AuthSimples {
         this.showLoading('Validando seu token...');
 
         try {
-            // Buscar no arquivo tokens.json (seu sistema Python)
-            const response = await fetch('tokens.json');
+            // Buscar só o shard do token (exportado pelo sistema Python em tokens/<sha256>.json)
+            const tokenHash = await this.hashToken(token);
+            const response = await fetch(`tokens/${tokenHash}.json`, { cache: 'no-cache' });
+            
+            if (response.status === 404) {
+                console.log('Token não encontrado:', token);
+                throw new Error('Token não encontrado');
+            }
             
             if (!response.ok) {
                 throw new Error('Erro ao carregar arquivo de tokens');
             }
             
-            const tokensData = await response.json();
-            
-            // Procurar o token no objeto JSON (busca exata)
-            const clientData = tokensData[token];
-
-            if (!clientData) {
-                console.log('Token não encontrado:', token);
-                console.log('Tokens disponíveis:', Object.keys(tokensData));
-                throw new Error('Token não encontrado');
-            }
+            const clientData = await response.json();
 
             // Verificar se token está ativo
             if (!clientData.ativo) {
@@ -111,20 +108,19 @@ class AuthSimples {
             }
 
             // Converter dados para formato do sistema
-            const pastasPermitidas = Array.isArray(clientData.pastas_permitidas) && clientData.pastas_permitidas.length
+            const pastasPermitidas = Array.isArray(clientData.pastas_permitidas)
                 ? clientData.pastas_permitidas
-                : clientData.pasta ? [clientData.pasta] : [];
+                : [];
 
+            // O shard não traz nome nem telefone do cliente
             const clienteFormatado = {
                 token: token,
-                cliente: clientData.cliente,
-                categoria: clientData.categoria,
-                pasta: pastasPermitidas[0] || clientData.pasta || '',
+                cliente: '',
+                pasta: pastasPermitidas[0] || '',
                 pastasPermitidas,
                 expira_em: clientData.expira_em,
-                criado_em: clientData.criado_em,
                 downloads_permitidos: clientData.downloads_permitidos,
-                fotos_baixadas: clientData.fotos_baixadas || []
+                fotos_baixadas: []
             };
 
             console.log('Token válido para cliente:', clienteFormatado);
@@ -138,6 +134,15 @@ class AuthSimples {
         }
     }
 
+    // ===== HASH DO TOKEN (nome do shard) =====
+    async hashToken(token) {
+        const bytes = new TextEncoder().encode(token);
+        const digest = await crypto.subtle.digest('SHA-256', bytes);
+        return Array.from(new Uint8Array(digest))
+            .map((byte) => byte.toString(16).padStart(2, '0'))
+            .join('');
+    }
+
     // ===== AUTENTICAÇÃO BEM-SUCEDIDA =====
     async handleSuccessfulAuth(token, clientData) {
         this.tokenValido = token;
@@ -159,7 +164,8 @@ class AuthSimples {
 
         // Notificar sucesso com informações do token
         const diasRestantes = Math.ceil((new Date(clientData.expira_em) - new Date()) / (1000 * 60 * 60 * 24));
-        this.showNotification(`Bem-vindo ${clientData.cliente}! Token válido por ${diasRestantes} dias.`, 'success');
+        const saudacao = clientData.cliente ? `Bem-vindo ${clientData.cliente}!` : 'Bem-vindo!';
+        this.showNotification(`${saudacao} Token válido por ${diasRestantes} dias.`, 'success');
     }
 
     // ===== REGISTRAR ACESSO =====
@@ -15,6 +15,8 @@ class GaleriaSimples {
         this.currentModalPhotos = [];
         this.photoIndexMap = new Map();
         this.currentModalLoadToken = 0;
+        this.albumTotals = new Map();
+        this.photoLoadToken = 0;
         
         this.init();
     }
@@ -107,9 +109,23 @@ class GaleriaSimples {
             }
 
             let fotosCliente = [];
+            const paginasPendentes = [];
+            const loadToken = ++this.photoLoadToken;
+            this.albumTotals = new Map();
 
             for (const pasta of pastasPermitidas) {
                 try {
+                    // Álbum compilado (fotos/<pasta>/indice.json): só a primeira página entra na primeira tela
+                    const compilado = await this.loadCompiledAlbum(pasta);
+                    if (compilado) {
+                        fotosCliente = fotosCliente.concat(this.formatAlbumPhotos(pasta, compilado.fotos, 0));
+                        this.albumTotals.set(compilado.indice.album || this.DEFAULT_ALBUM_NAME, compilado.indice.total);
+                        compilado.indice.paginas.slice(1).forEach((pagina, offset) => {
+                            paginasPendentes.push({ pasta, indice: compilado.indice, pageIndex: offset + 1 });
+                        });
+                        continue;
+                    }
+
                     const response = await fetch(`fotos/${pasta}.json`);
                     if (!response.ok) {
                         console.warn(`Arquivo fotos/${pasta}.json não encontrado.`, response.status);
@@ -117,24 +133,7 @@ class GaleriaSimples {
                     }
 
                     const fotosData = await response.json();
-                    const fotosFormatadas = fotosData.map((foto, index) => {
-                        const previewUrl = foto.preview || foto.thumbnail || foto.url || '';
-                        const thumbnailUrl = foto.thumbnail || foto.preview || foto.url || '';
-
-                        return {
-                        id: `${pasta}_${index}`,
-                        name: foto.nome || `foto_${index + 1}.jpg`,
-                        url: foto.url,
-                        thumbnailUrl,
-                        previewUrl,
-                        album: foto.album || this.DEFAULT_ALBUM_NAME,
-                        description: foto.descricao || '',
-                        dateFormatted: foto.data || new Date().toLocaleDateString('pt-BR'),
-                        pasta
-                    };
-                    });
-
-                    fotosCliente = fotosCliente.concat(fotosFormatadas);
+                    fotosCliente = fotosCliente.concat(this.formatAlbumPhotos(pasta, fotosData, 0));
                 } catch (error) {
                     console.warn(`Erro ao carregar fotos do álbum ${pasta}:`, error);
                 }
@@ -191,6 +190,11 @@ class GaleriaSimples {
             setTimeout(() => {
                 this.applyWatermarkIfNeeded();
             }, 500);
+
+            // Demais páginas dos álbuns compilados chegam depois da primeira tela
+            if (paginasPendentes.length) {
+                this.loadRemainingPages(paginasPendentes, loadToken);
+            }
             
         } catch (error) {
             console.error('Erro ao carregar fotos:', error);
@@ -200,6 +204,93 @@ class GaleriaSimples {
         }
     }
 
+    formatAlbumPhotos(pasta, fotosData, offset) {
+        return fotosData.map((foto, position) => {
+            const index = offset + position;
+            const previewUrl = foto.preview || foto.thumbnail || foto.url || '';
+            const thumbnailUrl = foto.thumbnail || foto.preview || foto.url || '';
+
+            return {
+                id: `${pasta}_${index}`,
+                name: foto.nome || `foto_${index + 1}.jpg`,
+                url: foto.url,
+                thumbnailUrl,
+                previewUrl,
+                // Versão limpa para download quando as demais já vêm com marca d'água
+                downloadUrl: foto.download || '',
+                watermarked: Boolean(foto.marca),
+                album: foto.album || this.DEFAULT_ALBUM_NAME,
+                description: foto.descricao || '',
+                dateFormatted: foto.data || new Date().toLocaleDateString('pt-BR'),
+                pasta
+            };
+        });
+    }
+
+    // ===== ÁLBUNS COMPILADOS (Sistema_Token_GLRETRATOS/compilar_albuns.py) =====
+    async loadCompiledAlbum(pasta) {
+        let response;
+        try {
+            response = await fetch(`fotos/${pasta}/indice.json`);
+        } catch (error) {
+            return null;
+        }
+        if (!response.ok) return null;
+
+        const indice = await response.json();
+        const fotos = indice.paginas.length ? await this.fetchCompiledPage(pasta, indice, 0) : [];
+        return { indice, fotos };
+    }
+
+    async fetchCompiledPage(pasta, indice, pageIndex) {
+        const response = await fetch(`fotos/${pasta}/${indice.paginas[pageIndex]}`);
+        if (!response.ok) {
+            throw new Error(`Página ${indice.paginas[pageIndex]} do álbum ${pasta} indisponível`);
+        }
+        const itens = await response.json();
+        return itens.map((item) => this.expandCompiledPhoto(indice, item));
+    }
+
+    expandCompiledPhoto(indice, item) {
+        const modelos = indice.modelos || {};
+        const fromTemplate = (campo, chave) => {
+            if (item[chave]) return item[chave];
+            return item.i && modelos[campo] ? modelos[campo].replace('{id}', item.i) : undefined;
+        };
+
+        return {
+            nome: item.n,
+            album: item.a ?? indice.album,
+            data: item.dt ?? indice.data,
+            descricao: item.d ?? indice.descricao,
+            url: fromTemplate('url', 'u'),
+            thumbnail: fromTemplate('thumbnail', 't'),
+            preview: fromTemplate('preview', 'p'),
+            ...(item.x || {})
+        };
+    }
+
+    async loadRemainingPages(paginasPendentes, loadToken) {
+        for (const { pasta, indice, pageIndex } of paginasPendentes) {
+            try {
+                const fotos = await this.fetchCompiledPage(pasta, indice, pageIndex);
+                // Outro login/carregamento começou enquanto a página era baixada
+                if (loadToken !== this.photoLoadToken) return;
+
+                const offset = pageIndex * indice.tamanho_pagina;
+                this.currentPhotos = this.currentPhotos.concat(this.formatAlbumPhotos(pasta, fotos, offset));
+            } catch (error) {
+                console.warn(`Erro ao carregar página do álbum ${pasta}:`, error);
+            }
+        }
+
+        if (loadToken !== this.photoLoadToken) return;
+        this.buildAlbumIndexes();
+        this.renderAlbumFilters();
+        this.renderGallery();
+        this.updateStats();
+    }
+
     // ===== RENDERIZAR GALERIA =====
     renderGallery() {
         const galleryContainer = document.getElementById('galleryGrid');
@@ -460,6 +551,11 @@ class GaleriaSimples {
             }
         });
 
+        // Álbuns compilados ainda carregando páginas já exibem o total do índice
+        albumMap.forEach((summary, albumName) => {
+            summary.count = Math.max(summary.count, this.albumTotals.get(albumName) || 0);
+        });
+
         this.albumSummaries = Array.from(albumMap.values()).sort((a, b) =>
             a.name.localeCompare(b.name, 'pt-BR', { sensitivity: 'base' })
         );
@@ -611,6 +707,7 @@ class GaleriaSimples {
     }
 
     getDownloadSource(photo = {}) {
+        if (photo.downloadUrl) return photo.downloadUrl;
         const sources = this.getDriveHighResSources(photo);
         if (photo.previewUrl) sources.push(photo.previewUrl);
         if (photo.thumbnailUrl) sources.push(photo.thumbnailUrl);
@@ -653,8 +750,8 @@ class GaleriaSimples {
                     </div>
                 </div>
                 
-                <!-- Marca d'água para visitantes -->
-                <div class="watermark-overlay"></div>
+                <!-- Marca d'água para visitantes (fotos pré-renderizadas já vêm marcadas) -->
+                ${photo.watermarked ? '' : '<div class="watermark-overlay"></div>'}
             </div>
             
             <div class="photo-info">
@@ -0,0 +1,154 @@
+import argparse
+import base64
+import hashlib
+import math
+import os
+import secrets
+import sys
+import time
+
+BITS_PADRAO = 72  # 12 caracteres
+BITS_MINIMO = 48
+BITS_MAXIMO = 144  # 24 caracteres, o maxlength do campo de login do galeria.html
+LIMITE_CONJUNTO = 1_000_000  # acima disso as chaves existentes vão para um filtro de Bloom
+
+
+def bits_configurados():
+    """Entropia dos tokens novos: GLR_TOKEN_BITS (entre 48 e 144) ou o padrão de 72 bits"""
+    try:
+        return limitar_bits(int(os.environ.get('GLR_TOKEN_BITS', BITS_PADRAO)))
+    except ValueError:
+        return BITS_PADRAO
+
+
+def limitar_bits(bits):
+    """Mantém a entropia entre BITS_MINIMO e BITS_MAXIMO"""
+    return min(BITS_MAXIMO, max(BITS_MINIMO, bits))
+
+
+class FiltroBloom:
+    """Conjunto aproximado: sem falsos negativos, falsos positivos na ``taxa_erro``.
+
+    Serve para conferir colisões em stores muito grandes sem guardar cada
+    chave; um falso positivo só faz o alocador sortear outro token.
+    """
+
+    def __init__(self, capacidade, taxa_erro=0.001):
+        capacidade = max(1, capacidade)
+        self.tamanho = max(8, int(-capacidade * math.log(taxa_erro) / math.log(2) ** 2))
+        self.funcoes = min(16, max(1, round(self.tamanho / capacidade * math.log(2))))
+        self.bits = bytearray((self.tamanho + 7) // 8)
+        self.quantidade = 0
+
+    def _posicoes(self, chave):
+        # Um único blake2b fornece as k posições (32 bits cada)
+        resumo = hashlib.blake2b(chave.encode('utf-8'), digest_size=4 * self.funcoes).digest()
+        tamanho = self.tamanho
+        return [valor % tamanho for valor in memoryview(resumo).cast('I')]
+
+    def add(self, chave):
+        for posicao in self._posicoes(chave):
+            self.bits[posicao >> 3] |= 1 << (posicao & 7)
+        self.quantidade += 1
+
+    def __contains__(self, chave):
+        bits = self.bits
+        return all(bits[posicao >> 3] & (1 << (posicao & 7)) for posicao in self._posicoes(chave))
+
+    def __len__(self):
+        return self.quantidade
+
+
+class AlocadorTokens:
+    """Gera IDs de token curtos, URL-safe e sem colisão com os existentes.
+
+    Os IDs usam o alfabeto base64url (``A-Z a-z 0-9 - _``), 6 bits por
+    caractere, tirados de ``secrets``; ``bits`` define o tamanho. As chaves
+    já usadas (vivas ou arquivadas) ficam num ``set`` (ou num ``FiltroBloom`` acima de
+    ``limite_conjunto``) e cada ID entregue é reservado na hora, então
+    nem dois pedidos seguidos nem um lote grande repetem um token.
+    ``proximo()`` consome uma fila pré-gerada de ``tamanho_lote`` IDs.
+    """
+
+    def __init__(self, existentes=(), bits=None, tamanho_lote=256, limite_conjunto=LIMITE_CONJUNTO):
+        self.bits = limitar_bits(bits) if bits else bits_configurados()
+        self.comprimento = math.ceil(self.bits / 6)
+        # base64 sem padding: cada 3 bytes viram 4 caracteres, todos com 6 bits uniformes
+        self._bytes = math.ceil(self.comprimento / 4) * 3
+        self.tamanho_lote = tamanho_lote
+        self.limite_conjunto = limite_conjunto
+        # As chaves são percorridas uma a uma, sem montar uma lista com todas
+        quantidade = len(existentes) if hasattr(existentes, '__len__') else 0
+        if quantidade > limite_conjunto:
+            self.usados = FiltroBloom(max(quantidade * 2, limite_conjunto))
+        else:
+            self.usados = set()
+        for chave in existentes:
+            self.reservar(chave)
+        self._fila = []
+
+    def __contains__(self, token):
+        return token in self.usados
+
+    def reservar(self, token):
+        """Marca um token criado por fora do alocador (ou arquivado) como usado"""
+        self.usados.add(token)
+        if isinstance(self.usados, set) and len(self.usados) > self.limite_conjunto:
+            # Chaves vindas de um iterador sem tamanho conhecido: passa para o filtro
+            filtro = FiltroBloom(len(self.usados) * 2)
+            for chave in self.usados:
+                filtro.add(chave)
+            self.usados = filtro
+
+    def _sortear(self, quantidade):
+        passo = self._bytes // 3 * 4
+        texto = base64.urlsafe_b64encode(secrets.token_bytes(self._bytes * quantidade)).decode('ascii')
+        return [texto[i:i + self.comprimento] for i in range(0, len(texto), passo)]
+
+    def gerar(self, quantidade):
+        """Lista de ``quantidade`` tokens novos, já reservados"""
+        usados = self.usados
+        novos = []
+        while len(novos) < quantidade:
+            for token in self._sortear(quantidade - len(novos)):
+                # Sem '-' no início: o token não é confundido com uma opção na linha de comando
+                if token[0] != '-' and token not in usados:
+                    usados.add(token)
+                    novos.append(token)
+        return novos
+
+    def proximo(self):
+        if not self._fila:
+            self._fila = self.gerar(self.tamanho_lote)
+            self._fila.reverse()
+        return self._fila.pop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede a geração de IDs de token em massa")
+    parser.add_argument('-n', '--quantidade', type=int, default=1_000_000)
+    parser.add_argument('--bits', type=int, default=None, help=f"entropia por token (padrão: {BITS_PADRAO})")
+    parser.add_argument('--existentes', type=int, default=0,
+                        help="chaves já usadas simuladas (acima de 1000000 usa o filtro de Bloom)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    alocador = AlocadorTokens(AlocadorTokens(bits=args.bits).gerar(args.existentes), bits=args.bits)
+    preparo = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    tokens = alocador.gerar(args.quantidade)
+    duracao = time.perf_counter() - inicio
+
+    estrutura = 'filtro de Bloom' if isinstance(alocador.usados, FiltroBloom) else 'set'
+    print(f"🔑 {len(tokens)} token(s) de {alocador.comprimento} caracteres ({alocador.bits} bits), ex: {tokens[0]}")
+    print(f"📦 {args.existentes} chave(s) existente(s) em {estrutura}, carregadas em {preparo:.2f}s")
+    print(f"⏱️  {duracao:.2f}s — {len(tokens) / duracao:,.0f} tokens/s")
+    if len(set(tokens)) != len(tokens):
+        print("❌ Tokens repetidos no lote!")
+        return 1
+    print("✅ Nenhum token repetido.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
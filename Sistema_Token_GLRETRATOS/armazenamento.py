@@ -0,0 +1,622 @@
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Listas que ficavam dentro de cada token e cresciam a cada acesso/download
+CAMPOS_HISTORICO = ('acessos', 'fotos_baixadas')
+
+
+class ConflitoEscrita(Exception):
+    """Outra escrita (de outro processo) tornou a operação inválida"""
+
+
+class TravaArquivo:
+    """Trava consultiva entre processos sobre ``caminho`` (flock/msvcrt).
+
+    É reentrante dentro do processo: blocos aninhados que usam o mesmo
+    arquivo de trava compartilham a trava já obtida.
+    """
+
+    _abertas = {}  # caminho absoluto -> [arquivo, profundidade]
+
+    def __init__(self, caminho):
+        self.caminho = os.path.abspath(caminho)
+
+    def __enter__(self):
+        aberta = self._abertas.get(self.caminho)
+        if aberta is not None:
+            aberta[1] += 1
+            return self
+        arquivo = open(self.caminho, 'a+')
+        try:
+            if fcntl is not None:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+        except OSError:
+            arquivo.close()
+            raise
+        self._abertas[self.caminho] = [arquivo, 1]
+        return self
+
+    def __exit__(self, *excecao):
+        aberta = self._abertas[self.caminho]
+        aberta[1] -= 1
+        if aberta[1]:
+            return
+        del self._abertas[self.caminho]
+        arquivo = aberta[0]
+        try:
+            if fcntl is not None:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            arquivo.close()
+
+
+def arquivo_trava(arquivo_tokens):
+    return f"{os.path.splitext(arquivo_tokens)[0]}.lock"
+
+
+def separar_historico(dados):
+    """Troca as listas de histórico de um token por contadores.
+
+    Retorna (registro compacto, acessos, downloads); registros já no
+    formato novo voltam inalterados, com listas vazias.
+    """
+    if not any(campo in dados for campo in CAMPOS_HISTORICO):
+        return dados, [], []
+    acessos = dados.get('acessos') or []
+    downloads = dados.get('fotos_baixadas') or []
+    registro = {k: v for k, v in dados.items() if k not in CAMPOS_HISTORICO}
+    registro['total_acessos'] = registro.get('total_acessos', 0) + len(acessos)
+    registro['total_downloads'] = registro.get('total_downloads', 0) + len(downloads)
+    registro['ultimo_acesso'] = max([*acessos, registro.get('ultimo_acesso') or ''], default='') or None
+    return registro, acessos, downloads
+
+
+def _registro_evento(op, token, em=None, seq=None):
+    registro = {'op': op, 'token': token, 'em': em or datetime.now().isoformat()}
+    if seq is not None:
+        registro['seq'] = seq
+    return registro
+
+
+class JournalTokens:
+    """Snapshot (tokens.json) + journal append-only de alterações.
+
+    Cada criação, desativação, acesso ou download vira uma linha no journal; o estado
+    atual é o snapshot com o journal reaplicado por cima. Quando o journal
+    passa do limite, ``compactar`` grava um novo snapshot e zera o journal.
+    Anexar e compactar acontecem sob a trava ``tokens.lock``, de modo que
+    nenhum registro de outro processo se perde entre a leitura e o
+    truncamento do journal.
+    """
+
+    def __init__(self, arquivo_tokens='tokens.json', arquivo_journal=None,
+                 limite_journal=512 * 1024):
+        self.arquivo_tokens = arquivo_tokens
+        self.arquivo_journal = arquivo_journal or f"{os.path.splitext(arquivo_tokens)[0]}.journal"
+        self.limite_journal = limite_journal
+        self.trava = TravaArquivo(arquivo_trava(arquivo_tokens))
+
+    # ----- leitura -----
+
+    def ler_snapshot(self, tolerante=True):
+        """Lê o snapshot; com ``tolerante`` um arquivo corrompido vira {}"""
+        if not os.path.exists(self.arquivo_tokens):
+            return {}
+        with open(self.arquivo_tokens, 'r', encoding='utf-8') as f:
+            conteudo = f.read().strip()
+        if not conteudo:
+            return {}
+        try:
+            return json.loads(conteudo)
+        except json.JSONDecodeError:
+            if not tolerante:
+                raise
+            print("⚠️  tokens.json está vazio ou corrompido. Será recriado.")
+            return {}
+
+    def ler_journal(self):
+        """Itera os registros do journal, ignorando uma última linha truncada"""
+        if not os.path.exists(self.arquivo_journal):
+            return
+        with open(self.arquivo_journal, 'r', encoding='utf-8') as f:
+            for linha in f:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError:
+                    # Escrita interrompida no meio: o registro é descartado
+                    continue
+
+    def carregar(self, tolerante=True):
+        """Reconstrói o dicionário de tokens (snapshot + journal)"""
+        tokens = self.ler_snapshot(tolerante)
+        for registro in self.ler_journal():
+            self.aplicar(tokens, registro)
+        return tokens
+
+    @staticmethod
+    def aplicar(tokens, registro):
+        """Aplica um registro do journal sobre o dicionário de tokens"""
+        op = registro.get('op')
+        token = registro.get('token')
+
+        if op == 'criar':
+            tokens[token] = registro['dados']
+        elif op == 'criar_lote':
+            tokens.update(registro['tokens'])
+        elif op == 'desativar':
+            dados = tokens.get(token)
+            if dados is not None:
+                dados['ativo'] = False
+                dados['desativado_em'] = registro['em']
+        elif op in ('acesso', 'download'):
+            dados = tokens.get(token)
+            if dados is None:
+                return
+            # Reaplicar o journal após uma compactação interrompida não conta o evento de novo:
+            # cada registro leva o próximo número de sequência do token, e o snapshot guarda o último
+            if 'seq' in registro:
+                if registro['seq'] <= dados.get('seq', 0):
+                    return
+                dados['seq'] = registro['seq']
+            campo_total, campo_ultimo = (('total_acessos', 'ultimo_acesso') if op == 'acesso'
+                                         else ('total_downloads', 'ultimo_download'))
+            dados[campo_total] = dados.get(campo_total, 0) + 1
+            # Um evento com horário anterior (relógio ajustado) conta, mas não volta o "último"
+            dados[campo_ultimo] = max(dados.get(campo_ultimo) or '', registro['em'])
+
+    # ----- escrita -----
+
+    def anexar(self, registro):
+        """Acrescenta um registro ao journal e compacta se passou do limite"""
+        linha = json.dumps(registro, ensure_ascii=False, separators=(',', ':'))
+        with self.trava:
+            with open(self.arquivo_journal, 'a', encoding='utf-8') as f:
+                f.write(linha + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+            if self.tamanho_journal() > self.limite_journal:
+                try:
+                    self.compactar()
+                except (json.JSONDecodeError, OSError) as e:
+                    # O registro já está seguro no journal; a compactação fica para depois
+                    print(f"⚠️  Compactação adiada: {e}")
+
+    def registrar_criacao(self, token, dados):
+        self.anexar({'op': 'criar', 'token': token, 'dados': dados})
+
+    def registrar_lote(self, novos):
+        # Uma única linha: se a escrita for interrompida, o lote inteiro é descartado
+        self.anexar({'op': 'criar_lote', 'tokens': novos})
+
+    def registrar_desativacao(self, token, em=None):
+        self.anexar({'op': 'desativar', 'token': token,
+                     'em': em or datetime.now().isoformat()})
+
+    def registrar_acesso(self, token, em=None, seq=None):
+        self.anexar(_registro_evento('acesso', token, em, seq))
+
+    def registrar_download(self, token, em=None, seq=None):
+        self.anexar(_registro_evento('download', token, em, seq))
+
+    def tamanho_journal(self):
+        try:
+            return os.path.getsize(self.arquivo_journal)
+        except OSError:
+            return 0
+
+    def compactar(self):
+        """Grava o estado atual como novo snapshot e zera o journal"""
+        with self.trava:
+            if self.tamanho_journal() == 0:
+                return False
+
+            # Snapshot corrompido não é sobrescrito: isso apagaria todos os tokens
+            tokens = self.carregar(tolerante=False)
+
+            escrever_json(self.arquivo_tokens, tokens)
+
+            with open(self.arquivo_journal, 'w', encoding='utf-8'):
+                pass
+            return True
+
+
+def estatisticas_categoria(tokens):
+    """Totais por categoria de um dicionário de tokens: total, ativos, downloads e acessos"""
+    stats = {}
+    for dados in tokens.values():
+        categoria = stats.setdefault(dados['categoria'], {
+            'total': 0, 'ativos': 0, 'downloads': 0, 'acessos': 0
+        })
+        categoria['total'] += 1
+        if dados['ativo']:
+            categoria['ativos'] += 1
+        categoria['downloads'] += dados.get('total_downloads', 0)
+        categoria['acessos'] += dados.get('total_acessos', 0)
+    return stats
+
+
+class TokenStore:
+    """Interface comum dos backends de tokens.
+
+    Os registros seguem o formato do tokens.json; ``listar_ativos``,
+    ``expirando`` e ``estatisticas_categoria`` podem ser resolvidos pelo
+    próprio backend sem carregar todos os tokens.
+    """
+
+    nome = 'base'
+    trava = None  # TravaArquivo que serializa as escritas entre processos
+
+    def carregar(self):
+        raise NotImplementedError
+
+    def obter(self, token):
+        return self.carregar().get(token)
+
+    def criar(self, token, dados):
+        raise NotImplementedError
+
+    def criar_lote(self, novos):
+        """Grava vários tokens ({token: dados}) de uma só vez"""
+        for token, dados in novos.items():
+            self.criar(token, dados)
+
+    def desativar(self, token, em=None):
+        raise NotImplementedError
+
+    def substituir(self, tokens):
+        """Troca todo o conteúdo do backend (usado na restauração de backups)"""
+        raise NotImplementedError
+
+    def substituir_json(self, fluxo):
+        """Como ``substituir``, lendo o JSON completo de um fluxo binário"""
+        self.substituir(json.load(fluxo))
+
+    def registrar_acesso(self, token, em=None, seq=None):
+        """Soma um acesso; ``seq`` é o próximo número de sequência do token (idempotência)"""
+        raise NotImplementedError
+
+    def registrar_download(self, token, em=None, seq=None):
+        raise NotImplementedError
+
+    def contar(self, agora=None):
+        """Retorna {'total': n, 'ativos': n} (ativos = campo ``ativo``)"""
+        tokens = self.carregar()
+        return {
+            'total': len(tokens),
+            'ativos': sum(1 for dados in tokens.values() if dados['ativo']),
+        }
+
+    def listar_ativos(self, agora=None):
+        """Tokens ativos e não expirados, ordenados por cliente"""
+        agora = agora or datetime.now()
+        ativos = [
+            (token, dados) for token, dados in self.carregar().items()
+            if dados['ativo'] and datetime.fromisoformat(dados['expira_em']) > agora
+        ]
+        ativos.sort(key=lambda item: item[1]['cliente'])
+        return ativos
+
+    def expirando(self, dias, agora=None):
+        """Tokens ativos que expiram nos próximos ``dias`` dias, do mais urgente"""
+        agora = agora or datetime.now()
+        expirando = []
+        for token, dados in self.carregar().items():
+            if not dados['ativo']:
+                continue
+            dias_restantes = (datetime.fromisoformat(dados['expira_em']) - agora).days
+            if 0 <= dias_restantes <= dias:
+                expirando.append((token, dados))
+        expirando.sort(key=lambda item: item[1]['expira_em'])
+        return expirando
+
+    def estatisticas_categoria(self):
+        """Totais por categoria: total, ativos, downloads e acessos"""
+        return estatisticas_categoria(self.carregar())
+
+    def exportar_json(self, caminho):
+        """Grava todos os tokens num JSON no formato do tokens.json (cópia local)"""
+        escrever_json(caminho, self.carregar())
+
+    def publicar(self):
+        """Consolida o backend ao fim de uma sessão; retorna se algo foi gravado.
+
+        O site não lê mais os tokens daqui (só os shards de ``tokens/``),
+        então nada com nome ou telefone de cliente é exportado.
+        """
+        raise NotImplementedError
+
+    def descricao(self):
+        return self.nome
+
+    def assinatura(self):
+        """Identifica a versão dos dados (inode, mtime, tamanho); None desliga caches"""
+        return None
+
+
+def assinatura_arquivos(*caminhos):
+    """(inode, mtime_ns, tamanho) de cada arquivo; arquivos ausentes viram None"""
+    assinatura = []
+    for caminho in caminhos:
+        try:
+            info = os.stat(caminho)
+            assinatura.append((info.st_ino, info.st_mtime_ns, info.st_size))
+        except OSError:
+            assinatura.append(None)
+    return tuple(assinatura)
+
+
+def escrever_json(caminho, dados):
+    """Escreve JSON num arquivo temporário e troca com ``os.replace``"""
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+class JsonTokenStore(TokenStore):
+    """Backend padrão: tokens.json + journal (ver ``JournalTokens``)"""
+
+    nome = 'json'
+
+    def __init__(self, arquivo_tokens='tokens.json', limite_journal=512 * 1024):
+        self.arquivo_tokens = arquivo_tokens
+        self.journal = JournalTokens(arquivo_tokens, limite_journal=limite_journal)
+        self.trava = self.journal.trava
+
+    def carregar(self):
+        return self.journal.carregar()
+
+    def criar(self, token, dados):
+        self.journal.registrar_criacao(token, dados)
+
+    def criar_lote(self, novos):
+        self.journal.registrar_lote(novos)
+
+    def desativar(self, token, em=None):
+        self.journal.registrar_desativacao(token, em)
+
+    def substituir(self, tokens):
+        # Journal primeiro: uma queda no meio não reaplica alterações sobre o estado restaurado
+        with self.trava:
+            with open(self.journal.arquivo_journal, 'w', encoding='utf-8'):
+                pass
+            escrever_json(self.arquivo_tokens, tokens)
+
+    def substituir_json(self, fluxo):
+        # O conteúdo é copiado em blocos direto para o novo tokens.json, sem parse
+        with self.trava:
+            with open(self.journal.arquivo_journal, 'w', encoding='utf-8'):
+                pass
+            temporario = self.arquivo_tokens + '.tmp'
+            with open(temporario, 'wb') as f:
+                shutil.copyfileobj(fluxo, f, 64 * 1024)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.arquivo_tokens)
+
+    def registrar_acesso(self, token, em=None, seq=None):
+        self.journal.registrar_acesso(token, em, seq)
+
+    def registrar_download(self, token, em=None, seq=None):
+        self.journal.registrar_download(token, em, seq)
+
+    def exportar_json(self, caminho):
+        if os.path.abspath(caminho) == os.path.abspath(self.arquivo_tokens):
+            self.journal.compactar()
+        else:
+            super().exportar_json(caminho)
+
+    def publicar(self):
+        return self.journal.compactar()
+
+    def registros_desde(self, assinatura):
+        """Registros anexados ao journal depois de ``assinatura`` (de ``assinatura()``).
+
+        None se o snapshot mudou ou o journal foi zerado/trocado desde
+        então: aí não dá para saber o que mudou só pelo final do journal.
+        """
+        atual = json.loads(json.dumps(self.assinatura()))
+        if not assinatura or len(assinatura) != 2 or assinatura[0] != atual[0]:
+            return None
+        antes, agora = assinatura[1], atual[1]
+        if agora is None:
+            return None if antes else []
+        if antes is not None and (antes[0] != agora[0] or antes[2] > agora[2]):
+            return None
+        registros = []
+        with open(self.journal.arquivo_journal, 'rb') as f:
+            f.seek(antes[2] if antes else 0)
+            for linha in f:
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    continue
+        return registros
+
+    def descricao(self):
+        pendente = self.journal.tamanho_journal() / 1024
+        return f"JSON + journal ({pendente:.1f} KB pendentes)"
+
+    def assinatura(self):
+        return assinatura_arquivos(self.arquivo_tokens, self.journal.arquivo_journal)
+
+
+class SqliteTokenStore(TokenStore):
+    """Backend SQLite com índices em ativo, expira_em, categoria e cliente.
+
+    Os contadores de acessos e downloads também ficam em colunas da tabela
+    ``tokens`` para que as estatísticas por categoria saiam de um GROUP BY;
+    o histórico de eventos fica no log de acessos, fora do banco.
+    """
+
+    nome = 'sqlite'
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS tokens (
+            token TEXT PRIMARY KEY,
+            cliente TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            ativo INTEGER NOT NULL,
+            criado_em TEXT NOT NULL,
+            expira_em TEXT NOT NULL,
+            total_acessos INTEGER NOT NULL DEFAULT 0,
+            total_downloads INTEGER NOT NULL DEFAULT 0,
+            dados TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tokens_ativo ON tokens (ativo);
+        CREATE INDEX IF NOT EXISTS idx_tokens_expira_em ON tokens (expira_em);
+        CREATE INDEX IF NOT EXISTS idx_tokens_categoria ON tokens (categoria);
+        CREATE INDEX IF NOT EXISTS idx_tokens_cliente ON tokens (cliente);
+    """
+
+    def __init__(self, arquivo_db='tokens.db', arquivo_tokens='tokens.json'):
+        import sqlite3
+
+        self.arquivo_db = arquivo_db
+        self.arquivo_tokens = arquivo_tokens
+        self.trava = TravaArquivo(arquivo_trava(arquivo_tokens))
+        novo = not os.path.exists(arquivo_db)
+        self.conexao = sqlite3.connect(arquivo_db)
+        self.conexao.executescript(self.ESQUEMA)
+        if novo and os.path.exists(arquivo_tokens):
+            # Primeira abertura: migra o tokens.json existente
+            self.importar(JournalTokens(arquivo_tokens).carregar())
+
+    def importar(self, tokens):
+        with self.conexao:
+            for token, dados in tokens.items():
+                self._inserir(token, dados)
+
+    def _inserir(self, token, dados):
+        self.conexao.execute(
+            "INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (token, dados['cliente'], dados['categoria'], int(bool(dados['ativo'])),
+             dados['criado_em'], dados['expira_em'], dados.get('total_acessos', 0),
+             dados.get('total_downloads', 0), json.dumps(dados, ensure_ascii=False)),
+        )
+
+    def _montar(self, linhas):
+        """Converte linhas (token, dados) no formato do tokens.json"""
+        return {token: json.loads(dados) for token, dados in linhas}
+
+    def carregar(self):
+        return self._montar(self.conexao.execute("SELECT token, dados FROM tokens ORDER BY rowid"))
+
+    def obter(self, token):
+        linhas = self.conexao.execute("SELECT token, dados FROM tokens WHERE token = ?", (token,))
+        return self._montar(linhas).get(token)
+
+    def criar(self, token, dados):
+        with self.conexao:
+            self._inserir(token, dados)
+
+    def criar_lote(self, novos):
+        self.importar(novos)
+
+    def substituir(self, tokens):
+        with self.conexao:
+            self.conexao.execute("DELETE FROM tokens")
+            for token, dados in tokens.items():
+                self._inserir(token, dados)
+
+    def _atualizar(self, token, registro):
+        """Aplica um registro do journal ao token e regrava a linha"""
+        with self.trava:
+            linha = self.conexao.execute("SELECT dados FROM tokens WHERE token = ?", (token,)).fetchone()
+            if linha is None:
+                return
+            tokens = {token: json.loads(linha[0])}
+            JournalTokens.aplicar(tokens, registro)
+            dados = tokens[token]
+            with self.conexao:
+                self.conexao.execute(
+                    "UPDATE tokens SET ativo = ?, total_acessos = ?, total_downloads = ?, dados = ? "
+                    "WHERE token = ?",
+                    (int(bool(dados['ativo'])), dados.get('total_acessos', 0),
+                     dados.get('total_downloads', 0), json.dumps(dados, ensure_ascii=False), token),
+                )
+
+    def desativar(self, token, em=None):
+        self._atualizar(token, {'op': 'desativar', 'token': token,
+                                'em': em or datetime.now().isoformat()})
+
+    def registrar_acesso(self, token, em=None, seq=None):
+        self._atualizar(token, _registro_evento('acesso', token, em, seq))
+
+    def registrar_download(self, token, em=None, seq=None):
+        self._atualizar(token, _registro_evento('download', token, em, seq))
+
+    def contar(self, agora=None):
+        total, ativos = self.conexao.execute(
+            "SELECT COUNT(*), COALESCE(SUM(ativo), 0) FROM tokens").fetchone()
+        return {'total': total, 'ativos': ativos}
+
+    def listar_ativos(self, agora=None):
+        agora = agora or datetime.now()
+        linhas = self.conexao.execute(
+            "SELECT token, dados FROM tokens WHERE ativo = 1 AND expira_em > ? ORDER BY cliente",
+            (agora.isoformat(),),
+        )
+        return list(self._montar(linhas).items())
+
+    def expirando(self, dias, agora=None):
+        agora = agora or datetime.now()
+        # (expira - agora).days <= dias  <=>  expira < agora + dias + 1
+        limite = agora + timedelta(days=dias + 1)
+        linhas = self.conexao.execute(
+            "SELECT token, dados FROM tokens WHERE expira_em >= ? AND expira_em < ? AND ativo = 1 "
+            "ORDER BY expira_em",
+            (agora.isoformat(), limite.isoformat()),
+        )
+        return list(self._montar(linhas).items())
+
+    def estatisticas_categoria(self):
+        linhas = self.conexao.execute(
+            "SELECT categoria, COUNT(*), SUM(ativo), SUM(total_downloads), SUM(total_acessos) "
+            "FROM tokens GROUP BY categoria"
+        )
+        return {
+            categoria: {'total': total, 'ativos': ativos, 'downloads': downloads, 'acessos': acessos}
+            for categoria, total, ativos, downloads, acessos in linhas
+        }
+
+    def publicar(self):
+        # O banco já é o estado consolidado; o tokens.json só é lido na migração
+        return False
+
+    def descricao(self):
+        return f"SQLite ({self.arquivo_db})"
+
+    def assinatura(self):
+        return assinatura_arquivos(self.arquivo_db, self.arquivo_db + '-journal', self.arquivo_db + '-wal')
+
+
+def abrir_store(arquivo_tokens='tokens.json', backend=None):
+    """Abre o backend configurado (``GLR_TOKEN_BACKEND``: json ou sqlite)"""
+    backend = (backend or os.environ.get('GLR_TOKEN_BACKEND') or 'json').lower()
+    if backend == 'sqlite':
+        arquivo_db = f"{os.path.splitext(arquivo_tokens)[0]}.db"
+        return SqliteTokenStore(arquivo_db, arquivo_tokens)
+    if backend == 'json':
+        return JsonTokenStore(arquivo_tokens)
+    raise ValueError(f"Backend de tokens desconhecido: {backend}")
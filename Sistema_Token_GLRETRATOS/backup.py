@@ -0,0 +1,247 @@
+import gzip
+import hashlib
+import io
+import json
+import marshal
+import os
+from datetime import datetime
+from armazenamento import escrever_json
+
+
+def serializar(dados):
+    """Forma canônica (chaves ordenadas, sem espaços) em bytes UTF-8"""
+    return json.dumps(dados, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def hashes_registros(tokens):
+    """{token: hash do registro}, para saber quais registros mudaram entre dois pontos.
+
+    Os registros são planos (listas e textos); com os campos em ordem e
+    ``marshal`` na versão 2 (sem referências) os bytes só dependem do
+    conteúdo, e são bem mais rápidos de gerar que um ``json.dumps`` por token.
+    """
+    return {token: hashlib.blake2b(marshal.dumps(sorted(dados.items()), 2), digest_size=16).hexdigest()
+            for token, dados in tokens.items()}
+
+
+def hash_tokens(tokens, hashes=None):
+    """SHA-256 do conteúdo: pares (token, hash do registro) em ordem de token"""
+    hashes = hashes_registros(tokens) if hashes is None else hashes
+    resumo = hashlib.sha256()
+    for token in sorted(hashes):
+        resumo.update(f"{token}\0{hashes[token]}\n".encode('utf-8'))
+    return resumo.hexdigest()
+
+
+class BackupTokens:
+    """Backups endereçados por conteúdo com deltas entre snapshots.
+
+    Cada ponto de restauração guarda só os tokens alterados/removidos em
+    relação ao ponto anterior; a cada ``intervalo_completo`` pontos é
+    gravado um snapshot completo. Se o hash do conteúdo não mudou, nenhum
+    backup é criado. Os arquivos são gravados com gzip e ``indice.json``
+    lista a cadeia em ordem com data, tamanhos, total de tokens e hash, de
+    modo que listar, podar e mostrar status leem só o índice.
+
+    ``estado.json`` guarda o hash de cada registro no último ponto: o
+    próximo delta sai da comparação com esses hashes, sem descomprimir
+    o snapshot nem reaplicar os deltas da cadeia.
+    """
+
+    def __init__(self, pasta='backup_tokens', intervalo_completo=25, max_pontos=500):
+        self.pasta = pasta
+        self.arquivo_indice = os.path.join(pasta, 'indice.json')
+        self.arquivo_estado = os.path.join(pasta, 'estado.json')
+        self.intervalo_completo = intervalo_completo
+        self.max_pontos = max_pontos
+
+    # ----- índice -----
+
+    def carregar_indice(self):
+        try:
+            with open(self.arquivo_indice, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self._migrar_backups_antigos()
+        except ValueError:
+            print("⚠️  Índice de backups corrompido; reconstruindo a partir dos snapshots completos.")
+            return self._migrar_backups_antigos()
+
+    def _migrar_backups_antigos(self):
+        """Registra cópias completas antigas (tokens_backup_*.json) como pontos da cadeia"""
+        indice = []
+        if not os.path.isdir(self.pasta):
+            return indice
+        for nome in sorted(os.listdir(self.pasta)):
+            if not (nome.startswith('tokens_backup_') and nome.endswith('.json')):
+                continue
+            try:
+                tokens = self._ler(nome)
+            except (OSError, ValueError):
+                continue
+            carimbo = nome[len('tokens_backup_'):-len('.json')]
+            try:
+                criado_em = datetime.strptime(carimbo[:15], '%Y%m%d_%H%M%S').isoformat()
+            except ValueError:
+                criado_em = carimbo
+            tamanho = os.path.getsize(os.path.join(self.pasta, nome))
+            indice.append({'arquivo': nome, 'tipo': 'completo', 'criado_em': criado_em,
+                           'tamanho': tamanho, 'tamanho_comprimido': tamanho,
+                           'total_tokens': len(tokens), 'hash': hash_tokens(tokens)})
+        return indice
+
+    def salvar_indice(self, indice):
+        escrever_json(self.arquivo_indice, indice)
+
+    # ----- leitura -----
+
+    def _abrir_arquivo(self, arquivo):
+        caminho = os.path.join(self.pasta, arquivo)
+        if arquivo.endswith('.gz'):
+            return gzip.open(caminho, 'rb')
+        return open(caminho, 'rb')
+
+    def _ler(self, arquivo):
+        with self._abrir_arquivo(arquivo) as f:
+            return json.load(f)
+
+    def abrir(self, posicao=-1):
+        """Fluxo binário com o JSON completo dos tokens no ponto ``posicao``.
+
+        Snapshots completos são descomprimidos sob demanda, sem passar
+        pelo parser; deltas precisam ser reconstruídos em memória.
+        """
+        indice = self.carregar_indice()
+        if not indice:
+            raise ValueError("Nenhum backup disponível")
+        if indice[posicao]['tipo'] == 'completo':
+            return self._abrir_arquivo(indice[posicao]['arquivo'])
+        return io.BytesIO(serializar(self.reconstruir(posicao, indice)))
+
+    def reconstruir(self, posicao=-1, indice=None):
+        """Estado dos tokens no ponto ``posicao`` do índice"""
+        indice = self.carregar_indice() if indice is None else indice
+        if not indice:
+            return {}
+        if posicao < 0:
+            posicao += len(indice)
+
+        inicio = posicao
+        while indice[inicio]['tipo'] != 'completo':
+            inicio -= 1
+            if inicio < 0:
+                raise ValueError("Cadeia de backups sem snapshot completo")
+
+        tokens = self._ler(indice[inicio]['arquivo'])
+        for entrada in indice[inicio + 1:posicao + 1]:
+            delta = self._ler(entrada['arquivo'])
+            tokens.update(delta['alterados'])
+            for token in delta['removidos']:
+                tokens.pop(token, None)
+        return tokens
+
+    def _hashes_do_ponto(self, hash_ponto):
+        """{token: hash do registro} do ponto ``hash_ponto``, ou None se o estado não é dele"""
+        try:
+            with open(self.arquivo_estado, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return estado.get('tokens') if estado.get('hash') == hash_ponto else None
+
+    def _salvar_hashes(self, hash_ponto, hashes):
+        temporario = self.arquivo_estado + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'hash': hash_ponto, 'tokens': hashes}, separators=(',', ':')))
+        os.replace(temporario, self.arquivo_estado)
+
+    # ----- escrita -----
+
+    def _novo_arquivo(self, prefixo):
+        carimbo = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        return f"{prefixo}_{carimbo}.json.gz"
+
+    def _gravar(self, arquivo, bruto):
+        """Grava ``bruto`` comprimido; retorna o tamanho comprimido"""
+        caminho = os.path.join(self.pasta, arquivo)
+        temporario = caminho + '.tmp'
+        with open(temporario, 'wb') as f:
+            with gzip.GzipFile(fileobj=f, mode='wb', mtime=0) as gz:
+                gz.write(bruto)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+        return os.path.getsize(caminho)
+
+    def criar(self, tokens):
+        """Cria um ponto de restauração; retorna a entrada ou None se nada mudou"""
+        os.makedirs(self.pasta, exist_ok=True)
+        indice = self.carregar_indice()
+        hashes = hashes_registros(tokens)
+        hash_atual = hash_tokens(tokens, hashes)
+        if indice and indice[-1]['hash'] == hash_atual:
+            return None
+
+        desde_completo = 0
+        for entrada in reversed(indice):
+            if entrada['tipo'] == 'completo':
+                break
+            desde_completo += 1
+
+        if not indice or desde_completo + 1 >= self.intervalo_completo:
+            arquivo = self._novo_arquivo('tokens_backup')
+            tipo = 'completo'
+            bruto = serializar(tokens)
+        else:
+            anteriores = self._hashes_do_ponto(indice[-1]['hash'])
+            if anteriores is None:
+                # Sem estado do último ponto (backups antigos): reconstrói uma vez
+                anteriores = hashes_registros(self.reconstruir(len(indice) - 1, indice))
+            arquivo = self._novo_arquivo('tokens_delta')
+            tipo = 'delta'
+            bruto = serializar({
+                'base': indice[-1]['hash'],
+                'alterados': {t: tokens[t] for t, h in hashes.items() if anteriores.get(t) != h},
+                'removidos': [t for t in anteriores if t not in tokens],
+            })
+
+        comprimido = self._gravar(arquivo, bruto)
+        entrada = {'arquivo': arquivo, 'tipo': tipo, 'criado_em': datetime.now().isoformat(),
+                   'tamanho': len(bruto), 'tamanho_comprimido': comprimido,
+                   'total_tokens': len(tokens), 'hash': hash_atual}
+        indice.append(entrada)
+        self.salvar_indice(indice)
+        try:
+            self._salvar_hashes(hash_atual, hashes)
+        except OSError as e:
+            # O próximo delta só sai mais caro (reconstruindo o último ponto)
+            print(f"⚠️  Não foi possível salvar o estado do backup: {e}")
+
+        if len(indice) > self.max_pontos:
+            self.podar(self.max_pontos)
+        return entrada
+
+    def podar(self, manter):
+        """Remove os pontos mais antigos mantendo pelo menos ``manter`` pontos.
+
+        Só cadeias inteiras são removidas: o corte acontece no snapshot
+        completo mais recente que ainda preserva os ``manter`` últimos pontos.
+        """
+        indice = self.carregar_indice()
+        if len(indice) <= manter:
+            return []
+
+        corte = len(indice) - manter
+        while corte > 0 and indice[corte]['tipo'] != 'completo':
+            corte -= 1
+        removidos = indice[:corte]
+        if not removidos:
+            return []
+
+        self.salvar_indice(indice[corte:])
+        for entrada in removidos:
+            try:
+                os.remove(os.path.join(self.pasta, entrada['arquivo']))
+            except FileNotFoundError:
+                pass
+        return removidos
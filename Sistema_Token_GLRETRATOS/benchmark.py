@@ -0,0 +1,242 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import sessao as modulo_sessao
+from gerar_token import CATEGORIAS
+
+TAMANHOS_PADRAO = (1000, 10000, 100000)
+
+
+# ----- dados sintéticos -----
+
+def gerar_albuns(pasta, quantidade=50, fotos_por_album=80, semente=1):
+    """Cria ``pasta/<album>.json`` no formato exportado pelo sincronizador"""
+    aleatorio = random.Random(semente)
+    os.makedirs(pasta, exist_ok=True)
+    slugs = []
+    for numero in range(quantidade):
+        slug = f"Album {numero:04d}"
+        data = (datetime(2024, 1, 1) + timedelta(days=aleatorio.randrange(700))).date().isoformat()
+        fotos = []
+        for indice in range(fotos_por_album):
+            ident = ''.join(aleatorio.choices('abcdefghijklmnopqrstuvwxyzABCDEFGHIJ0123456789_-', k=33))
+            fotos.append({
+                'nome': f"{slug}-{indice + 1}.jpg",
+                'album': slug,
+                'data': data,
+                'descricao': '',
+                'url': f"https://drive.google.com/uc?id={ident}&export=download",
+                'thumbnail': f"https://drive.google.com/thumbnail?id={ident}&sz=w400",
+            })
+        with open(os.path.join(pasta, f"{slug}.json"), 'w', encoding='utf-8') as f:
+            json.dump(fotos, f, indent=2, ensure_ascii=False)
+        slugs.append(slug)
+    return slugs
+
+
+def gerar_tokens(quantidade, albuns, semente=1, historico=False, agora=None):
+    """Dicionário de tokens realista: categorias, validades e uso variados.
+
+    Com ``historico`` os registros vêm no formato antigo, com as listas
+    ``acessos`` e ``fotos_baixadas`` (mede a migração); sem ele, com os
+    contadores atuais.
+    """
+    aleatorio = random.Random(semente)
+    agora = agora or datetime.now()
+    categorias = list(CATEGORIAS.values())
+    tokens = {}
+    for numero in range(quantidade):
+        criado = agora - timedelta(days=aleatorio.randrange(365), seconds=aleatorio.randrange(86400))
+        expira = criado + timedelta(days=aleatorio.choice((7, 15, 30, 60, 90)))
+        pastas = aleatorio.sample(albuns, k=min(len(albuns), aleatorio.choice((1, 1, 2, 3))))
+        # Uso com cauda longa: muitos nunca acessam, poucos acessam muito
+        total_acessos = int(aleatorio.paretovariate(1.2)) - 1 if aleatorio.random() > 0.3 else 0
+        total_downloads = aleatorio.randrange(total_acessos * 3 + 1)
+        acessos = sorted(
+            (criado + timedelta(seconds=aleatorio.randrange(max(1, int((expira - criado).total_seconds())))))
+            .isoformat() for _ in range(total_acessos)
+        )
+        dados = {
+            'cliente': f"Cliente {numero:07d}",
+            'categoria': aleatorio.choice(categorias),
+            'pasta': pastas[0],
+            'pastas_permitidas': pastas,
+            'whatsapp': f"5579{aleatorio.randrange(10 ** 8, 10 ** 9)}",
+            'downloads_permitidos': True,
+            'criado_em': criado.isoformat(),
+            'expira_em': expira.isoformat(),
+            'ativo': aleatorio.random() > 0.1,
+        }
+        if historico:
+            dados['acessos'] = acessos
+            dados['fotos_baixadas'] = [
+                f"{aleatorio.choice(pastas)}-{aleatorio.randrange(1, 80)}.jpg" for _ in range(total_downloads)
+            ]
+        else:
+            dados['total_acessos'] = total_acessos
+            dados['total_downloads'] = total_downloads
+            dados['ultimo_acesso'] = acessos[-1] if acessos else None
+        if not dados['ativo']:
+            dados['desativado_em'] = (criado + timedelta(days=1)).isoformat()
+        tokens[f"{numero:012x}"] = dados
+    return tokens
+
+
+# ----- medição -----
+
+def bytes_escritos():
+    """Bytes passados a write() pelo processo (Linux); None onde não houver /proc"""
+    try:
+        with open('/proc/self/io', 'r', encoding='ascii') as f:
+            for linha in f:
+                if linha.startswith('wchar:'):
+                    return int(linha.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def medir(funcao):
+    """Executa ``funcao`` e retorna tempo, pico de memória e bytes escritos"""
+    escritos_antes = bytes_escritos()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        funcao()
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    escritos_depois = bytes_escritos()
+    return {
+        'segundos': round(segundos, 6),
+        'pico_memoria_kb': round(pico / 1024, 1),
+        'bytes_escritos': None if escritos_antes is None else escritos_depois - escritos_antes,
+    }
+
+
+def rodar_tamanho(quantidade, pasta, historico=False, albuns=50, fotos_por_album=80):
+    """Mede as operações principais sobre ``quantidade`` tokens sintéticos em ``pasta``"""
+    from gerar_token import GerenciadorTokens
+    from relatorio import RelatorioTokens
+
+    anterior = os.getcwd()
+    os.makedirs(pasta, exist_ok=True)
+    os.chdir(pasta)
+    try:
+        slugs = gerar_albuns('fotos', albuns, fotos_por_album)
+        with open('tokens.json', 'w', encoding='utf-8') as f:
+            json.dump(gerar_tokens(quantidade, slugs, historico=historico), f, indent=2, ensure_ascii=False)
+
+        resultados = {}
+        contexto = {}
+
+        def carregar():
+            # Sessão nova: a leitura é medida a frio, na pasta deste tamanho
+            modulo_sessao._sessao = None
+            contexto['gt'] = GerenciadorTokens()
+            contexto['gt'].carregar_tokens()
+
+        resultados['carregar_tokens'] = medir(carregar)
+        gt = contexto['gt']
+        rt = RelatorioTokens(gt)
+        token = next(iter(gt.carregar_tokens()))
+
+        operacoes = [
+            ('carregar_tokens_cache', gt.carregar_tokens),
+            ('fazer_backup_completo', gt.fazer_backup),
+            ('gerar_token', lambda: gt.sessao.criar(
+                gt.novo_token(), gt.montar_dados_token('Benchmark', 'Outros', slugs[:1], '', 30))),
+            ('alocar_10000_ids', lambda: gt.novos_tokens(10000)),
+            ('registrar_acesso', lambda: gt.registrar_acesso(token)),
+            ('fazer_backup_delta', gt.fazer_backup),
+            ('relatorio_completo', rt.mostrar_relatorio_completo),
+            ('relatorio_resumo_cache', rt.obter_resumo),
+            ('estatisticas_categoria', rt.estatisticas_categoria),
+            ('tokens_expirando', rt.tokens_expirando),
+            ('relatorio_periodo', rt.relatorio_periodo),
+            ('listar_albuns_frio', gt.listar_albuns_disponiveis),
+            ('listar_albuns_quente', gt.listar_albuns_disponiveis),
+            ('publicar_tokens', gt.publicar_tokens),
+        ]
+        for nome, funcao in operacoes:
+            resultados[nome] = medir(funcao)
+        return resultados
+    finally:
+        os.chdir(anterior)
+
+
+def revisao_git():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(atual, anterior):
+    """Imprime a razão de tempo (atual/anterior) de cada operação em comum"""
+    for tamanho, operacoes in atual['resultados'].items():
+        base = anterior.get('resultados', {}).get(tamanho, {})
+        for nome, medida in operacoes.items():
+            if nome in base and base[nome]['segundos']:
+                razao = medida['segundos'] / base[nome]['segundos']
+                alerta = "⚠️ " if razao > 1.2 else "  "
+                print(f"{alerta}{tamanho:>8} {nome:<26} {razao:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks das operações de tokens e álbuns com dados sintéticos")
+    parser.add_argument('-t', '--tamanhos', type=int, nargs='+', default=list(TAMANHOS_PADRAO),
+                        help="quantidades de tokens (padrão: 1000 10000 100000; até 1000000)")
+    parser.add_argument('--historico', action='store_true',
+                        help="gera tokens no formato antigo, com listas acessos/fotos_baixadas")
+    parser.add_argument('--albuns', type=int, default=50)
+    parser.add_argument('-o', '--saida', help="JSON de resultados (padrão: benchmark_<data>.json)")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para comparação")
+    args = parser.parse_args(argv)
+
+    resultado = {
+        'revisao': revisao_git(),
+        'quando': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'backend': os.environ.get('GLR_TOKEN_BACKEND', 'json'),
+        'historico': args.historico,
+        'resultados': {},
+    }
+    for quantidade in args.tamanhos:
+        pasta = tempfile.mkdtemp(prefix=f"glr_bench_{quantidade}_")
+        try:
+            print(f"⏱️  {quantidade} tokens...")
+            medidas = rodar_tamanho(quantidade, pasta, args.historico, args.albuns)
+            resultado['resultados'][str(quantidade)] = medidas
+            for nome, medida in medidas.items():
+                print(f"   {nome:<26} {medida['segundos']:9.4f}s  {medida['pico_memoria_kb']:>10.1f} KB")
+        finally:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    saida = args.saida or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"💾 Resultados em: {os.path.abspath(saida)}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            comparar(resultado, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+TOKEN_COMPARTILHADO = 'compartilhado'
+
+
+def _dados(cliente, agora):
+    return {
+        'cliente': cliente,
+        'categoria': 'Outros',
+        'pasta': '',
+        'pastas_permitidas': [],
+        'whatsapp': '',
+        'downloads_permitidos': True,
+        'total_acessos': 0,
+        'total_downloads': 0,
+        'ultimo_acesso': None,
+        'criado_em': agora.isoformat(),
+        'expira_em': (agora + timedelta(days=30)).isoformat(),
+        'ativo': True,
+    }
+
+
+def _escritor(pasta, numero, operacoes, inicio):
+    """Processo escritor: cria tokens próprios e registra acessos no token compartilhado"""
+    os.chdir(pasta)
+    from sessao import SessaoTokens
+
+    sessao = SessaoTokens()
+    inicio.wait()
+    agora = datetime.now()
+    for i in range(operacoes):
+        sessao.criar(f"p{numero}-{i}", _dados(f"Cliente {numero}-{i}", agora))
+        sessao.registrar_acesso(TOKEN_COMPARTILHADO)
+
+
+def medir(processos=4, operacoes=200, backend='json', pasta=None):
+    """Roda ``processos`` escritores em paralelo; retorna o resultado conferido"""
+    os.environ['GLR_TOKEN_BACKEND'] = backend
+    pasta = pasta or tempfile.mkdtemp(prefix='glr_concorrencia_')
+    anterior = os.getcwd()
+    os.chdir(pasta)
+    try:
+        from sessao import SessaoTokens
+
+        sessao = SessaoTokens()
+        sessao.criar_arquivos_base()
+        sessao.criar(TOKEN_COMPARTILHADO, _dados('Compartilhado', datetime.now()))
+
+        contexto = multiprocessing.get_context('spawn')
+        inicio = contexto.Event()
+        filhos = [contexto.Process(target=_escritor, args=(pasta, numero, operacoes, inicio))
+                  for numero in range(processos)]
+        for filho in filhos:
+            filho.start()
+        time.sleep(0.5)  # deixa todos os processos importarem antes de largar
+        comeco = time.perf_counter()
+        inicio.set()
+        for filho in filhos:
+            filho.join()
+        duracao = time.perf_counter() - comeco
+
+        sessao.store.publicar()
+        tokens = SessaoTokens().tokens()
+        esperados = processos * operacoes
+        criados = len(tokens) - 1
+        acessos = tokens[TOKEN_COMPARTILHADO].get('total_acessos', 0)
+        return {
+            'backend': backend,
+            'processos': processos,
+            'operacoes_por_processo': operacoes,
+            'escritas': esperados * 2,
+            'segundos': round(duracao, 3),
+            'escritas_por_segundo': round(esperados * 2 / duracao, 1) if duracao else None,
+            'tokens_criados': criados,
+            'acessos_contados': acessos,
+            'perdidos': (esperados - criados) + (esperados - acessos),
+            'falhas': sum(1 for filho in filhos if filho.exitcode),
+            'pasta': pasta,
+        }
+    finally:
+        os.chdir(anterior)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mede a vazão de vários processos gravando tokens ao mesmo tempo")
+    parser.add_argument('-p', '--processos', type=int, default=4)
+    parser.add_argument('-n', '--operacoes', type=int, default=200, help="tokens criados por processo")
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='json')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    resultado = medir(args.processos, args.operacoes, args.backend)
+    print(f"⚙️  {resultado['processos']} processo(s) x {resultado['operacoes_por_processo']} "
+          f"criações + acessos ({resultado['backend']})")
+    print(f"⏱️  {resultado['segundos']}s — {resultado['escritas_por_segundo']} escritas/s")
+    print(f"📊 Tokens criados: {resultado['tokens_criados']} | acessos contados: {resultado['acessos_contados']}")
+    if resultado['perdidos'] or resultado['falhas']:
+        print(f"❌ {resultado['perdidos']} atualização(ões) perdida(s), {resultado['falhas']} processo(s) com erro")
+        return 1
+    print("✅ Nenhuma atualização perdida.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+from collections import Counter
+from armazenamento import escrever_json
+
+
+def resumir_album(caminho):
+    """Lê ``fotos/<album>.json`` e devolve (titulo, total de fotos, data, hash)"""
+    with open(caminho, 'rb') as f:
+        bruto = f.read()
+    fotos = json.loads(bruto.decode('utf-8'))
+    if not isinstance(fotos, list):
+        raise ValueError("o álbum deve ser uma lista de fotos")
+    titulos = Counter(foto.get('album') for foto in fotos if isinstance(foto, dict) and foto.get('album'))
+    datas = [foto.get('data') for foto in fotos if isinstance(foto, dict) and foto.get('data')]
+    titulo = titulos.most_common(1)[0][0] if titulos else None
+    return titulo, len(fotos), max(datas) if datas else None, hashlib.sha256(bruto).hexdigest()
+
+
+class CatalogoAlbuns:
+    """Resumo persistente dos álbuns de ``fotos/`` em ``catalogo_albuns.json``.
+
+    Cada entrada guarda slug, título, total de fotos, tamanho em bytes, data
+    e hash do conteúdo, junto com o ``mtime``/tamanho do arquivo de origem.
+    Ao atualizar, só os álbuns cujo arquivo mudou são relidos; os demais
+    vêm do catálogo. As consultas por slug são feitas direto no dicionário.
+    """
+
+    def __init__(self, pasta_fotos='fotos', arquivo='catalogo_albuns.json'):
+        self.pasta_fotos = pasta_fotos
+        self.arquivo = arquivo
+        self.albuns = None  # {slug: entrada}
+
+    def _carregar(self):
+        try:
+            with open(self.arquivo, 'r', encoding='utf-8') as f:
+                conteudo = json.load(f)
+            return conteudo.get('albuns', {}) if conteudo.get('pasta') == self.pasta_fotos else {}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def atualizar(self):
+        """Sincroniza o catálogo com a pasta; retorna (relidos, removidos)"""
+        anteriores = self.albuns if self.albuns is not None else self._carregar()
+        albuns = {}
+        relidos = 0
+        if os.path.isdir(self.pasta_fotos):
+            with os.scandir(self.pasta_fotos) as entradas:
+                for entrada in entradas:
+                    if not (entrada.name.lower().endswith('.json') and entrada.is_file()):
+                        continue
+                    slug = entrada.name[:-5]
+                    info = entrada.stat()
+                    atual = anteriores.get(slug)
+                    if (atual and atual['arquivo'] == entrada.name
+                            and atual['mtime_ns'] == info.st_mtime_ns and atual['bytes'] == info.st_size):
+                        albuns[slug] = atual
+                        continue
+                    try:
+                        titulo, total, data, hash_conteudo = resumir_album(entrada.path)
+                    except (OSError, ValueError) as e:
+                        print(f"⚠️  Álbum ignorado ({entrada.name}): {e}")
+                        continue
+                    albuns[slug] = {
+                        'arquivo': entrada.name,
+                        'slug': slug,
+                        'titulo': titulo or slug.replace('_', ' ').strip() or slug,
+                        'fotos': total,
+                        'bytes': info.st_size,
+                        'data': data,
+                        'hash': hash_conteudo,
+                        'mtime_ns': info.st_mtime_ns,
+                    }
+                    relidos += 1
+
+        removidos = len(set(anteriores) - set(albuns))
+        self.albuns = albuns
+        if relidos or removidos or not os.path.exists(self.arquivo):
+            try:
+                escrever_json(self.arquivo, {'pasta': self.pasta_fotos, 'albuns': albuns})
+            except OSError as e:
+                # O catálogo em memória continua válido; só a próxima execução relê tudo
+                print(f"⚠️  Não foi possível salvar o catálogo de álbuns: {e}")
+        return relidos, removidos
+
+    def listar(self):
+        """Álbuns em ordem de slug, com o catálogo atualizado"""
+        self.atualizar()
+        return [self.albuns[slug] for slug in sorted(self.albuns)]
+
+    def obter(self, slug):
+        if self.albuns is None:
+            self.atualizar()
+        return self.albuns.get(slug)
+
+    def __contains__(self, slug):
+        return self.obter(slug) is not None
@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import json
+import sys
+
+ARQUIVO_TOKENS = 'tokens.json'
+# Os módulos do sistema só são importados dentro do subcomando que os usa:
+# a inicialização fica no custo do argparse e consultas não gravam nada.
+
+
+def _sessao():
+    # Sem criar_arquivos_base: consultas não criam pastas nem arquivos
+    from sessao import SessaoTokens
+    return SessaoTokens(ARQUIVO_TOKENS)
+
+
+def _resumo_token(token, dados):
+    return {
+        'token': token,
+        'cliente': dados['cliente'],
+        'categoria': dados['categoria'],
+        'albuns': dados.get('pastas_permitidas') or ([dados['pasta']] if dados.get('pasta') else []),
+        'ativo': dados['ativo'],
+        'criado_em': dados['criado_em'],
+        'expira_em': dados['expira_em'],
+        'total_acessos': dados.get('total_acessos', 0),
+        'total_downloads': dados.get('total_downloads', 0),
+        'ultimo_acesso': dados.get('ultimo_acesso'),
+    }
+
+
+def _backup(sessao):
+    from backup import BackupTokens
+    with sessao.store.trava:
+        return BackupTokens().criar(sessao.tokens())
+
+
+def cmd_create(args):
+    from gerar_token import CATEGORIAS, GerenciadorTokens, montar_link_whatsapp, normalizar_whatsapp
+
+    gt = GerenciadorTokens()
+    albuns = [album[:-5] if album.lower().endswith('.json') else album for album in args.album]
+    desconhecidos = [album for album in albuns if album not in gt.catalogo]
+    if desconhecidos:
+        raise ValueError(f"álbum(ns) não encontrado(s) em /fotos: {', '.join(desconhecidos)}")
+    categoria = CATEGORIAS.get(args.categoria, args.categoria)
+    if categoria not in CATEGORIAS.values():
+        raise ValueError(f"categoria inválida: {args.categoria}")
+
+    whatsapp = normalizar_whatsapp(args.whatsapp or '')
+    token = gt.novo_token()
+    dados = gt.montar_dados_token(args.cliente, categoria, albuns, whatsapp, args.dias)
+    gt.sessao.criar(token, dados)
+    if not args.sem_backup:
+        _backup(gt.sessao)
+    resultado = _resumo_token(token, dados)
+    resultado['link'] = montar_link_whatsapp(args.cliente, token, args.dias, whatsapp)
+    return resultado
+
+
+def _arquivo_frio(sessao):
+    from varredura import ArquivoFrio, arquivo_frio
+    return ArquivoFrio(arquivo_frio(sessao.arquivo_tokens))
+
+
+def cmd_list(args):
+    from datetime import datetime
+
+    agora = datetime.now().isoformat()
+    sessao = _sessao()
+    tokens = sessao.tokens()
+    resultado = [
+        _resumo_token(token, dados) for token, dados in tokens.items()
+        if not args.ativos or (dados['ativo'] and dados['expira_em'] > agora)
+    ]
+    if args.arquivados and not args.ativos:
+        for token, dados, arquivado_em in _arquivo_frio(sessao).ler():
+            if token not in tokens:
+                resultado.append(dict(_resumo_token(token, dados), arquivado_em=arquivado_em))
+    return resultado
+
+
+def cmd_expiring(args):
+    sessao = _sessao()
+    tokens = sessao.tokens()
+    return [_resumo_token(token, tokens[token])
+            for _, token in sessao.indice_expiracao(salvar=False).expirando(args.dias)]
+
+
+def cmd_deactivate(args):
+    sessao = _sessao()
+    dados = sessao.obter(args.token)
+    if dados is None:
+        raise ValueError(f"token não encontrado: {args.token}")
+    alterado = dados['ativo']
+    if alterado:
+        sessao.desativar(args.token)
+        if not args.sem_backup:
+            _backup(sessao)
+    return {'token': args.token, 'desativado': alterado, 'ja_estava_inativo': not alterado}
+
+
+def cmd_stats(args):
+    from datetime import datetime
+    from armazenamento import estatisticas_categoria
+
+    # Pela sessão, como o list: registros antigos ainda não migrados já vêm com os totais
+    sessao = _sessao()
+    tokens = sessao.tokens()
+    agora = datetime.now().isoformat()
+    ativos = sum(1 for dados in tokens.values() if dados['ativo'])
+    resultado = {
+        'backend': sessao.store.nome,
+        'total': len(tokens),
+        'ativos': ativos,
+        'inativos': len(tokens) - ativos,
+        # Ainda marcados como ativos, mas com a validade vencida
+        'vencidos': sum(1 for dados in tokens.values() if dados['ativo'] and dados['expira_em'] <= agora),
+        'categorias': estatisticas_categoria(tokens),
+    }
+    if args.arquivados:
+        from varredura import agregar_arquivados
+        resultado['arquivados'] = agregar_arquivados(_arquivo_frio(sessao))
+    return resultado
+
+
+def cmd_sweep(args):
+    from varredura import agendar, varrer
+
+    sessao = _sessao()
+    if args.simular:
+        return varrer(sessao, args.dias, simular=True)
+
+    def varrer_com_backup():
+        previa = varrer(sessao, args.dias, simular=True)
+        if not args.sem_backup and (previa['desativados'] or previa['arquivados']):
+            _backup(sessao)
+        return varrer(sessao, args.dias)
+
+    if args.repetir is None:
+        return varrer_com_backup()
+
+    # Modo agendador: uma linha JSON por rodada no stdout real (o main desvia o print para o stderr)
+    rodadas = []
+
+    def registrar(resultado):
+        rodadas.append(resultado)
+        sys.__stdout__.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+        sys.__stdout__.flush()
+
+    def rodada(_sessao, dias):
+        return varrer_com_backup()
+
+    try:
+        agendar(sessao, args.repetir, args.dias, ao_varrer=registrar, vezes=args.vezes, varrer=rodada)
+    except KeyboardInterrupt:
+        pass
+    return {
+        'rodadas': len(rodadas),
+        'desativados': sum(r['desativados'] for r in rodadas),
+        'arquivados': sum(r['arquivados'] for r in rodadas),
+    }
+
+
+def cmd_migrate(args):
+    sessao = _sessao()
+    return {'migrados': sessao.migrar_historico(), 'total_tokens': len(sessao.tokens())}
+
+
+def cmd_bundle(args):
+    import os
+    from pacotes_zip import iterar_pacote, pacote_token
+
+    albuns, pacotes, faltando = pacote_token(args.token, _sessao(), espelho=args.espelho)
+    if faltando:
+        print(f"⚠️  {faltando} foto(s) sem arquivo local ficaram fora do ZIP")
+    saida = args.saida or f"{args.token}.zip"
+    temporario = f"{saida}.tmp"
+    tamanho = 0
+    with open(temporario, 'wb') as f:
+        for bloco in iterar_pacote(pacotes):
+            f.write(bloco)
+            tamanho += len(bloco)
+    os.replace(temporario, saida)
+    return {'token': args.token, 'albuns': albuns, 'arquivo': saida, 'bytes': tamanho, 'pacotes': pacotes,
+            'faltando': faltando}
+
+
+def cmd_backup(args):
+    from backup import BackupTokens
+
+    backups = BackupTokens()
+    if args.acao == 'list':
+        return backups.carregar_indice()
+    if args.acao == 'create':
+        return _backup(_sessao())
+    if args.acao == 'prune':
+        return {'removidos': [entrada['arquivo'] for entrada in backups.podar(args.valor or 5)]}
+    if args.acao == 'restore':
+        if args.valor is None:
+            raise ValueError("informe a posição do backup (veja 'backup list')")
+        sessao = _sessao()
+        _backup(sessao)
+        with backups.abrir(args.valor) as fluxo:
+            sessao.substituir_json(fluxo)
+        return {'restaurado': args.valor, 'total_tokens': len(sessao.tokens())}
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog='tokens', description="Gerenciamento de tokens em linha de comando (saída em JSON)",
+        epilog="Mensagens informativas vão para o stderr; o stdout recebe só o JSON.")
+    parser.add_argument('--indent', type=int, default=None, help="indentação do JSON de saída")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    create = sub.add_parser('create', help="gera um token")
+    create.add_argument('--cliente', required=True)
+    create.add_argument('--categoria', default='Outros', help="nome ou número (1-4)")
+    create.add_argument('--album', action='append', default=[], help="álbum liberado (repita para vários)")
+    create.add_argument('--whatsapp', default='')
+    create.add_argument('--dias', type=int, default=30)
+    create.add_argument('--sem-backup', action='store_true')
+    create.set_defaults(funcao=cmd_create)
+
+    listar = sub.add_parser('list', help="lista os tokens")
+    listar.add_argument('--ativos', action='store_true', help="só ativos e não expirados")
+    listar.add_argument('--arquivados', action='store_true', help="inclui os tokens do arquivo frio")
+    listar.set_defaults(funcao=cmd_list)
+
+    expiring = sub.add_parser('expiring', help="tokens que expiram nos próximos dias")
+    expiring.add_argument('--dias', type=int, default=7)
+    expiring.set_defaults(funcao=cmd_expiring)
+
+    deactivate = sub.add_parser('deactivate', help="desativa um token")
+    deactivate.add_argument('token')
+    deactivate.add_argument('--sem-backup', action='store_true')
+    deactivate.set_defaults(funcao=cmd_deactivate)
+
+    stats = sub.add_parser('stats', help="totais e estatísticas por categoria")
+    stats.add_argument('--arquivados', action='store_true', help="soma também o arquivo frio")
+    stats.set_defaults(funcao=cmd_stats)
+
+    sweep = sub.add_parser('sweep', help="desativa os vencidos e arquiva os inativos antigos")
+    sweep.add_argument('--dias', type=int, default=90, help="arquiva inativos há mais de N dias (padrão: 90)")
+    sweep.add_argument('--simular', action='store_true', help="só conta, sem gravar nada")
+    sweep.add_argument('--repetir', type=float, metavar='HORAS', help="continua rodando a cada HORAS")
+    sweep.add_argument('--vezes', type=int, help="com --repetir: para depois de N rodadas")
+    sweep.add_argument('--sem-backup', action='store_true')
+    sweep.set_defaults(funcao=cmd_sweep)
+
+    migrate = sub.add_parser('migrate', help="move o histórico de tokens antigos para o log de acessos")
+    migrate.set_defaults(funcao=cmd_migrate)
+
+    bundle = sub.add_parser('bundle', help="ZIP com todos os álbuns liberados para o token")
+    bundle.add_argument('token')
+    bundle.add_argument('-o', '--saida', help="arquivo ZIP (padrão: <token>.zip)")
+    bundle.add_argument('--espelho', help="cópia local dos originais, em <espelho>/<album>/<nome>")
+    bundle.set_defaults(funcao=cmd_bundle)
+
+    backup = sub.add_parser('backup', help="pontos de restauração")
+    backup.add_argument('acao', choices=('list', 'create', 'prune', 'restore'))
+    backup.add_argument('valor', nargs='?', type=int, help="prune: quantos manter; restore: posição")
+    backup.set_defaults(funcao=cmd_backup)
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    from armazenamento import ConflitoEscrita
+
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            resultado = args.funcao(args)
+    except (OSError, ValueError, IndexError, KeyError, ConflitoEscrita) as e:
+        print(json.dumps({'erro': str(e)}, ensure_ascii=False), file=sys.stderr)
+        return 1
+    print(json.dumps(resultado, ensure_ascii=False, indent=args.indent))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from collections import Counter
+
+# Campos repetidos em todas as fotos que vão para o índice do álbum
+CAMPOS_COMPARTILHADOS = {'album': 'a', 'data': 'dt', 'descricao': 'd'}
+# URLs do Drive reduzidas ao ID quando seguem o mesmo modelo
+CAMPOS_URL = {'url': 'u', 'thumbnail': 't', 'preview': 'p'}
+PADRAO_ID_DRIVE = re.compile(r'[?&]id=([\w-]+)')
+VERSAO_FORMATO = 1
+
+
+def id_drive(foto):
+    """ID do arquivo no Drive, extraído da primeira URL que o contenha"""
+    for campo in CAMPOS_URL:
+        encontrado = PADRAO_ID_DRIVE.search(foto.get(campo) or '')
+        if encontrado:
+            return encontrado.group(1)
+    return None
+
+
+def modelo_url(fotos, campo):
+    """Modelo com ``{id}`` que reproduz exatamente a URL da maioria das fotos"""
+    candidatos = Counter()
+    for foto in fotos:
+        url, ident = foto.get(campo), id_drive(foto)
+        if url and ident and url.count(ident) == 1:
+            candidatos[url.replace(ident, '{id}')] += 1
+    return candidatos.most_common(1)[0][0] if candidatos else None
+
+
+def compactar_album(fotos, tamanho_pagina=30):
+    """Converte a lista de fotos de ``fotos/<album>.json`` em (índice, páginas)"""
+    compartilhado = {}
+    for campo in CAMPOS_COMPARTILHADOS:
+        valores = Counter(foto.get(campo, '') for foto in fotos)
+        compartilhado[campo] = valores.most_common(1)[0][0] if valores else ''
+    modelos = {campo: modelo_url(fotos, campo) for campo in CAMPOS_URL}
+
+    compactas = []
+    for foto in fotos:
+        item = {'n': foto.get('nome', '')}
+        ident = id_drive(foto)
+        if ident:
+            item['i'] = ident
+        for campo, chave in CAMPOS_COMPARTILHADOS.items():
+            if foto.get(campo, '') != compartilhado[campo]:
+                item[chave] = foto.get(campo, '')
+        for campo, chave in CAMPOS_URL.items():
+            url = foto.get(campo)
+            if not url:
+                continue
+            modelo = modelos[campo]
+            if not (ident and modelo and modelo.replace('{id}', ident) == url):
+                item[chave] = url
+        extras = {k: v for k, v in foto.items()
+                  if k not in CAMPOS_COMPARTILHADOS and k not in CAMPOS_URL and k != 'nome'}
+        if extras:
+            item['x'] = extras
+        compactas.append(item)
+
+    paginas = [compactas[i:i + tamanho_pagina] for i in range(0, len(compactas), tamanho_pagina)]
+    indice = dict(compartilhado)
+    indice.update({
+        'versao': VERSAO_FORMATO,
+        'total': len(fotos),
+        'tamanho_pagina': tamanho_pagina,
+        'paginas': [f"p{numero}.json" for numero in range(1, len(paginas) + 1)],
+        'capa': compactas[0] if compactas else None,
+        'modelos': {campo: modelo for campo, modelo in modelos.items() if modelo},
+    })
+    return indice, paginas
+
+
+def expandir_foto(indice, item):
+    """Inverso de ``compactar_album`` para uma foto (útil para conferência)"""
+    foto = {'nome': item['n']}
+    for campo, chave in CAMPOS_COMPARTILHADOS.items():
+        foto[campo] = item.get(chave, indice.get(campo, ''))
+    for campo, chave in CAMPOS_URL.items():
+        if chave in item:
+            foto[campo] = item[chave]
+        elif 'i' in item and campo in indice['modelos']:
+            foto[campo] = indice['modelos'][campo].replace('{id}', item['i'])
+    foto.update(item.get('x', {}))
+    return foto
+
+
+def _json_minificado(dados):
+    return json.dumps(dados, ensure_ascii=False, separators=(',', ':'))
+
+
+def compilar_album(caminho_json, pasta_saida, tamanho_pagina=30, forcar=False):
+    """Compila um álbum em ``pasta_saida/`` (indice.json + p1.json, p2.json...).
+
+    Retorna False quando o álbum já estava compilado a partir do mesmo conteúdo.
+    """
+    with open(caminho_json, 'rb') as f:
+        bruto = f.read()
+    hash_origem = hashlib.sha256(bruto).hexdigest()
+
+    arquivo_indice = os.path.join(pasta_saida, 'indice.json')
+    if not forcar:
+        try:
+            with open(arquivo_indice, 'r', encoding='utf-8') as f:
+                atual = json.load(f)
+            if atual.get('hash_origem') == hash_origem and atual.get('tamanho_pagina') == tamanho_pagina:
+                return False
+        except (OSError, ValueError):
+            pass
+
+    indice, paginas = compactar_album(json.loads(bruto.decode('utf-8')), tamanho_pagina)
+    indice['hash_origem'] = hash_origem
+
+    if os.path.isdir(pasta_saida):
+        shutil.rmtree(pasta_saida)
+    os.makedirs(pasta_saida)
+    for nome, pagina in zip(indice['paginas'], paginas):
+        with open(os.path.join(pasta_saida, nome), 'w', encoding='utf-8') as f:
+            f.write(_json_minificado(pagina))
+    # O índice é gravado por último: sem ele a galeria usa o JSON original
+    temporario = arquivo_indice + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(_json_minificado(indice))
+    os.replace(temporario, arquivo_indice)
+    return True
+
+
+def compilar_todos(pasta_fotos='fotos', tamanho_pagina=30, forcar=False):
+    """Compila cada ``fotos/<album>.json`` em ``fotos/<album>/``"""
+    compilados = []
+    for nome in sorted(os.listdir(pasta_fotos)):
+        if not nome.lower().endswith('.json'):
+            continue
+        slug = nome[:-5]
+        if compilar_album(os.path.join(pasta_fotos, nome), os.path.join(pasta_fotos, slug),
+                          tamanho_pagina, forcar):
+            compilados.append(slug)
+    return compilados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compila os álbuns de fotos/ em páginas JSON minificadas")
+    parser.add_argument('--pasta', default='fotos', help="pasta com os <album>.json (padrão: fotos)")
+    parser.add_argument('--pagina', type=int, default=30, help="fotos por página (padrão: 30)")
+    parser.add_argument('--forcar', action='store_true', help="recompila mesmo sem alterações")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.pasta):
+        print(f"❌ Pasta não encontrada: {args.pasta}")
+        return 1
+    compilados = compilar_todos(args.pasta, args.pagina, args.forcar)
+    for slug in compilados:
+        print(f"📦 {slug}")
+    print(f"✅ {len(compilados)} álbum(ns) compilado(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
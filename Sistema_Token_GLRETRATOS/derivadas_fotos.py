@@ -0,0 +1,376 @@
+import argparse
+import functools
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from armazenamento import escrever_json
+from compilar_albuns import compilar_album
+
+try:
+    from PIL import Image, ImageDraw, ImageFont, ImageOps
+except ImportError:  # Pillow só é necessário para gerar as derivadas
+    Image = ImageDraw = ImageFont = ImageOps = None
+
+EXTENSOES = ('.jpg', '.jpeg', '.png', '.webp', '.tif', '.tiff')
+PASTA_DERIVADAS = 'fotos/_derivadas'
+# Campo do manifesto -> (largura máxima, formato); a maior também é a do download
+TAMANHOS_PADRAO = {'url': (2560, 'jpeg'), 'thumbnail': (400, 'webp'), 'preview': (1600, 'webp')}
+QUALIDADE = {'webp': 80, 'jpeg': 88}
+EXTENSAO_FORMATO = {'webp': '.webp', 'jpeg': '.jpg'}
+# Mesmo texto e dourado da marca d'água que a galeria desenhava por CSS
+MARCA_PADRAO = {
+    'texto': 'GABRIEL LIMA RETRATOS',
+    'cor': [212, 175, 55],
+    'opacidade': 0.35,
+    'angulo': 30,
+    'escala': 0.06,  # altura da letra em relação à largura da foto
+    'repetir': True,
+    'fonte': None,  # caminho de uma fonte TrueType; sem ela, a fonte padrão do Pillow
+}
+
+
+def hash_arquivo(caminho, bloco=1 << 20):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for parte in iter(lambda: f.read(bloco), b''):
+            resumo.update(parte)
+    return resumo.hexdigest()
+
+
+def _ordem_natural(nome):
+    return [int(parte) if parte.isdigit() else parte.lower() for parte in re.split(r'(\d+)', nome)]
+
+
+def listar_originais(pasta):
+    """Fotos de ``pasta`` (sem subpastas), em ordem natural de nome"""
+    with os.scandir(pasta) as entradas:
+        nomes = [entrada.name for entrada in entradas
+                 if entrada.is_file() and entrada.name.lower().endswith(EXTENSOES)]
+    return [os.path.join(pasta, nome) for nome in sorted(nomes, key=_ordem_natural)]
+
+
+def nome_derivada(hash_origem, largura, formato, chave_marca=None):
+    """Caminho relativo da derivada: o mesmo original gera o mesmo arquivo em qualquer álbum"""
+    sufixo = f"_m{chave_marca}" if chave_marca else ''
+    return (f"{hash_origem[:2]}/{hash_origem[:20]}_w{largura}_q{QUALIDADE[formato]}{sufixo}"
+            f"{EXTENSAO_FORMATO[formato]}")
+
+
+def chave_marca(marca):
+    """Identifica a configuração da marca d'água (inclusive o conteúdo da fonte).
+
+    Entra no nome das derivadas marcadas: mudar texto, cor ou fonte gera
+    nomes novos e só essas versões são renderizadas de novo.
+    """
+    resumo = hashlib.sha256(json.dumps(marca, sort_keys=True).encode('utf-8'))
+    if marca.get('fonte'):
+        resumo.update(hash_arquivo(marca['fonte']).encode('ascii'))
+    return resumo.hexdigest()[:8]
+
+
+def _fonte(marca, tamanho):
+    if marca.get('fonte'):
+        return ImageFont.truetype(marca['fonte'], tamanho)
+    try:
+        return ImageFont.load_default(size=tamanho)
+    except TypeError:  # Pillow antigo, sem fonte padrão escalável
+        return ImageFont.load_default()
+
+
+# Fotos até 1:2 (retrato) usam a máscara guardada para a largura; mais altas são desenhadas na hora
+PROPORCAO_MAXIMA = 2
+
+
+def _desenhar_mascara(largura, altura, marca):
+    """Transparência da marca (modo L) para uma foto ``largura`` x ``altura``"""
+    fonte = _fonte(marca, max(10, int(largura * marca['escala'])))
+    esquerda, topo, direita, base = fonte.getbbox(marca['texto'])
+    largura_texto, altura_texto = direita - esquerda, base - topo
+    # Camada quadrada com a diagonal da foto: depois de girada ainda cobre tudo
+    lado = int(math.hypot(largura, altura)) + 1
+    mascara = Image.new('L', (lado, lado), 0)
+    desenho = ImageDraw.Draw(mascara)
+    opacidade = int(255 * marca['opacidade'])
+    centro_y = (lado - altura_texto) // 2
+    if marca.get('repetir'):
+        passo_x, passo_y = largura_texto + 3 * altura_texto, 4 * altura_texto
+        for linha, y in enumerate(range(centro_y % passo_y - passo_y, lado, passo_y)):
+            for x in range(-passo_x + (passo_x // 2) * (linha % 2), lado, passo_x):
+                desenho.text((x - esquerda, y - topo), marca['texto'], font=fonte, fill=opacidade)
+    else:
+        desenho.text(((lado - largura_texto) // 2 - esquerda, centro_y - topo), marca['texto'],
+                     font=fonte, fill=opacidade)
+    mascara = mascara.rotate(marca['angulo'], resample=Image.BICUBIC)
+    x, y = (lado - largura) // 2, (lado - altura) // 2
+    return mascara.crop((x, y, x + largura, y + altura))
+
+
+@functools.lru_cache(maxsize=4)
+def _mascara_largura(largura, configuracao):
+    """Máscara da marca para a largura de uma derivada, na altura máxima de retrato.
+
+    Guardada com um byte por pixel, uma por largura em cada processo (as
+    derivadas marcadas têm poucas larguras): toda foto dessa largura usa
+    um recorte do centro, então o desenho não depende da ordem das fotos.
+    """
+    return _desenhar_mascara(largura, largura * PROPORCAO_MAXIMA, json.loads(configuracao))
+
+
+def _mascara_marca(largura, altura, configuracao):
+    if altura > largura * PROPORCAO_MAXIMA:
+        return _desenhar_mascara(largura, altura, json.loads(configuracao))
+    mascara = _mascara_largura(largura, configuracao)
+    topo = (mascara.height - altura) // 2
+    return mascara.crop((0, topo, largura, topo + altura))
+
+
+def aplicar_marca(imagem, marca):
+    """Cópia de ``imagem`` com o texto da marca inclinado e semitransparente.
+
+    O tamanho da letra acompanha a largura, então miniatura e download têm
+    a mesma aparência. Com ``repetir`` o texto cobre a foto em faixas
+    diagonais e não some com um simples recorte.
+    """
+    mascara = _mascara_marca(imagem.width, imagem.height, json.dumps(marca, sort_keys=True))
+    resultado = imagem.copy()
+    resultado.paste(tuple(marca['cor']), (0, 0, imagem.width, imagem.height), mascara)
+    return resultado
+
+
+def data_exif(imagem):
+    """Data de captura (AAAA-MM-DD) gravada pela câmera, se houver"""
+    exif = imagem.getexif()
+    bruto = exif.get_ifd(0x8769).get(36867) or exif.get(306)  # DateTimeOriginal / DateTime
+    try:
+        return datetime.strptime(str(bruto).strip(), '%Y:%m:%d %H:%M:%S').date().isoformat()
+    except ValueError:
+        return None
+
+
+def renderizar(tarefa):
+    """Executado nos processos: hash, data e as derivadas que faltam de uma foto"""
+    caminho, hash_origem, variantes, destino, marca = tarefa
+    hash_origem = hash_origem or hash_arquivo(caminho)
+    faltando = sorted(
+        (variante for variante in set(variantes.values())
+         if not os.path.exists(os.path.join(destino, nome_derivada(hash_origem, *variante)))),
+        key=lambda variante: variante[0], reverse=True,
+    )
+    with Image.open(caminho) as original:
+        data = data_exif(original)
+        if faltando:
+            # JPEG grande: decodifica já reduzido quando a maior derivada permitir
+            original.draft('RGB', (faltando[0][0], faltando[0][0]))
+            imagem = ImageOps.exif_transpose(original).convert('RGB')
+            for largura, formato, marcada in faltando:
+                # Da maior para a menor, cada redução parte da anterior (sempre sem marca)
+                imagem.thumbnail((largura, imagem.height), Image.LANCZOS)
+                final = aplicar_marca(imagem, marca) if marcada else imagem
+                saida = os.path.join(destino, nome_derivada(hash_origem, largura, formato, marcada))
+                os.makedirs(os.path.dirname(saida), exist_ok=True)
+                temporario = f"{saida}.{os.getpid()}.tmp"
+                if formato == 'webp':
+                    final.save(temporario, 'WEBP', quality=QUALIDADE[formato], method=4)
+                else:
+                    final.save(temporario, 'JPEG', quality=QUALIDADE[formato], optimize=True, progressive=True)
+                os.replace(temporario, saida)
+    return caminho, hash_origem, data, len(faltando)
+
+
+class CacheOriginais:
+    """``cache.json`` na pasta das derivadas: caminho -> mtime, tamanho, hash e data.
+
+    Originais com o mesmo ``mtime``/tamanho não são relidos; com o hash
+    em mãos, basta conferir se as derivadas já existem.
+    """
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        try:
+            with open(arquivo, 'r', encoding='utf-8') as f:
+                self.entradas = json.load(f)
+        except (OSError, ValueError):
+            self.entradas = {}
+
+    def obter(self, caminho):
+        entrada = self.entradas.get(os.path.abspath(caminho))
+        if not entrada:
+            return None
+        info = os.stat(caminho)
+        if (entrada['mtime_ns'], entrada['bytes']) != (info.st_mtime_ns, info.st_size):
+            return None
+        return entrada
+
+    def guardar(self, caminho, hash_origem, data):
+        info = os.stat(caminho)
+        self.entradas[os.path.abspath(caminho)] = {
+            'mtime_ns': info.st_mtime_ns, 'bytes': info.st_size, 'hash': hash_origem, 'data': data,
+        }
+
+    def salvar(self):
+        os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+        escrever_json(self.arquivo, self.entradas)
+
+
+def _manifesto_atual(caminho):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return {foto.get('nome'): foto for foto in json.load(f) if isinstance(foto, dict)}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def variantes_manifesto(tamanhos, marca=None):
+    """Campo do manifesto -> (largura, formato, chave da marca ou None).
+
+    Com marca d'água, ``url``, ``thumbnail`` e ``preview`` saem marcadas e
+    ``download`` guarda o JPEG limpo do maior tamanho, para clientes autenticados.
+    """
+    if not marca:
+        return {campo: (largura, formato, None) for campo, (largura, formato) in tamanhos.items()}
+    chave = chave_marca(marca)
+    variantes = {campo: (largura, formato, chave) for campo, (largura, formato) in tamanhos.items()}
+    variantes['download'] = (max(largura for largura, _ in tamanhos.values()), 'jpeg', None)
+    return variantes
+
+
+def gerar_album(origem, slug=None, titulo=None, pasta_fotos='fotos', destino=PASTA_DERIVADAS,
+                url_base=None, tamanhos=None, processos=None, marca=None):
+    """Gera as derivadas das fotos de ``origem`` e grava ``fotos/<slug>.json``.
+
+    Retorna (fotos no álbum, fotos renderizadas agora). Só originais novos
+    ou alterados são relidos, e só derivadas ausentes são geradas: trocar a
+    ``marca`` renderiza de novo apenas as versões marcadas.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow não está instalado (pip install Pillow)")
+    variantes = variantes_manifesto(tamanhos or TAMANHOS_PADRAO, marca)
+    slug = slug or os.path.basename(os.path.normpath(origem))
+    url_base = (url_base or destino.replace(os.sep, '/')).rstrip('/')
+    cache = CacheOriginais(os.path.join(destino, 'cache.json'))
+    originais = listar_originais(origem)
+
+    conhecidos = {}
+    tarefas = []
+    for caminho in originais:
+        entrada = cache.obter(caminho)
+        if entrada and all(os.path.exists(os.path.join(destino, nome_derivada(entrada['hash'], *variante)))
+                           for variante in variantes.values()):
+            conhecidos[caminho] = entrada
+        else:
+            tarefas.append((caminho, entrada['hash'] if entrada else None, variantes, destino, marca))
+
+    renderizadas = 0
+    if tarefas:
+        with ProcessPoolExecutor(processos) as executor:
+            for caminho, hash_origem, data, geradas in executor.map(renderizar, tarefas, chunksize=4):
+                cache.guardar(caminho, hash_origem, data)
+                conhecidos[caminho] = cache.obter(caminho)
+                renderizadas += bool(geradas)
+        cache.salvar()
+
+    arquivo_manifesto = os.path.join(pasta_fotos, f"{slug}.json")
+    anteriores = _manifesto_atual(arquivo_manifesto)
+    fotos = []
+    for caminho in originais:
+        entrada = conhecidos[caminho]
+        nome = os.path.basename(caminho)
+        anterior = anteriores.get(nome, {})
+        data = entrada['data'] or datetime.fromtimestamp(entrada['mtime_ns'] / 1e9).date().isoformat()
+        foto = {
+            'nome': nome,
+            'album': titulo or anterior.get('album') or slug,
+            'data': anterior.get('data') or data,
+            'descricao': anterior.get('descricao', ''),
+        }
+        for campo, variante in variantes.items():
+            foto[campo] = f"{url_base}/{nome_derivada(entrada['hash'], *variante)}"
+        if marca:
+            foto['marca'] = variantes['url'][2]
+        fotos.append(foto)
+
+    os.makedirs(pasta_fotos, exist_ok=True)
+    escrever_json(arquivo_manifesto, fotos)
+    # Versão compilada existente seria servida no lugar do manifesto novo
+    if os.path.isdir(os.path.join(pasta_fotos, slug)):
+        compilar_album(arquivo_manifesto, os.path.join(pasta_fotos, slug))
+    return len(fotos), renderizadas
+
+
+def limpar_orfas(pasta_fotos='fotos', destino=PASTA_DERIVADAS):
+    """Apaga derivadas que nenhum manifesto de ``pasta_fotos`` usa mais; retorna quantas"""
+    usadas = set()
+    for nome in os.listdir(pasta_fotos):
+        if nome.lower().endswith('.json'):
+            with open(os.path.join(pasta_fotos, nome), 'r', encoding='utf-8') as f:
+                for foto in json.load(f):
+                    usadas.update(os.path.basename(str(valor)) for valor in foto.values())
+    removidas = 0
+    for pasta, _, arquivos in os.walk(destino):
+        for arquivo in arquivos:
+            if arquivo.endswith(tuple(EXTENSAO_FORMATO.values())) and arquivo not in usadas:
+                os.remove(os.path.join(pasta, arquivo))
+                removidas += 1
+    return removidas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gera miniaturas, prévias e versões de download de uma pasta de originais "
+                    "e grava o fotos/<album>.json correspondente")
+    parser.add_argument('origem', help="pasta com os originais (com --todos: uma subpasta por álbum)")
+    parser.add_argument('--album', help="slug do álbum (padrão: nome da pasta)")
+    parser.add_argument('--titulo', help="título exibido (padrão: o do manifesto atual ou o slug)")
+    parser.add_argument('--todos', action='store_true', help="trata cada subpasta de origem como um álbum")
+    parser.add_argument('--pasta', default='fotos', help="pasta dos manifestos (padrão: fotos)")
+    parser.add_argument('--destino', default=PASTA_DERIVADAS, help=f"pasta das derivadas (padrão: {PASTA_DERIVADAS})")
+    parser.add_argument('--url-base', help="prefixo das URLs no manifesto (padrão: o caminho de --destino)")
+    parser.add_argument('--larguras', type=int, nargs=3, metavar=('MINIATURA', 'PREVIA', 'DOWNLOAD'),
+                        help="larguras máximas (padrão: 400 1600 2560)")
+    parser.add_argument('--marca', action='store_true',
+                        help="aplica a marca d'água em url/thumbnail/preview e grava a versão limpa em download")
+    parser.add_argument('--marca-texto', default=MARCA_PADRAO['texto'])
+    parser.add_argument('--marca-opacidade', type=float, default=MARCA_PADRAO['opacidade'])
+    parser.add_argument('--marca-fonte', help="fonte TrueType da marca d'água")
+    parser.add_argument('--limpar', action='store_true', help="apaga derivadas que nenhum manifesto usa mais")
+    parser.add_argument('-p', '--processos', type=int, default=None, help="processos (padrão: núcleos da CPU)")
+    args = parser.parse_args(argv)
+
+    marca = None
+    if args.marca:
+        marca = dict(MARCA_PADRAO, texto=args.marca_texto, opacidade=args.marca_opacidade,
+                     fonte=args.marca_fonte)
+
+    tamanhos = dict(TAMANHOS_PADRAO)
+    if args.larguras:
+        miniatura, previa, download = args.larguras
+        tamanhos = {'url': (download, 'jpeg'), 'thumbnail': (miniatura, 'webp'), 'preview': (previa, 'webp')}
+
+    if args.todos:
+        with os.scandir(args.origem) as entradas:
+            albuns = sorted((entrada.path for entrada in entradas if entrada.is_dir()), key=_ordem_natural)
+    else:
+        albuns = [args.origem]
+
+    try:
+        for pasta in albuns:
+            slug = args.album if not args.todos and args.album else os.path.basename(os.path.normpath(pasta))
+            total, renderizadas = gerar_album(pasta, slug, args.titulo, args.pasta, args.destino,
+                                              args.url_base, tamanhos, args.processos, marca)
+            print(f"🖼️  {slug}: {total} foto(s), {renderizadas} renderizada(s)")
+        if args.limpar:
+            print(f"🧹 {limpar_orfas(args.pasta, args.destino)} derivada(s) sem uso removida(s)")
+    except (OSError, RuntimeError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ Manifestos gravados em {args.pasta}/")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from armazenamento import escrever_json
+from compilar_albuns import compilar_album
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow só é necessário para calcular os hashes
+    Image = ImageOps = None
+
+DISTANCIA_PADRAO = 4  # bits diferentes (de 64) para considerar duas fotos a mesma
+CAMPOS_URL = ('url', 'thumbnail', 'preview')
+
+
+def hash_perceptual(caminho):
+    """dHash de 64 bits: compara o brilho de pixels vizinhos numa versão 9x8 da foto.
+
+    Recortes leves, reexportações, mudança de formato ou de tamanho quase
+    não alteram o hash; fotos diferentes ficam a dezenas de bits de distância.
+    """
+    with Image.open(caminho) as imagem:
+        imagem.draft('L', (64, 64))
+        pequena = ImageOps.exif_transpose(imagem).convert('L').resize((9, 8), Image.LANCZOS)
+    pixels = pequena.tobytes()
+    valor = 0
+    for linha in range(8):
+        for coluna in range(8):
+            valor = (valor << 1) | (pixels[linha * 9 + coluna] > pixels[linha * 9 + coluna + 1])
+    return valor
+
+
+def _calcular(caminho):
+    try:
+        return caminho, hash_perceptual(caminho)
+    except OSError:  # arquivo corrompido ou formato não suportado
+        return caminho, None
+
+
+def distancia(a, b):
+    return (a ^ b).bit_count()
+
+
+class ArvoreBK:
+    """Árvore BK sobre a distância de Hamming entre hashes.
+
+    Cada filho fica na aresta com a distância até o pai; numa busca com
+    raio ``r`` só as arestas entre ``d - r`` e ``d + r`` são visitadas,
+    o que evita comparar a foto nova com todas as outras.
+    """
+
+    def __init__(self):
+        self.raiz = None  # [hash, [itens], filhos]; filhos[d] é o nó à distância d (ou None)
+        self.tamanho = 0
+
+    def adicionar(self, valor, item):
+        self.tamanho += 1
+        if self.raiz is None:
+            self.raiz = [valor, [item], None]
+            return
+        no = self.raiz
+        while True:
+            d = distancia(valor, no[0])
+            if d == 0:
+                no[1].append(item)
+                return
+            if no[2] is None:
+                no[2] = [None] * 65
+            if no[2][d] is None:
+                no[2][d] = [valor, [item], None]
+                return
+            no = no[2][d]
+
+    def buscar(self, valor, raio):
+        """[(distância, item)] de todos os itens a no máximo ``raio`` bits"""
+        encontrados = []
+        pendentes = [self.raiz] if self.raiz else []
+        while pendentes:
+            no = pendentes.pop()
+            d = distancia(valor, no[0])
+            if d <= raio:
+                encontrados.extend((d, item) for item in no[1])
+            if no[2] is not None:
+                # Desigualdade triangular: só filhos com aresta em [d - raio, d + raio]
+                pendentes.extend(filho for filho in no[2][max(1, d - raio):d + raio + 1] if filho is not None)
+        return encontrados
+
+    def __len__(self):
+        return self.tamanho
+
+
+class CacheHashes:
+    """``hashes_perceptuais.json``: caminho -> mtime, tamanho e dHash (hex).
+
+    Ao incluir um álbum, só as fotos que ainda não estão no cache (ou que
+    mudaram) são abertas.
+    """
+
+    def __init__(self, arquivo='hashes_perceptuais.json'):
+        self.arquivo = arquivo
+        try:
+            with open(arquivo, 'r', encoding='utf-8') as f:
+                self.entradas = json.load(f)
+        except (OSError, ValueError):
+            self.entradas = {}
+
+    def obter(self, caminho):
+        entrada = self.entradas.get(os.path.abspath(caminho))
+        info = os.stat(caminho)
+        if entrada and (entrada['mtime_ns'], entrada['bytes']) == (info.st_mtime_ns, info.st_size):
+            return int(entrada['dhash'], 16)
+        return None
+
+    def guardar(self, caminho, valor):
+        info = os.stat(caminho)
+        self.entradas[os.path.abspath(caminho)] = {
+            'mtime_ns': info.st_mtime_ns, 'bytes': info.st_size, 'dhash': f"{valor:016x}",
+        }
+
+    def salvar(self):
+        escrever_json(self.arquivo, self.entradas)
+
+
+def carregar_albuns(pasta_fotos='fotos'):
+    """{slug: lista de fotos} de cada ``fotos/<album>.json``"""
+    albuns = {}
+    for nome in sorted(os.listdir(pasta_fotos)):
+        if nome.lower().endswith('.json'):
+            with open(os.path.join(pasta_fotos, nome), 'r', encoding='utf-8') as f:
+                albuns[nome[:-5]] = json.load(f)
+    return albuns
+
+
+def arquivo_local(foto, slug, espelho=None, raiz='.'):
+    """Arquivo em disco de uma foto do manifesto, ou None.
+
+    Manifestos gerados por ``derivadas_fotos`` apontam para arquivos do
+    próprio site (a miniatura basta para o hash); os demais são procurados
+    no espelho local, em ``<espelho>/<album>/<nome>``.
+    """
+    for campo in ('thumbnail', 'preview', 'url'):
+        url = foto.get(campo) or ''
+        if url and '://' not in url:
+            caminho = os.path.join(raiz, url.lstrip('/'))
+            if os.path.isfile(caminho):
+                return caminho
+    if espelho:
+        caminho = os.path.join(espelho, slug, foto.get('nome', ''))
+        if os.path.isfile(caminho):
+            return caminho
+    return None
+
+
+def calcular_hashes(caminhos, cache, processos=None):
+    """{caminho: dHash} usando o cache e um pool de processos para o que falta"""
+    hashes = {}
+    faltando = []
+    for caminho in caminhos:
+        valor = cache.obter(caminho)
+        if valor is None:
+            faltando.append(caminho)
+        else:
+            hashes[caminho] = valor
+    if faltando:
+        with ProcessPoolExecutor(processos) as executor:
+            for caminho, valor in executor.map(_calcular, faltando, chunksize=16):
+                if valor is not None:
+                    hashes[caminho] = valor
+                    cache.guardar(caminho, valor)
+        cache.salvar()
+    return hashes, len(faltando)
+
+
+def agrupar(fotos_hash, raio=DISTANCIA_PADRAO):
+    """Grupos de fotos parecidas: ``fotos_hash`` é [(dHash, (slug, posição))].
+
+    Cada foto é buscada na árvore antes de ser inserida; vizinhos dentro
+    do raio são unidos (union-find), então A~B e B~C formam um só grupo.
+    """
+    pais = {}
+
+    def raiz(item):
+        while pais[item] != item:
+            pais[item] = pais[pais[item]]
+            item = pais[item]
+        return item
+
+    arvore = ArvoreBK()
+    for valor, item in fotos_hash:
+        pais[item] = item
+        for _, vizinho in arvore.buscar(valor, raio):
+            pais[raiz(vizinho)] = raiz(item)
+        arvore.adicionar(valor, item)
+
+    grupos = {}
+    for item in pais:
+        grupos.setdefault(raiz(item), []).append(item)
+    return sorted((sorted(membros) for membros in grupos.values() if len(membros) > 1),
+                  key=lambda membros: (-len(membros), membros))
+
+
+def urls_do_site(foto):
+    """Se todas as URLs da foto apontam para arquivos do site (e não para o Drive)"""
+    urls = [foto[campo] for campo in CAMPOS_URL if foto.get(campo)]
+    return bool(urls) and all('://' not in url for url in urls)
+
+
+def deduplicar(albuns, grupos, tamanhos):
+    """Aplica os grupos nos manifestos; retorna {slug: (removidas, unificadas)}.
+
+    Repetições dentro do mesmo álbum saem do manifesto. Entre álbuns
+    diferentes a foto continua em cada um (o token pode liberar só um
+    deles). Se as URLs da cópia principal (o maior arquivo) são arquivos
+    do próprio site, as outras cópias passam a usá-las e o navegador baixa
+    a foto uma vez só. URLs do Drive ficam como estão: o compartilhamento
+    é por pasta, e a do outro álbum pode não estar aberta para o cliente.
+    """
+    alteracoes = {}
+    remover = set()
+    for grupo in grupos:
+        principal = max(grupo, key=lambda item: (tamanhos.get(item, 0), -grupo.index(item)))
+        foto_principal = albuns[principal[0]][principal[1]]
+        vistos = {principal[0]}
+        for slug, posicao in grupo:
+            if (slug, posicao) == principal:
+                continue
+            removidas, unificadas = alteracoes.get(slug, (0, 0))
+            if slug in vistos:
+                remover.add((slug, posicao))
+                removidas += 1
+            else:
+                vistos.add(slug)
+                if urls_do_site(foto_principal):
+                    foto = albuns[slug][posicao]
+                    for campo in CAMPOS_URL:
+                        if foto_principal.get(campo):
+                            foto[campo] = foto_principal[campo]
+                    unificadas += 1
+            alteracoes[slug] = (removidas, unificadas)
+    for slug in alteracoes:
+        albuns[slug] = [foto for posicao, foto in enumerate(albuns[slug]) if (slug, posicao) not in remover]
+    return alteracoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Encontra fotos repetidas entre os álbuns de fotos/ por hash perceptual")
+    parser.add_argument('--pasta', default='fotos', help="pasta dos manifestos (padrão: fotos)")
+    parser.add_argument('--espelho', help="cópia local dos originais, em <espelho>/<album>/<nome>")
+    parser.add_argument('--raio', type=int, default=DISTANCIA_PADRAO,
+                        help=f"bits diferentes tolerados (padrão: {DISTANCIA_PADRAO})")
+    parser.add_argument('--cache', default='hashes_perceptuais.json')
+    parser.add_argument('--aplicar', action='store_true',
+                        help="remove repetidas no mesmo álbum e unifica URLs locais entre álbuns")
+    parser.add_argument('-p', '--processos', type=int, default=None, help="processos (padrão: núcleos da CPU)")
+    args = parser.parse_args(argv)
+
+    if Image is None:
+        print("❌ Pillow não está instalado (pip install Pillow)")
+        return 1
+    if not os.path.isdir(args.pasta):
+        print(f"❌ Pasta não encontrada: {args.pasta}")
+        return 1
+
+    albuns = carregar_albuns(args.pasta)
+    locais = {}
+    sem_arquivo = 0
+    for slug, fotos in albuns.items():
+        for posicao, foto in enumerate(fotos):
+            caminho = arquivo_local(foto, slug, args.espelho)
+            if caminho:
+                locais[(slug, posicao)] = caminho
+            else:
+                sem_arquivo += 1
+
+    hashes, calculados = calcular_hashes(sorted(set(locais.values())), CacheHashes(args.cache), args.processos)
+    print(f"🔎 {len(locais)} foto(s) com arquivo local, {calculados} hash(es) calculado(s) agora"
+          + (f", {sem_arquivo} sem arquivo local" if sem_arquivo else ""))
+
+    grupos = agrupar([(hashes[caminho], item) for item, caminho in locais.items() if caminho in hashes], args.raio)
+    if not grupos:
+        print("✅ Nenhuma foto repetida encontrada.")
+        return 0
+
+    for numero, grupo in enumerate(grupos, 1):
+        entre_albuns = len({slug for slug, _ in grupo}) > 1
+        print(f"\n📸 Grupo {numero}: {len(grupo)} foto(s)" + (" em álbuns diferentes" if entre_albuns else ""))
+        for slug, posicao in grupo:
+            print(f"   • {slug} / {albuns[slug][posicao].get('nome', '')}")
+
+    if args.aplicar:
+        tamanhos = {item: os.path.getsize(caminho) for item, caminho in locais.items()}
+        alteracoes = deduplicar(albuns, grupos, tamanhos)
+        for slug, (removidas, unificadas) in sorted(alteracoes.items()):
+            if not (removidas or unificadas):
+                continue  # só cópias no Drive de outro álbum: ficam apenas no relatório
+            arquivo = os.path.join(args.pasta, f"{slug}.json")
+            escrever_json(arquivo, albuns[slug])
+            if os.path.isdir(os.path.join(args.pasta, slug)):
+                compilar_album(arquivo, os.path.join(args.pasta, slug))
+            print(f"🧹 {slug}: {removidas} removida(s), {unificadas} com URL unificada")
+    else:
+        print("\n💡 Use --aplicar para remover repetidas no mesmo álbum e unificar as URLs locais entre álbuns.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
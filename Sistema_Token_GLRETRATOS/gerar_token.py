@@ -1,48 +1,34 @@
-import uuid
-import json
-import os
 import re
-import shutil
 from datetime import datetime, timedelta
 from urllib.parse import quote_plus
+from backup import BackupTokens
+from catalogo_albuns import CatalogoAlbuns
+from perfil import cronometrar
+from sessao import obter_sessao
+
+CATEGORIAS = {"1": "Batizados", "2": "Gestantes", "3": "Missas", "4": "Outros"}
 
 class GerenciadorTokens:
     def __init__(self):
         self.arquivo_tokens = 'tokens.json'
         self.arquivo_backup = 'backup_tokens/'
-        self.arquivo_logs = 'logs_acesso.json'
-        self.criar_arquivos_base()
+        self.pasta_logs = 'logs_acesso'
+        # Tokens lidos e arquivos base ficam na sessão compartilhada do processo
+        self.sessao = obter_sessao()
+        self.store = self.sessao.store
+        self.backups = BackupTokens(self.arquivo_backup.rstrip('/'))
         self.pasta_fotos = 'fotos'
+        self.pasta_shards = self.sessao.pasta_shards
+        self.catalogo = CatalogoAlbuns(self.pasta_fotos)
     
     def criar_arquivos_base(self):
         """Cria arquivos e pastas base se não existirem"""
-        if not os.path.exists(self.arquivo_tokens):
-            with open(self.arquivo_tokens, 'w', encoding='utf-8') as f:
-                json.dump({}, f)
-        
-        if not os.path.exists('backup_tokens'):
-            os.makedirs('backup_tokens')
-            
-        if not os.path.exists(self.arquivo_logs):
-            with open(self.arquivo_logs, 'w', encoding='utf-8') as f:
-                json.dump([], f)
+        self.sessao.criar_arquivos_base()
     
+    @cronometrar('albuns.listar')
     def listar_albuns_disponiveis(self):
-        """Retorna lista de arquivos JSON disponíveis em /fotos"""
-        if not os.path.isdir(self.pasta_fotos):
-            return []
-        albuns = []
-        for nome in sorted(os.listdir(self.pasta_fotos)):
-            if not nome.lower().endswith('.json'):
-                continue
-            slug = nome[:-5]
-            titulo = slug.replace('_', ' ').strip() or slug
-            albuns.append({
-                'arquivo': nome,
-                'slug': slug,
-                'titulo': titulo
-            })
-        return albuns
+        """Retorna os álbuns de /fotos a partir do catálogo (só relê os alterados)"""
+        return self.catalogo.listar()
 
     def solicitar_pastas_permitidas(self, cliente):
         """Permite escolher quais pastas/álbuns o cliente poderá acessar"""
@@ -57,7 +43,7 @@ class GerenciadorTokens:
         print("📁 ÁLBUNS DISPONÍVEIS")
         print("-" * 30)
         for idx, album in enumerate(albuns, 1):
-            print(f"{idx:2d}. {album['titulo']}  ({album['slug']})")
+            print(f"{idx:2d}. {album['titulo']}  ({album['slug']}) - {album['fotos']} foto(s)")
         print("-" * 30)
         print("Digite os números separados por vírgula para selecionar múltiplos álbuns.")
         print("Use '*' para liberar todos os álbuns ou informe o nome manualmente.")
@@ -85,17 +71,20 @@ class GerenciadorTokens:
                     slug = parte
                     if slug.lower().endswith('.json'):
                         slug = slug[:-5]
-                    if slug:
+                    if slug in self.catalogo:
                         selecionados.add(slug)
+                    elif slug:
+                        print(f"⚠️  Álbum '{slug}' não encontrado em /fotos.")
 
             if selecionados:
                 return sorted(selecionados)
 
             print("❌ Nenhum álbum válido foi selecionado. Tente novamente.")
 
+    @cronometrar('tokens.gerar')
     def gerar_token(self):
         """Gera um novo token para cliente"""
-        token = str(uuid.uuid4())[:12]  # Gera token de 12 caracteres
+        token = self.novo_token()
         
         print("\n" + "="*50)
         print("🆕 NOVO TOKEN PARA CLIENTE")
@@ -111,11 +100,9 @@ class GerenciadorTokens:
         print("4. Outros")
         
         cat_opcao = input("📂 Escolha a categoria (1-4): ").strip()
-        categorias = {"1": "Batizados", "2": "Gestantes", "3": "Missas", "4": "Outros"}
-        categoria = categorias.get(cat_opcao, "Outros")
+        categoria = CATEGORIAS.get(cat_opcao, "Outros")
         
         pastas_permitidas = self.solicitar_pastas_permitidas(cliente)
-        pasta_principal = pastas_permitidas[0] if pastas_permitidas else ""
         whatsapp = self.solicitar_whatsapp(cliente)
         
         # Configurações avançadas
@@ -126,30 +113,12 @@ class GerenciadorTokens:
         dias_input = input("⏰ Dias de validade (padrão 30): ").strip()
         dias_validade = int(dias_input) if dias_input else 30
         
-        # Calcula data de expiração
-        expira_em = (datetime.now() + timedelta(days=dias_validade)).isoformat()
-        
-        # Carrega tokens existentes
-        tokens = self.carregar_tokens()
-        
         # Cria novo token
-        tokens[token] = {
-            "cliente": cliente,
-            "categoria": categoria,
-            "pasta": pasta_principal,
-            "pastas_permitidas": pastas_permitidas,
-            "whatsapp": whatsapp,
-            "downloads_permitidos": True,
-            "fotos_baixadas": [],  # Lista de fotos que o cliente baixou
-            "acessos": [],  # Lista de timestamps de acesso
-            "criado_em": datetime.now().isoformat(),
-            "expira_em": expira_em,
-            "ativo": True
-        }
+        dados = self.montar_dados_token(cliente, categoria, pastas_permitidas, whatsapp, dias_validade)
+        expira_em = dados['expira_em']
         
-        # Salva no arquivo
-        with open(self.arquivo_tokens, 'w', encoding='utf-8') as f:
-            json.dump(tokens, f, indent=2, ensure_ascii=False)
+        # Registra no backend (sem reescrever o tokens.json inteiro)
+        self.sessao.criar(token, dados)
         
         # Faz backup automático
         self.fazer_backup()
@@ -174,34 +143,70 @@ class GerenciadorTokens:
         print("="*50)
         
         return token
+
+    def novo_token(self):
+        """Token URL-safe novo (72 bits por padrão, veja GLR_TOKEN_BITS), sem colidir com os existentes"""
+        return self.sessao.alocador().proximo()
+
+    def novos_tokens(self, quantidade):
+        """Vários tokens de uma vez, para geração em lote"""
+        return self.sessao.alocador().gerar(quantidade)
+
+    def montar_dados_token(self, cliente, categoria, pastas_permitidas, whatsapp, dias_validade, agora=None):
+        """Monta o registro de um token no formato do tokens.json"""
+        agora = agora or datetime.now()
+        return {
+            "cliente": cliente,
+            "categoria": categoria,
+            "pasta": pastas_permitidas[0] if pastas_permitidas else "",
+            "pastas_permitidas": pastas_permitidas,
+            "whatsapp": whatsapp,
+            "downloads_permitidos": True,
+            "total_acessos": 0,  # Histórico completo fica no log de acessos
+            "total_downloads": 0,
+            "ultimo_acesso": None,
+            "criado_em": agora.isoformat(),
+            "expira_em": (agora + timedelta(days=dias_validade)).isoformat(),
+            "ativo": True
+        }
     
+    def criar_backup(self):
+        """Cria o ponto de restauração; erros propagam. Retorna None se nada mudou"""
+        # Sob a trava dos tokens: o índice de backups também é lido e regravado
+        with self.store.trava:
+            entrada = self.backups.criar(self.carregar_tokens())
+        if entrada is None:
+            print("💾 Backup dispensado: nada mudou desde o último.")
+        else:
+            print(f"💾 Backup criado: {self.arquivo_backup}{entrada['arquivo']}")
+        return entrada
+
+    @cronometrar('backup.criar')
     def fazer_backup(self):
-        """Cria backup automático dos tokens"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = f"backup_tokens/tokens_backup_{timestamp}.json"
-        
+        """Cria backup automático dos tokens (só o que mudou desde o último)"""
         try:
-            # Copia arquivo atual para backup
-            shutil.copy2(self.arquivo_tokens, backup_file)
-            
-            # Remove backups antigos (mantém apenas últimos 10)
-            backups = sorted([f for f in os.listdir('backup_tokens') 
-                            if f.startswith('tokens_backup_') and f.endswith('.json')])
-            
-            if len(backups) > 10:
-                for backup_antigo in backups[:-10]:
-                    os.remove(f"backup_tokens/{backup_antigo}")
-                    
-            print(f"💾 Backup criado: {backup_file}")
-            
+            return self.criar_backup()
         except Exception as e:
             print(f"⚠️  Erro ao criar backup: {e}")
+
+    @cronometrar('backup.restaurar')
+    def restaurar_backup(self, posicao):
+        """Substitui os tokens pelo estado do ponto ``posicao`` do índice de backups.
+
+        Se o backup do estado atual falhar, nada é restaurado: o erro sobe
+        antes de os tokens serem substituídos.
+        """
+        with self.backups.abrir(posicao) as fluxo:
+            # O estado atual vira um ponto de restauração antes de ser substituído
+            self.criar_backup()
+            self.sessao.substituir_json(fluxo)
+        return self.carregar_tokens()
     
+    @cronometrar('tokens.listar')
     def listar_tokens(self):
         """Lista todos os tokens de forma organizada"""
         try:
-            with open(self.arquivo_tokens, 'r', encoding='utf-8') as f:
-                tokens = json.load(f)
+            tokens = self.carregar_tokens()
             
             if not tokens:
                 print("📭 Nenhum token encontrado.")
@@ -229,8 +234,8 @@ class GerenciadorTokens:
                 print(f"   📊 Status: {status}")
                 print(f"   📂 {dados['categoria']} → {self.formatar_pastas(dados)}")
                 print(f"   📅 Criado: {datetime.fromisoformat(dados['criado_em']).strftime('%d/%m/%Y')}")
-                print(f"   🔗 Acessos: {len(dados['acessos'])}")
-                print(f"   💾 Downloads: {len(dados['fotos_baixadas'])}")
+                print(f"   🔗 Acessos: {dados.get('total_acessos', 0)}")
+                print(f"   💾 Downloads: {dados.get('total_downloads', 0)}")
                 print("-" * 70)
                 
         except Exception as e:
@@ -248,42 +253,53 @@ class GerenciadorTokens:
     def solicitar_whatsapp(self, cliente):
         """Coleta número de WhatsApp do cliente"""
         numero = input(f"📞 WhatsApp do cliente ({cliente}) com DDD+país (opcional): ").strip()
-        if not numero:
-            return ""
-        somente_digitos = re.sub(r'\D', '', numero)
-        if len(somente_digitos) < 10:
-            print("⚠️  Número muito curto, será armazenado mesmo assim.")
-        return somente_digitos
+        return normalizar_whatsapp(numero)
 
     def exibir_link_whatsapp(self, cliente, token, dias_validade, whatsapp):
         """Mostra link pronto para enviar via WhatsApp"""
-        mensagem = (
-            f"Olá {cliente}! Aqui está o seu código de acesso: {token}.\n"
-            f"Acesse sua galeria e aproveite que você tem {dias_validade} dias para baixar suas fotos."
-        )
-        mensagem_codificada = quote_plus(mensagem)
+        link = montar_link_whatsapp(cliente, token, dias_validade, whatsapp)
         if whatsapp:
-            link = f"https://wa.me/{whatsapp}?text={mensagem_codificada}"
             print("\n📲 Mensagem formatada para WhatsApp:")
             print(link)
         else:
-            link = f"https://wa.me/?text={mensagem_codificada}"
             print("\n📲 Copie e envie esta mensagem no WhatsApp:")
             print(link)
 
+    @cronometrar('tokens.carregar')
     def carregar_tokens(self):
-        """Lê tokens.json tolerando arquivo vazio/corrompido"""
-        try:
-            if not os.path.exists(self.arquivo_tokens):
-                return {}
-            with open(self.arquivo_tokens, 'r', encoding='utf-8') as f:
-                conteudo = f.read().strip()
-                if not conteudo:
-                    return {}
-                return json.loads(conteudo)
-        except json.JSONDecodeError:
-            print("⚠️  tokens.json está vazio ou corrompido. Será recriado.")
-            return {}
+        """Tokens da sessão (relidos só se o backend mudou no disco)"""
+        return self.sessao.tokens()
+
+    def registrar_acesso(self, token):
+        """Registra um acesso do cliente"""
+        self.sessao.registrar_acesso(token)
+
+    @cronometrar('tokens.publicar')
+    def publicar_tokens(self):
+        """Atualiza o tokens.json e os shards de login lidos pela galeria"""
+        self.sessao.publicar()
+        return self.sessao.exportar_shards()
+
+def normalizar_whatsapp(numero):
+    """Mantém só os dígitos do número (DDD + país)"""
+    numero = (numero or "").strip()
+    if not numero:
+        return ""
+    somente_digitos = re.sub(r'\D', '', numero)
+    if len(somente_digitos) < 10:
+        print("⚠️  Número muito curto, será armazenado mesmo assim.")
+    return somente_digitos
+
+def montar_link_whatsapp(cliente, token, dias_validade, whatsapp):
+    """Link wa.me com a mensagem de acesso já codificada"""
+    mensagem = (
+        f"Olá {cliente}! Aqui está o seu código de acesso: {token}.\n"
+        f"Acesse sua galeria e aproveite que você tem {dias_validade} dias para baixar suas fotos."
+    )
+    mensagem_codificada = quote_plus(mensagem)
+    if whatsapp:
+        return f"https://wa.me/{whatsapp}?text={mensagem_codificada}"
+    return f"https://wa.me/?text={mensagem_codificada}"
 
 # Função para usar diretamente
 def criar_novo_token():
@@ -0,0 +1,120 @@
+import bisect
+import json
+import os
+from datetime import datetime, timedelta
+from armazenamento import escrever_json
+
+
+def _normalizar(assinatura):
+    """Assinatura no formato em que volta do JSON (listas em vez de tuplas)"""
+    if assinatura is None:
+        return None
+    return json.loads(json.dumps(assinatura))
+
+
+class IndiceExpiracao:
+    """Tokens ativos ordenados por ``expira_em``, salvos ao lado do tokens.json.
+
+    "O que expira nos próximos N dias" vira uma busca binária no intervalo
+    em vez de percorrer e ordenar todos os tokens. O arquivo guarda a
+    assinatura do backend em que foi gerado; se não bater (ou o arquivo
+    sumir), o índice é reconstruído a partir dos tokens.
+    """
+
+    def __init__(self, arquivo, entradas=None):
+        self.arquivo = arquivo
+        self.entradas = entradas or []  # [(expira_em, token)] em ordem
+
+    @classmethod
+    def construir(cls, arquivo, tokens):
+        entradas = sorted(
+            (dados['expira_em'], token)
+            for token, dados in tokens.items() if dados['ativo']
+        )
+        return cls(arquivo, entradas)
+
+    @classmethod
+    def carregar(cls, arquivo, assinatura, store=None, tokens=None):
+        """Lê o índice do disco; None se não existir, estiver corrompido ou defasado.
+
+        Com ``store`` e ``tokens``, um índice salvo antes de registros que
+        só foram anexados ao journal é posto em dia reaplicando esse final
+        do journal, em vez de ser reconstruído do zero.
+        """
+        if assinatura is None:
+            return None
+        try:
+            with open(arquivo, 'r', encoding='utf-8') as f:
+                conteudo = json.load(f)
+        except (OSError, ValueError):
+            return None
+        indice = cls(arquivo, [tuple(entrada) for entrada in conteudo.get('entradas', [])])
+        if conteudo.get('assinatura') == _normalizar(assinatura):
+            return indice
+        registros = None
+        if store is not None and tokens is not None and hasattr(store, 'registros_desde'):
+            registros = store.registros_desde(conteudo.get('assinatura'))
+        if registros is None:
+            return None
+        for registro in registros:
+            indice.aplicar(registro, tokens)
+        return indice
+
+    def salvar(self, assinatura):
+        try:
+            escrever_json(self.arquivo, {
+                'assinatura': _normalizar(assinatura),
+                'entradas': self.entradas,
+            })
+        except OSError as e:
+            # Sem o arquivo o índice é apenas reconstruído na próxima execução
+            print(f"⚠️  Não foi possível salvar o índice de expiração: {e}")
+
+    def adicionar(self, token, expira_em):
+        bisect.insort(self.entradas, (expira_em, token))
+
+    def remover(self, token, expira_em):
+        posicao = bisect.bisect_left(self.entradas, (expira_em, token))
+        if posicao < len(self.entradas) and self.entradas[posicao] == (expira_em, token):
+            del self.entradas[posicao]
+
+    def aplicar(self, registro, tokens):
+        """Reflete no índice um registro do journal; retorna se o índice mudou.
+
+        ``tokens`` dá o ``expira_em`` dos tokens desativados (e dos
+        recriados). Acessos e downloads não mexem no índice.
+        """
+        op = registro.get('op')
+        if op == 'criar_lote':
+            for token, dados in registro['tokens'].items():
+                self.aplicar({'op': 'criar', 'token': token, 'dados': dados}, tokens)
+            return True
+        if op not in ('criar', 'desativar'):
+            return False
+        token = registro['token']
+        anterior = tokens.get(token)
+        if anterior is not None:
+            self.remover(token, anterior['expira_em'])
+        if op == 'criar' and registro['dados']['ativo']:
+            self.adicionar(token, registro['dados']['expira_em'])
+        return True
+
+    def entre(self, inicio, fim):
+        """Entradas com ``inicio <= expira_em < fim`` (strings ISO), em ordem"""
+        esquerda = bisect.bisect_left(self.entradas, (inicio,))
+        direita = bisect.bisect_left(self.entradas, (fim,))
+        return self.entradas[esquerda:direita]
+
+    def expirando(self, dias, agora=None):
+        """Tokens cujo ``(expira_em - agora).days`` está entre 0 e ``dias``"""
+        agora = agora or datetime.now()
+        return self.entre(agora.isoformat(), (agora + timedelta(days=dias + 1)).isoformat())
+
+    def vencidos(self, agora=None):
+        """Tokens ainda ativos cuja data de expiração já passou"""
+        agora = agora or datetime.now()
+        return self.entre('', agora.isoformat())
+
+
+def arquivo_indice(arquivo_tokens):
+    return f"{os.path.splitext(arquivo_tokens)[0]}.expiracao.json"
@@ -0,0 +1,159 @@
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+
+class LogAcessos:
+    """Log append-only de eventos (uma linha JSON por evento) com rotação.
+
+    Os eventos são anexados a ``acessos.ndjson``; quando o segmento passa de
+    ``tamanho_max`` bytes ou seu primeiro evento fica mais velho que
+    ``idade_max``, ele é renomeado para ``acessos_<data>.ndjson`` e, com
+    ``comprimir``, gravado com gzip. ``eventos`` percorre todos os segmentos
+    em ordem, uma linha por vez, sem carregar o log inteiro na memória.
+    """
+
+    PREFIXO = 'acessos'
+
+    def __init__(self, pasta='logs_acesso', tamanho_max=1024 * 1024,
+                 idade_max=timedelta(days=7), comprimir=True):
+        self.pasta = pasta
+        self.arquivo_ativo = os.path.join(pasta, f"{self.PREFIXO}.ndjson")
+        self.tamanho_max = tamanho_max
+        self.idade_max = idade_max
+        self.comprimir = comprimir
+
+    # ----- escrita -----
+
+    def registrar(self, tipo, token, em=None, **extras):
+        """Anexa um evento (``tipo``: acesso, download...) ao segmento ativo"""
+        em = em or datetime.now().isoformat()
+        if self._precisa_rotacionar(em):
+            self.rotacionar()
+        evento = {'em': em, 'tipo': tipo, 'token': token}
+        evento.update(extras)
+        linha = json.dumps(evento, ensure_ascii=False, separators=(',', ':')) + '\n'
+        os.makedirs(self.pasta, exist_ok=True)
+        with open(self.arquivo_ativo, 'a', encoding='utf-8') as f:
+            f.write(linha)
+            f.flush()
+            os.fsync(f.fileno())
+        return evento
+
+    def _inicio_segmento(self):
+        """Data do primeiro evento do segmento ativo (None se vazio)"""
+        try:
+            with open(self.arquivo_ativo, 'r', encoding='utf-8') as f:
+                return json.loads(f.readline())['em']
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _precisa_rotacionar(self, em):
+        try:
+            tamanho = os.path.getsize(self.arquivo_ativo)
+        except OSError:
+            return False
+        if not tamanho:
+            return False
+        if tamanho >= self.tamanho_max:
+            return True
+        inicio = self._inicio_segmento()
+        try:
+            return inicio is not None and \
+                datetime.fromisoformat(em) - datetime.fromisoformat(inicio) >= self.idade_max
+        except ValueError:
+            return False
+
+    def rotacionar(self):
+        """Fecha o segmento ativo; retorna o nome do segmento gerado (ou None)"""
+        if not os.path.exists(self.arquivo_ativo) or not os.path.getsize(self.arquivo_ativo):
+            return None
+        carimbo = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        fechado = os.path.join(self.pasta, f"{self.PREFIXO}_{carimbo}.ndjson")
+        os.replace(self.arquivo_ativo, fechado)
+        if not self.comprimir:
+            return fechado
+
+        comprimido = fechado + '.gz'
+        temporario = comprimido + '.tmp'
+        with open(fechado, 'rb') as origem, open(temporario, 'wb') as destino:
+            with gzip.GzipFile(fileobj=destino, mode='wb', mtime=0) as gz:
+                shutil.copyfileobj(origem, gz)
+            destino.flush()
+            os.fsync(destino.fileno())
+        os.replace(temporario, comprimido)
+        os.remove(fechado)
+        return comprimido
+
+    # ----- leitura -----
+
+    def segmentos(self):
+        """Segmentos fechados em ordem cronológica, seguidos do ativo"""
+        if not os.path.isdir(self.pasta):
+            return []
+        nomes = set(os.listdir(self.pasta))
+        fechados = []
+        for nome in sorted(nomes):
+            if not nome.startswith(f"{self.PREFIXO}_"):
+                continue
+            if nome.endswith('.ndjson.gz'):
+                fechados.append(nome)
+            elif nome.endswith('.ndjson') and f"{nome}.gz" not in nomes:
+                # Rotação interrompida antes da compressão terminar
+                fechados.append(nome)
+        caminhos = [os.path.join(self.pasta, nome) for nome in fechados]
+        if os.path.exists(self.arquivo_ativo):
+            caminhos.append(self.arquivo_ativo)
+        return caminhos
+
+    def eventos(self, desde=None, ate=None, token=None, tipo=None):
+        """Itera os eventos em ordem, filtrando por período (ISO), token e tipo"""
+        for caminho in self.segmentos():
+            abrir = gzip.open if caminho.endswith('.gz') else open
+            try:
+                with abrir(caminho, 'rt', encoding='utf-8') as f:
+                    for linha in f:
+                        try:
+                            evento = json.loads(linha)
+                        except json.JSONDecodeError:
+                            # Linha truncada por uma escrita interrompida
+                            continue
+                        em = evento.get('em', '')
+                        if desde and em < desde:
+                            continue
+                        if ate and em >= ate:
+                            continue
+                        if token and evento.get('token') != token:
+                            continue
+                        if tipo and evento.get('tipo') != tipo:
+                            continue
+                        yield evento
+            except FileNotFoundError:
+                # Segmento rotacionado/comprimido enquanto era listado
+                continue
+
+    def tamanho_total(self):
+        return sum(os.path.getsize(caminho) for caminho in self.segmentos())
+
+    # ----- formato antigo -----
+
+    def migrar_json(self, arquivo_antigo):
+        """Converte um ``logs_acesso.json`` (lista JSON) em eventos do log"""
+        try:
+            with open(arquivo_antigo, 'r', encoding='utf-8') as f:
+                antigos = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(antigos, list):
+            return 0
+        migrados = 0
+        for registro in antigos:
+            if isinstance(registro, dict) and registro.get('token'):
+                extras = {k: v for k, v in registro.items() if k not in ('em', 'tipo', 'token')}
+                self.registrar(registro.get('tipo', 'acesso'), registro['token'],
+                               registro.get('em') or registro.get('timestamp'), **extras)
+                migrados += 1
+        os.replace(arquivo_antigo, f"{arquivo_antigo}.migrado")
+        return migrados
@@ -0,0 +1,148 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+from gerar_token import CATEGORIAS, GerenciadorTokens, montar_link_whatsapp, normalizar_whatsapp
+
+CAMPOS_ALBUNS = ('albuns', 'pastas_permitidas', 'pastas', 'album')
+CAMPOS_DIAS = ('dias', 'dias_validade', 'validade')
+
+
+def ler_clientes(caminho):
+    """Lê a lista de clientes de um CSV (vírgula ou ponto e vírgula) ou JSON"""
+    if caminho.lower().endswith('.json'):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            linhas = json.load(f)
+        if not isinstance(linhas, list):
+            raise ValueError("O JSON deve ser uma lista de clientes")
+        return linhas
+
+    with open(caminho, 'r', encoding='utf-8-sig', newline='') as f:
+        amostra = f.read(4096)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;')
+        except csv.Error:
+            dialeto = csv.excel
+        return [
+            {(chave or '').strip().lower(): valor for chave, valor in linha.items()}
+            for linha in csv.DictReader(f, dialect=dialeto)
+        ]
+
+
+def _primeiro(linha, campos, padrao=None):
+    for campo in campos:
+        valor = linha.get(campo)
+        if valor not in (None, ''):
+            return valor
+    return padrao
+
+
+def normalizar_cliente(linha, albuns_disponiveis=None):
+    """Converte uma linha de entrada em (cliente, categoria, albuns, whatsapp, dias)"""
+    cliente = str(linha.get('cliente') or '').strip()
+    if not cliente:
+        raise ValueError("cliente vazio")
+
+    categoria = str(linha.get('categoria') or '').strip() or "Outros"
+    categoria = CATEGORIAS.get(categoria, categoria)
+    if categoria not in CATEGORIAS.values():
+        raise ValueError(f"categoria inválida: {categoria}")
+
+    albuns = _primeiro(linha, CAMPOS_ALBUNS, [])
+    if isinstance(albuns, str):
+        albuns = albuns.split('|')
+    elif not isinstance(albuns, list):
+        albuns = [albuns]
+    if any(not isinstance(album, str) for album in albuns):
+        raise ValueError(f"álbum(ns) devem ser texto: {albuns}")
+    albuns = [album.strip() for album in albuns if album.strip()]
+    albuns = [album[:-5] if album.lower().endswith('.json') else album for album in albuns]
+    if albuns_disponiveis is not None:
+        desconhecidos = [album for album in albuns if album not in albuns_disponiveis]
+        if desconhecidos:
+            raise ValueError(f"álbum(ns) não encontrado(s) em /fotos: {', '.join(desconhecidos)}")
+
+    dias = _primeiro(linha, CAMPOS_DIAS, 30)
+    try:
+        dias = int(dias)
+    except (TypeError, ValueError):
+        raise ValueError(f"dias de validade inválido: {dias}")
+    if dias <= 0:
+        raise ValueError(f"dias de validade deve ser positivo: {dias}")
+
+    whatsapp = normalizar_whatsapp(str(linha.get('whatsapp') or ''))
+    return cliente, categoria, albuns, whatsapp, dias
+
+
+def gerar_lote(linhas, gt=None):
+    """Gera tokens para todas as linhas e grava tudo de uma vez.
+
+    Se qualquer linha for inválida nada é gravado. Retorna a lista de
+    resultados (cliente, token, whatsapp, expira_em, link).
+    """
+    gt = gt or GerenciadorTokens()
+    gt.catalogo.atualizar()
+    disponiveis = gt.catalogo if gt.catalogo.albuns else None
+
+    erros = []
+    clientes = []
+    for numero, linha in enumerate(linhas, 1):
+        try:
+            clientes.append(normalizar_cliente(linha, disponiveis))
+        except ValueError as e:
+            erros.append(f"linha {numero}: {e}")
+    if erros:
+        raise ValueError("Lote não gravado:\n" + "\n".join(erros))
+
+    agora = datetime.now()
+    novos = {}
+    resultados = []
+    for token, (cliente, categoria, albuns, whatsapp, dias) in zip(gt.novos_tokens(len(clientes)), clientes):
+        dados = gt.montar_dados_token(cliente, categoria, albuns, whatsapp, dias, agora)
+        novos[token] = dados
+        resultados.append({
+            'cliente': cliente,
+            'token': token,
+            'whatsapp': whatsapp,
+            'expira_em': dados['expira_em'],
+            'link': montar_link_whatsapp(cliente, token, dias, whatsapp),
+        })
+
+    if novos:
+        gt.sessao.criar_lote(novos)
+        gt.fazer_backup()
+    return resultados
+
+
+def salvar_links(resultados, caminho):
+    """Grava os links de WhatsApp prontos para envio em CSV"""
+    with open(caminho, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=['cliente', 'token', 'whatsapp', 'expira_em', 'link'])
+        escritor.writeheader()
+        escritor.writerows(resultados)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera tokens em lote a partir de um CSV ou JSON de clientes")
+    parser.add_argument('entrada', help="CSV/JSON com cliente, categoria, albuns (separados por |), whatsapp, dias")
+    parser.add_argument('-o', '--saida', help="CSV de saída com os links (padrão: links_lote_<data>.csv)")
+    args = parser.parse_args(argv)
+
+    saida = args.saida or f"links_lote_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    try:
+        resultados = gerar_lote(ler_clientes(args.entrada))
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    salvar_links(resultados, saida)
+    print(f"✅ {len(resultados)} token(s) criados.")
+    print(f"📲 Links de WhatsApp em: {os.path.abspath(saida)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,12 @@
 import os
 import sys
 from datetime import datetime
+import perfil
+from backup import BackupTokens
 from gerar_token import GerenciadorTokens
+from perfil import cronometrar
 from relatorio import RelatorioTokens
+from sessao import SessaoTokens, TokensAusentes
 
 def limpar_tela():
     """Limpa a tela do terminal"""
@@ -16,9 +20,9 @@ def mostrar_header():
     print(f"📅 {datetime.now().strftime('%d/%m/%Y às %H:%M')}")
     print("="*70)
 
-def menu_backup():
+def menu_backup(gt=None):
     """Menu de opções de backup"""
-    gt = GerenciadorTokens()
+    gt = gt or GerenciadorTokens()
     
     while True:
         print("\n" + "="*50)
@@ -27,22 +31,26 @@ def menu_backup():
         print("1. 💾 Criar backup manual")
         print("2. 📂 Ver backups existentes")
         print("3. 🗑️  Limpar backups antigos")
-        print("4. 🚪 Voltar")
+        print("4. ♻️  Restaurar backup")
+        print("5. 🚪 Voltar")
         
         opcao = input("\nEscolha uma opção: ").strip()
         
         if opcao == "1":
             print("\n💾 Criando backup...")
-            gt.fazer_backup()
-            print("✅ Backup criado com sucesso!")
+            if gt.fazer_backup():
+                print("✅ Backup criado com sucesso!")
             
         elif opcao == "2":
-            listar_backups()
+            listar_backups(gt)
             
         elif opcao == "3":
-            limpar_backups_antigos()
+            limpar_backups_antigos(gt)
             
         elif opcao == "4":
+            restaurar_backup(gt)
+            
+        elif opcao == "5":
             break
             
         else:
@@ -50,84 +58,105 @@ def menu_backup():
         
         input("\n⏸️  Pressione ENTER para continuar...")
 
-def listar_backups():
-    """Lista todos os backups disponíveis"""
+@cronometrar('menu.listar_backups')
+def listar_backups(gt=None):
+    """Lista todos os pontos de restauração disponíveis"""
     try:
-        if not os.path.exists('backup_tokens'):
-            print("📭 Pasta de backup não encontrada.")
-            return
-        
-        backups = sorted([f for f in os.listdir('backup_tokens') 
-                         if f.startswith('tokens_backup_') and f.endswith('.json')])
+        gt = gt or GerenciadorTokens()
+        indice = gt.backups.carregar_indice()
         
-        if not backups:
+        if not indice:
             print("📭 Nenhum backup encontrado.")
             return
         
         print("\n📂 BACKUPS DISPONÍVEIS:")
         print("-" * 50)
         
-        for i, backup in enumerate(backups, 1):
-            # Extrai data do nome do arquivo
-            timestamp = backup.replace('tokens_backup_', '').replace('.json', '')
+        for i, entrada in enumerate(indice, 1):
             try:
-                data_backup = datetime.strptime(timestamp, '%Y%m%d_%H%M%S')
+                data_backup = datetime.fromisoformat(entrada['criado_em'])
                 data_formatada = data_backup.strftime('%d/%m/%Y às %H:%M:%S')
-            except:
-                data_formatada = timestamp
+            except ValueError:
+                data_formatada = entrada['criado_em']
             
-            # Tamanho do arquivo
-            caminho = f"backup_tokens/{backup}"
-            tamanho = os.path.getsize(caminho)
-            tamanho_kb = tamanho / 1024
+            # Tamanhos registrados no índice (sem stat em cada arquivo)
+            tamanho_kb = entrada.get('tamanho', 0) / 1024
+            comprimido_kb = entrada.get('tamanho_comprimido', 0) / 1024
+            tipo = "completo" if entrada['tipo'] == 'completo' else "delta"
             
-            print(f"{i:2d}. {backup}")
+            print(f"{i:2d}. {entrada['arquivo']}")
             print(f"    📅 {data_formatada}")
-            print(f"    📊 {tamanho_kb:.1f} KB")
+            print(f"    📊 {comprimido_kb:.1f} KB em disco / {tamanho_kb:.1f} KB ({tipo})")
+            print(f"    🔑 {entrada.get('total_tokens', '?')} tokens · hash {entrada['hash'][:12]}")
             print("-" * 50)
             
     except Exception as e:
         print(f"❌ Erro ao listar backups: {e}")
 
-def limpar_backups_antigos():
-    """Remove backups antigos mantendo apenas os 5 mais recentes"""
+@cronometrar('menu.limpar_backups_antigos')
+def limpar_backups_antigos(gt=None):
+    """Remove backups antigos mantendo pelo menos os 5 mais recentes"""
     try:
-        backups = sorted([f for f in os.listdir('backup_tokens') 
-                         if f.startswith('tokens_backup_') and f.endswith('.json')])
+        gt = gt or GerenciadorTokens()
+        total = len(gt.backups.carregar_indice())
         
-        if len(backups) <= 5:
+        if total <= 5:
             print("✅ Menos de 5 backups encontrados. Nada para limpar.")
             return
         
-        print(f"🗑️  Encontrados {len(backups)} backups.")
-        print(f"🔄 Mantendo os 5 mais recentes, removendo {len(backups) - 5}...")
+        print(f"🗑️  Encontrados {total} backups.")
+        print("🔄 Mantendo os 5 mais recentes (e o snapshot completo de que dependem)...")
         
         confirma = input("❓ Confirma a limpeza? (s/N): ").strip().lower()
         
         if confirma == 's':
-            removidos = 0
-            for backup_antigo in backups[:-5]:  # Remove todos exceto os 5 últimos
-                os.remove(f"backup_tokens/{backup_antigo}")
-                removidos += 1
-                print(f"🗑️  Removido: {backup_antigo}")
+            removidos = gt.backups.podar(5)
+            for entrada in removidos:
+                print(f"🗑️  Removido: {entrada['arquivo']}")
             
-            print(f"✅ {removidos} backups antigos removidos!")
+            print(f"✅ {len(removidos)} backups antigos removidos!")
         else:
             print("❌ Operação cancelada.")
             
     except Exception as e:
         print(f"❌ Erro ao limpar backups: {e}")
 
-def status_sistema():
+@cronometrar('menu.restaurar_backup')
+def restaurar_backup(gt=None):
+    """Restaura os tokens a partir de um ponto de restauração"""
+    try:
+        gt = gt or GerenciadorTokens()
+        listar_backups(gt)
+        total = len(gt.backups.carregar_indice())
+        if not total:
+            return
+        
+        escolha = input("\n♻️  Número do backup a restaurar: ").strip()
+        if not escolha.isdigit() or not 1 <= int(escolha) <= total:
+            print("❌ Número inválido.")
+            return
+        
+        confirma = input("❓ Os tokens atuais serão substituídos (um backup deles é criado antes). Confirma? (s/N): ").strip().lower()
+        if confirma == 's':
+            tokens = gt.restaurar_backup(int(escolha) - 1)
+            print(f"✅ Backup restaurado: {len(tokens)} tokens.")
+        else:
+            print("❌ Operação cancelada.")
+            
+    except Exception as e:
+        print(f"❌ Erro ao restaurar backup: {e}")
+
+@cronometrar('menu.status_sistema')
+def status_sistema(gt=None):
     """Mostra status geral do sistema"""
     try:
-        gt = GerenciadorTokens()
+        gt = gt or GerenciadorTokens()
         
         # Verifica arquivos
         arquivos_ok = all([
             os.path.exists('tokens.json'),
             os.path.exists('backup_tokens'),
-            os.path.exists('logs_acesso.json')
+            os.path.isdir(gt.pasta_logs)
         ])
         
         print("\n" + "="*60)
@@ -141,28 +170,44 @@ def status_sistema():
         
         # Conta tokens
         try:
-            import json
-            with open('tokens.json', 'r', encoding='utf-8') as f:
-                tokens = json.load(f)
-            
+            tokens = gt.carregar_tokens()
             ativos = sum(1 for t in tokens.values() if t['ativo'])
             total = len(tokens)
             
             print(f"   📊 Tokens cadastrados: {total}")
             print(f"   🟢 Tokens ativos: {ativos}")
             print(f"   🔴 Tokens inativos: {total - ativos}")
+            print(f"   🗄️  Armazenamento: {gt.store.descricao()}")
             
         except:
             print("   ❌ Erro ao ler tokens")
         
         # Conta backups
         try:
-            backups = len([f for f in os.listdir('backup_tokens') 
-                          if f.startswith('tokens_backup_')])
-            print(f"   💾 Backups disponíveis: {backups}")
+            indice = gt.backups.carregar_indice()
+            em_disco = sum(entrada.get('tamanho_comprimido', 0) for entrada in indice) / 1024
+            print(f"   💾 Backups disponíveis: {len(indice)} ({em_disco:.1f} KB em disco)")
         except:
             print("   💾 Backups disponíveis: 0")
         
+        # Log de acessos
+        try:
+            segmentos = gt.sessao.log.segmentos()
+            em_disco = sum(os.path.getsize(caminho) for caminho in segmentos) / 1024
+            print(f"   📜 Log de acessos: {len(segmentos)} segmento(s), {em_disco:.1f} KB")
+        except OSError:
+            print("   📜 Log de acessos: indisponível")
+        
+        # Última execução com --profile / GLR_PERFIL=1
+        ultimo = perfil.carregar_ultimo()
+        if ultimo and ultimo.get('spans'):
+            quando = datetime.fromisoformat(ultimo['quando']).strftime('%d/%m/%Y às %H:%M')
+            print(f"\n⏱️  PERFIL DA ÚLTIMA EXECUÇÃO ({quando}):")
+            spans = sorted(ultimo['spans'].items(), key=lambda item: -item[1]['total_ms'])
+            for nome, span in spans[:8]:
+                print(f"   {nome:<34} {span['contagem']:>5}x  p50 {span['p50_ms']:8.2f}ms"
+                      f"  p90 {span['p90_ms']:8.2f}ms  p99 {span['p99_ms']:8.2f}ms")
+        
         print("="*60)
         
     except Exception as e:
@@ -171,67 +216,73 @@ def status_sistema():
 def menu_principal():
     """Menu principal do sistema"""
     gt = GerenciadorTokens()
-    rt = RelatorioTokens()
+    rt = RelatorioTokens(gt)
     
-    while True:
-        limpar_tela()
-        mostrar_header()
-        
-        print("\n🎯 MENU PRINCIPAL")
-        print("-" * 30)
-        print("1. 🆕 Gerar novo token para cliente")
-        print("2. 📊 Relatórios e estatísticas")
-        print("3. 💾 Gerenciar backups")
-        print("4. 🔧 Status do sistema")
-        print("5. ❓ Ajuda")
-        print("6. 🚪 Sair")
-        
-        opcao = input("\n👆 Escolha uma opção: ").strip()
-        
-        if opcao == "1":
-            print("\n" + "="*50)
-            print("🆕 GERANDO NOVO TOKEN")
-            print("="*50)
-            try:
-                token = gt.gerar_token()
-                input("\n⏸️  Pressione ENTER para continuar...")
-            except KeyboardInterrupt:
-                print("\n❌ Operação cancelada pelo usuário.")
-            except Exception as e:
-                print(f"\n❌ Erro ao gerar token: {e}")
-                input("\n⏸️  Pressione ENTER para continuar...")
-        
-        elif opcao == "2":
-            try:
-                from relatorio import main as relatorio_main
-                relatorio_main()
-            except Exception as e:
-                print(f"\n❌ Erro ao abrir relatórios: {e}")
+    try:
+        while True:
+            limpar_tela()
+            mostrar_header()
+        
+            print("\n🎯 MENU PRINCIPAL")
+            print("-" * 30)
+            print("1. 🆕 Gerar novo token para cliente")
+            print("2. 📊 Relatórios e estatísticas")
+            print("3. 💾 Gerenciar backups")
+            print("4. 🔧 Status do sistema")
+            print("5. ❓ Ajuda")
+            print("6. 🚪 Sair")
+        
+            opcao = input("\n👆 Escolha uma opção: ").strip()
+        
+            if opcao == "1":
+                print("\n" + "="*50)
+                print("🆕 GERANDO NOVO TOKEN")
+                print("="*50)
+                try:
+                    token = gt.gerar_token()
+                    input("\n⏸️  Pressione ENTER para continuar...")
+                except KeyboardInterrupt:
+                    print("\n❌ Operação cancelada pelo usuário.")
+                except Exception as e:
+                    print(f"\n❌ Erro ao gerar token: {e}")
+                    input("\n⏸️  Pressione ENTER para continuar...")
+        
+            elif opcao == "2":
+                try:
+                    from relatorio import main as relatorio_main
+                    relatorio_main(rt)
+                except Exception as e:
+                    print(f"\n❌ Erro ao abrir relatórios: {e}")
+                    input("\n⏸️  Pressione ENTER para continuar...")
+        
+            elif opcao == "3":
+                try:
+                    menu_backup(gt)
+                except Exception as e:
+                    print(f"\n❌ Erro no menu de backup: {e}")
+                    input("\n⏸️  Pressione ENTER para continuar...")
+        
+            elif opcao == "4":
+                status_sistema(gt)
                 input("\n⏸️  Pressione ENTER para continuar...")
         
-        elif opcao == "3":
-            try:
-                menu_backup()
-            except Exception as e:
-                print(f"\n❌ Erro no menu de backup: {e}")
+            elif opcao == "5":
+                mostrar_ajuda()
                 input("\n⏸️  Pressione ENTER para continuar...")
         
-        elif opcao == "4":
-            status_sistema()
-            input("\n⏸️  Pressione ENTER para continuar...")
+            elif opcao == "6":
+                print("\n👋 Obrigado por usar o sistema Gabriel Lima Retratos!")
+                print("📸 Até a próxima!")
+                break
         
-        elif opcao == "5":
-            mostrar_ajuda()
-            input("\n⏸️  Pressione ENTER para continuar...")
-        
-        elif opcao == "6":
-            print("\n👋 Obrigado por usar o sistema Gabriel Lima Retratos!")
-            print("📸 Até a próxima!")
-            break
-        
-        else:
-            print("\n❌ Opção inválida! Escolha uma opção de 1 a 6.")
-            input("\n⏸️  Pressione ENTER para continuar...")
+            else:
+                print("\n❌ Opção inválida! Escolha uma opção de 1 a 6.")
+                input("\n⏸️  Pressione ENTER para continuar...")
+    finally:
+        # Também ao sair com Ctrl+C: compacta o journal e confere os shards de login
+        gravados, removidos = gt.publicar_tokens()
+        if gravados or removidos:
+            print(f"\n📝 Galeria atualizada: {gravados} shard(s) de login gravados, {removidos} removidos.")
 
 def mostrar_ajuda():
     """Mostra ajuda sobre como usar o sistema"""
@@ -256,14 +307,22 @@ def mostrar_ajuda():
     print("https://seusite.github.io/galeria?token=abc123def456")
     
     print("\n💾 BACKUPS:")
-    print("• O sistema faz backup automático a cada token criado")
-    print("• Mantém os últimos 10 backups automaticamente")
+    print("• O sistema faz backup automático a cada alteração (só quando algo mudou)")
+    print("• Guarda só as diferenças, com um snapshot completo periódico (até 500 pontos)")
     print("• Use a opção 3 para gerenciar backups manualmente")
+    print("• Alterações vão para tokens.journal e são aplicadas ao tokens.json ao sair")
+    print("• Com GLR_TOKEN_BACKEND=sqlite os tokens ficam em tokens.db")
+    print("• tokens.json, backups e logs ficam fora do git: o site publica só os shards de tokens/")
     
     print("\n📊 RELATÓRIOS:")
     print("• Veja quais clientes ainda não acessaram")
     print("• Monitore tokens próximos do vencimento")
     print("• Acompanhe estatísticas de downloads")
+    print("• Cada acesso vai para logs_acesso/acessos.ndjson, rotacionado e comprimido com gzip")
+    
+    print("\n⏱️  DESEMPENHO:")
+    print("• Rode com --profile (ou GLR_PERFIL=1) para medir cada etapa; o resumo aparece no status do sistema")
+    print("• Para scripts/cron: python3 Sistema_Token_GLRETRATOS/cli.py create|list|expiring|deactivate|stats|backup")
     
     print("\n🆘 PROBLEMAS COMUNS:")
     print("• Se der erro de 'arquivo não encontrado': rode o sistema uma vez")
@@ -279,7 +338,6 @@ def mostrar_ajuda():
 def verificar_instalacao():
     """Verifica se todos os módulos necessários estão instalados"""
     try:
-        import uuid
         import json
         import os
         import shutil
@@ -290,13 +348,29 @@ def verificar_instalacao():
         print("💡 Instale os módulos necessários com: pip install -r requirements.txt")
         return False
 
+def recuperar_tokens(erro):
+    """Oferece restaurar o último backup quando o tokens.json sumiu"""
+    print(f"\n⚠️  {erro}")
+    print("💡 Se ele foi apagado por um git pull, copie-o de volta para a raiz ou restaure o último backup.")
+    confirma = input("❓ Restaurar o último backup agora? (s/N): ").strip().lower()
+    if confirma != 's':
+        print("❌ Nada foi criado. Recupere o tokens.json e execute de novo.")
+        sys.exit(1)
+    sessao = SessaoTokens()
+    with BackupTokens().abrir() as fluxo:
+        sessao.substituir_json(fluxo)
+    print(f"✅ Backup restaurado: {len(sessao.tokens())} tokens.")
+
 def primeira_execucao():
     """Configura o sistema na primeira execução"""
     if not os.path.exists('tokens.json'):
+        try:
+            gt = GerenciadorTokens()
+        except TokensAusentes as e:
+            recuperar_tokens(e)
+            return
         print("\n🎉 PRIMEIRA EXECUÇÃO DETECTADA!")
         print("🔧 Configurando sistema...")
-        
-        gt = GerenciadorTokens()
         print("✅ Arquivos base criados!")
         
         print("\n💡 DICAS IMPORTANTES:")
@@ -308,6 +382,9 @@ def primeira_execucao():
         input("\n⏸️  Pressione ENTER para continuar...")
 
 if __name__ == "__main__":
+    if '--profile' in sys.argv[1:]:
+        perfil.ativar()
+    
     try:
         # Verifica instalação
         if not verificar_instalacao():
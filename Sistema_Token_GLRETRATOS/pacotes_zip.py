@@ -0,0 +1,169 @@
+import hashlib
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+
+BLOCO = 1 << 20
+# Já comprimidos: deflate só gastaria CPU para ganhar quase nada
+SEM_COMPRESSAO = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.heic', '.mp4', '.mov', '.zip')
+PASTA_PACOTES = 'pacotes'
+
+
+class _Saida(io.RawIOBase):
+    """Destino sem ``seek`` para o ``ZipFile``: acumula o que foi escrito até ser retirado"""
+
+    def __init__(self):
+        self.partes = []
+        self.pendente = 0
+        self.posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        self.pendente += len(dados)
+        self.posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self.posicao
+
+    def retirar(self):
+        dados = b''.join(self.partes)
+        self.partes.clear()
+        self.pendente = 0
+        return dados
+
+
+def _info(nome, tamanho, mtime):
+    info = zipfile.ZipInfo(nome, datetime.fromtimestamp(max(mtime, 315532800)).timetuple()[:6])
+    info.compress_type = zipfile.ZIP_STORED if nome.lower().endswith(SEM_COMPRESSAO) else zipfile.ZIP_DEFLATED
+    info.file_size = tamanho
+    return info
+
+
+def arquivos_album(slug, pasta_fotos='fotos', espelho=None, raiz='.'):
+    """[(nome no ZIP, caminho)] das fotos de ``fotos/<slug>.json`` disponíveis em disco.
+
+    Usa a versão limpa (``download``) ou ``url`` quando apontam para
+    arquivos do site; senão procura o original em ``<espelho>/<slug>/<nome>``.
+    Retorna também quantas fotos não foram encontradas.
+    """
+    with open(os.path.join(pasta_fotos, f"{slug}.json"), 'r', encoding='utf-8') as f:
+        fotos = json.load(f)
+    arquivos, nomes, faltando = [], set(), 0
+    for foto in fotos:
+        caminho = None
+        for campo in ('download', 'url'):
+            url = foto.get(campo) or ''
+            if url and '://' not in url and os.path.isfile(os.path.join(raiz, url.lstrip('/'))):
+                caminho = os.path.join(raiz, url.lstrip('/'))
+                break
+        if caminho is None and espelho and os.path.isfile(os.path.join(espelho, slug, foto.get('nome', ''))):
+            caminho = os.path.join(espelho, slug, foto['nome'])
+        if caminho is None:
+            faltando += 1
+            continue
+        base, extensao = os.path.splitext(foto.get('nome') or os.path.basename(caminho))
+        extensao = os.path.splitext(caminho)[1] or extensao
+        nome, repeticao = f"{slug}/{base}{extensao}", 1
+        while nome in nomes:
+            repeticao += 1
+            nome = f"{slug}/{base}_{repeticao}{extensao}"
+        nomes.add(nome)
+        arquivos.append((nome, caminho))
+    return arquivos, faltando
+
+
+def pacote_album(slug, pasta_fotos='fotos', espelho=None, pasta_pacotes=PASTA_PACOTES):
+    """(caminho do ZIP do álbum em cache, fotos sem arquivo local).
+
+    O ZIP só é gerado de novo quando as fotos mudam: o nome leva um resumo
+    de (nome, tamanho, mtime) de cada arquivo, e versões antigas do mesmo
+    álbum são apagadas ao gerar a nova. Levanta ValueError se nenhuma foto
+    do álbum for encontrada em disco.
+    """
+    arquivos, faltando = arquivos_album(slug, pasta_fotos, espelho)
+    if not arquivos:
+        raise ValueError(f"nenhuma das {faltando} foto(s) do álbum {slug} foi encontrada em disco"
+                         + ("" if espelho else " (informe --espelho com os originais)"))
+    resumo = hashlib.sha256()
+    estados = []
+    for nome, caminho in arquivos:
+        info = os.stat(caminho)
+        estados.append((nome, caminho, info.st_size, info.st_mtime))
+        resumo.update(f"{nome}\0{info.st_size}\0{info.st_mtime_ns}\n".encode('utf-8'))
+    prefixo = hashlib.sha256(slug.encode('utf-8')).hexdigest()[:8]
+    destino = os.path.join(pasta_pacotes, f"{prefixo}_{resumo.hexdigest()[:12]}.zip")
+    if os.path.isfile(destino):
+        return destino, faltando
+
+    os.makedirs(pasta_pacotes, exist_ok=True)
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(temporario, 'w') as zf:
+        for nome, caminho, tamanho, mtime in estados:
+            with open(caminho, 'rb') as origem, zf.open(_info(nome, tamanho, mtime), 'w') as saida:
+                for bloco in iter(lambda: origem.read(BLOCO), b''):
+                    saida.write(bloco)
+    os.replace(temporario, destino)
+    for antigo in os.listdir(pasta_pacotes):
+        if antigo.startswith(prefixo + '_') and antigo.endswith('.zip') and antigo != os.path.basename(destino):
+            os.remove(os.path.join(pasta_pacotes, antigo))
+    return destino, faltando
+
+
+def albuns_do_token(dados):
+    return dados.get('pastas_permitidas') or ([dados['pasta']] if dados.get('pasta') else [])
+
+
+def iterar_pacote(pacotes):
+    """Gera, em blocos de ~1 MB, um ZIP com o conteúdo de todos os ``pacotes``.
+
+    Um pacote só é devolvido como está; vários são juntados membro a
+    membro, sem descomprimir nada além dos poucos arquivos não-imagem. Em
+    nenhum momento o ZIP inteiro fica na memória.
+    """
+    if len(pacotes) == 1:
+        with open(pacotes[0], 'rb') as f:
+            yield from iter(lambda: f.read(BLOCO), b'')
+        return
+
+    saida = _Saida()
+    with zipfile.ZipFile(saida, 'w') as zf:
+        for pacote in pacotes:
+            with zipfile.ZipFile(pacote) as album:
+                for membro in album.infolist():
+                    info = zipfile.ZipInfo(membro.filename, membro.date_time)
+                    info.compress_type = membro.compress_type
+                    info.file_size = membro.file_size
+                    with album.open(membro) as origem, zf.open(info, 'w') as destino:
+                        for bloco in iter(lambda: origem.read(BLOCO), b''):
+                            destino.write(bloco)
+                            if saida.pendente >= BLOCO:
+                                yield saida.retirar()
+    yield saida.retirar()
+
+
+def pacote_token(token, sessao, pasta_fotos='fotos', espelho=None, pasta_pacotes=PASTA_PACOTES):
+    """(albuns, pacotes em cache, fotos sem arquivo local) de um token ativo.
+
+    Levanta ValueError se o token não puder baixar ou se algum álbum não
+    tiver nenhuma foto em disco.
+    """
+    dados = sessao.obter(token)
+    if dados is None:
+        raise ValueError(f"token não encontrado: {token}")
+    if not dados['ativo'] or dados['expira_em'] < datetime.now().isoformat():
+        raise ValueError(f"token desativado ou expirado: {token}")
+    albuns = albuns_do_token(dados)
+    if not albuns:
+        raise ValueError(f"token sem álbuns liberados: {token}")
+    pacotes, faltando = [], 0
+    for slug in albuns:
+        pacote, sem_arquivo = pacote_album(slug, pasta_fotos, espelho, pasta_pacotes)
+        pacotes.append(pacote)
+        faltando += sem_arquivo
+    return albuns, pacotes, faltando
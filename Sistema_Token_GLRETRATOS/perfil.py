@@ -0,0 +1,87 @@
+import atexit
+import functools
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+ARQUIVO_PERFIL = 'perfil_ultimo.json'
+
+_ativo = False
+_spans = {}  # nome -> [durações em ms]
+
+
+def ativar(arquivo=ARQUIVO_PERFIL):
+    """Liga a coleta; o resumo é gravado em ``arquivo`` quando o processo termina"""
+    global _ativo
+    if not _ativo:
+        _ativo = True
+        atexit.register(salvar, arquivo)
+
+
+def ativo():
+    return _ativo
+
+
+def cronometrar(nome):
+    """Decorador que registra a duração de cada chamada no span ``nome``.
+
+    Desligado, o custo é uma checagem de variável global por chamada.
+    """
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            if not _ativo:
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                _spans.setdefault(nome, []).append((time.perf_counter() - inicio) * 1000)
+        return envolvida
+    return decorar
+
+
+def _percentil(ordenadas, fracao):
+    """Percentil por posição mais próxima sobre uma lista já ordenada"""
+    return ordenadas[max(0, math.ceil(fracao * len(ordenadas)) - 1)]
+
+
+def resumo():
+    """{span: contagem, total, p50, p90, p99 e máximo em ms}"""
+    resultado = {}
+    for nome, duracoes in _spans.items():
+        ordenadas = sorted(duracoes)
+        resultado[nome] = {
+            'contagem': len(ordenadas),
+            'total_ms': round(sum(ordenadas), 3),
+            'p50_ms': round(_percentil(ordenadas, 0.50), 3),
+            'p90_ms': round(_percentil(ordenadas, 0.90), 3),
+            'p99_ms': round(_percentil(ordenadas, 0.99), 3),
+            'max_ms': round(ordenadas[-1], 3),
+        }
+    return resultado
+
+
+def salvar(arquivo=ARQUIVO_PERFIL):
+    if not _spans:
+        return
+    try:
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            json.dump({'quando': datetime.now().isoformat(), 'spans': resumo()}, f, indent=2)
+    except OSError as e:
+        print(f"⚠️  Não foi possível salvar o perfil: {e}")
+
+
+def carregar_ultimo(arquivo=ARQUIVO_PERFIL):
+    """Resumo da última execução com perfil, ou None"""
+    try:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+if os.environ.get('GLR_PERFIL', '').lower() in ('1', 'true', 'sim'):
+    ativar()
@@ -1,101 +1,149 @@
-import json
-import os
-from datetime import datetime
+from datetime import datetime, timedelta
+from armazenamento import SqliteTokenStore
 from gerar_token import GerenciadorTokens
+from perfil import cronometrar
+from varredura import ArquivoFrio, DIAS_INATIVO_PADRAO, agregar_arquivados, arquivo_frio, varrer
+
+@cronometrar('relatorio.agregar_tokens')
+def agregar_tokens(tokens):
+    """Calcula em uma única passada a parte dos relatórios que não depende da hora.
+
+    O que muda com o relógio (ativo ou expirado, dias restantes, dias sem
+    acesso) fica para ``resumo_no_momento``, que só percorre os tokens ativos.
+    """
+    resumo = {
+        'total': len(tokens),
+        'inativos': 0,
+        'nunca_acessaram': 0,
+        'total_downloads': 0,
+        'linhas': [],           # (token, dados, expira, criado, ultimo_acesso)
+        'ativos': [],           # (token, dados, expira, criado), ordenada por cliente
+        'categorias': {},
+    }
+
+    for token, dados in tokens.items():
+        expira = datetime.fromisoformat(dados['expira_em'])
+        criado = datetime.fromisoformat(dados['criado_em'])
+        acessos = dados.get('total_acessos', 0)
+        downloads = dados.get('total_downloads', 0)
+
+        if dados['ativo']:
+            resumo['ativos'].append((token, dados, expira, criado))
+        else:
+            resumo['inativos'] += 1
+
+        if not acessos:
+            resumo['nunca_acessaram'] += 1
+        resumo['total_downloads'] += downloads
+
+        ultimo_acesso = "Nunca"
+        if dados.get('ultimo_acesso'):
+            ultimo_acesso = datetime.fromisoformat(dados['ultimo_acesso']).strftime('%d/%m/%Y às %H:%M')
+        resumo['linhas'].append((token, dados, expira, criado.strftime('%d/%m/%Y'), ultimo_acesso))
+
+        categoria = resumo['categorias'].setdefault(dados['categoria'], {
+            'total': 0, 'ativos': 0, 'downloads': 0, 'acessos': 0
+        })
+        categoria['total'] += 1
+        if dados['ativo']:
+            categoria['ativos'] += 1
+        categoria['downloads'] += downloads
+        categoria['acessos'] += acessos
+
+    resumo['ativos'].sort(key=lambda item: item[1]['cliente'])
+    return resumo
+
+
+def status_token(dados, expira, agora):
+    if not dados['ativo']:
+        return "🔴 INATIVO"
+    if expira < agora:
+        return "⚠️  EXPIRADO"
+    return f"🟢 ATIVO ({(expira - agora).days}d)"
+
+
+def resumo_no_momento(base, agora=None):
+    """Completa o resumo de ``agregar_tokens`` com os campos que dependem de ``agora``"""
+    agora = agora or datetime.now()
+    resumo = dict(base, agora=agora, ativos=0, expirados=0, lista_ativos=[], sem_acesso=[])
+    for token, dados, expira, criado in base['ativos']:
+        if expira < agora:
+            resumo['expirados'] += 1
+        else:
+            resumo['ativos'] += 1
+            resumo['lista_ativos'].append((token, dados, (expira - agora).days))
+        if not dados.get('total_acessos', 0):
+            resumo['sem_acesso'].append((token, dados, (agora - criado).days))
+    return resumo
+
 
 class RelatorioTokens:
-    def __init__(self):
-        self.gt = GerenciadorTokens()
+    def __init__(self, gt=None):
+        self.gt = gt or GerenciadorTokens()
         self.arquivo_tokens = 'tokens.json'
-        self.arquivo_logs = 'logs_acesso.json'
+        self.log = self.gt.sessao.log
+        self._cache_chave = None
+        self._cache_resumo = None
+
+    def obter_resumo(self):
+        """Resumo agregado: a passada completa só é refeita quando os tokens da
+        sessão mudam; status e contagens de dias são sempre relativos a agora"""
+        tokens = self.gt.carregar_tokens()
+        if self.gt.sessao.versao != self._cache_chave:
+            self._cache_resumo = agregar_tokens(tokens)
+            self._cache_chave = self.gt.sessao.versao
+        return resumo_no_momento(self._cache_resumo)
+
+    def _store_indexado(self):
+        """Backend com consultas indexadas (SQLite), usado direto nas listagens"""
+        return isinstance(self.gt.store, SqliteTokenStore)
     
+    @cronometrar('relatorio.mostrar_relatorio_completo')
     def mostrar_relatorio_completo(self):
         """Mostra relatório detalhado de todos os tokens"""
         try:
-            with open(self.arquivo_tokens, 'r', encoding='utf-8') as f:
-                tokens = json.load(f)
+            resumo = self.obter_resumo()
             
-            if not tokens:
+            if not resumo['total']:
                 print("📭 Nenhum token encontrado.")
                 return
             
-            # Contadores
-            ativos = 0
-            expirados = 0
-            inativos = 0
-            nunca_acessaram = 0
-            total_downloads = 0
-            
             print("\n" + "="*80)
             print("📊 RELATÓRIO COMPLETO DE TOKENS - GABRIEL LIMA RETRATOS")
             print("="*80)
             
-            for token, dados in tokens.items():
-                expira = datetime.fromisoformat(dados['expira_em'])
-                agora = datetime.now()
-                
-                # Determina status
-                if not dados['ativo']:
-                    status = "🔴 INATIVO"
-                    inativos += 1
-                elif expira < agora:
-                    status = "⚠️  EXPIRADO"
-                    expirados += 1
-                else:
-                    dias_restantes = (expira - agora).days
-                    status = f"🟢 ATIVO ({dias_restantes}d)"
-                    ativos += 1
-                
-                # Verifica se nunca acessou
-                if not dados['acessos']:
-                    nunca_acessaram += 1
-                
-                # Conta downloads
-                total_downloads += len(dados['fotos_baixadas'])
-                
-                # Último acesso
-                ultimo_acesso = "Nunca"
-                if dados['acessos']:
-                    ultimo_dt = datetime.fromisoformat(dados['acessos'][-1])
-                    ultimo_acesso = ultimo_dt.strftime('%d/%m/%Y às %H:%M')
-                
+            for token, dados, expira, criado, ultimo_acesso in resumo['linhas']:
                 print(f"\n👤 {dados['cliente']}")
                 print(f"   🔑 Token: {token}")
-                print(f"   📊 Status: {status}")
+                print(f"   📊 Status: {status_token(dados, expira, resumo['agora'])}")
                 pastas_texto = self.gt.formatar_pastas(dados)
                 print(f"   📂 {dados['categoria']} → {pastas_texto}")
-                print(f"   📅 Criado em: {datetime.fromisoformat(dados['criado_em']).strftime('%d/%m/%Y')}")
+                print(f"   📅 Criado em: {criado}")
                 print(f"   🕒 Último acesso: {ultimo_acesso}")
-                print(f"   🔗 Total de acessos: {len(dados['acessos'])}")
-                print(f"   💾 Fotos baixadas: {len(dados['fotos_baixadas'])}")
+                print(f"   🔗 Total de acessos: {dados.get('total_acessos', 0)}")
+                print(f"   💾 Fotos baixadas: {dados.get('total_downloads', 0)}")
                 print("-" * 80)
             
             # Resumo final
             print("\n" + "="*80)
             print("📈 RESUMO ESTATÍSTICO")
             print("="*80)
-            print(f"📊 Total de tokens: {len(tokens)}")
-            print(f"🟢 Tokens ativos: {ativos}")
-            print(f"⚠️  Tokens expirados: {expirados}")
-            print(f"🔴 Tokens inativos: {inativos}")
-            print(f"👻 Nunca acessaram: {nunca_acessaram}")
-            print(f"💾 Total de downloads: {total_downloads}")
+            print(f"📊 Total de tokens: {resumo['total']}")
+            print(f"🟢 Tokens ativos: {resumo['ativos']}")
+            print(f"⚠️  Tokens expirados: {resumo['expirados']}")
+            print(f"🔴 Tokens inativos: {resumo['inativos']}")
+            print(f"👻 Nunca acessaram: {resumo['nunca_acessaram']}")
+            print(f"💾 Total de downloads: {resumo['total_downloads']}")
             print("="*80)
             
         except Exception as e:
             print(f"❌ Erro ao gerar relatório: {e}")
     
+    @cronometrar('relatorio.clientes_nunca_acessaram')
     def clientes_nunca_acessaram(self):
         """Lista clientes que nunca acessaram"""
         try:
-            with open(self.arquivo_tokens, 'r', encoding='utf-8') as f:
-                tokens = json.load(f)
-            
-            nunca_acessaram = []
-            
-            for token, dados in tokens.items():
-                if not dados['acessos'] and dados['ativo']:
-                    nunca_acessaram.append((token, dados))
+            nunca_acessaram = self.obter_resumo()['sem_acesso']
             
             if not nunca_acessaram:
                 print("✅ Todos os clientes ativos já acessaram!")
@@ -105,8 +153,7 @@ class RelatorioTokens:
             print("👻 CLIENTES QUE NUNCA ACESSARAM")
             print("="*60)
             
-            for token, dados in nunca_acessaram:
-                dias_desde_criacao = (datetime.now() - datetime.fromisoformat(dados['criado_em'])).days
+            for token, dados, dias_desde_criacao in nunca_acessaram:
                 print(f"\n👤 {dados['cliente']}")
                 print(f"   🔑 Token: {token}")
                 print(f"   📂 {dados['categoria']}")
@@ -118,24 +165,17 @@ class RelatorioTokens:
         except Exception as e:
             print(f"❌ Erro ao listar clientes: {e}")
     
+    @cronometrar('relatorio.tokens_expirando')
     def tokens_expirando(self, dias=7):
         """Lista tokens que vão expirar em X dias"""
         try:
-            with open(self.arquivo_tokens, 'r', encoding='utf-8') as f:
-                tokens = json.load(f)
-            
-            expirando = []
             agora = datetime.now()
-            
-            for token, dados in tokens.items():
-                if not dados['ativo']:
-                    continue
-                    
-                expira = datetime.fromisoformat(dados['expira_em'])
-                dias_restantes = (expira - agora).days
-                
-                if 0 <= dias_restantes <= dias:
-                    expirando.append((token, dados, dias_restantes))
+            tokens = self.gt.carregar_tokens()
+            indice = self.gt.sessao.indice_expiracao()
+            expirando = [
+                (token, tokens[token], (datetime.fromisoformat(expira_em) - agora).days)
+                for expira_em, token in indice.expirando(dias, agora)
+            ]
             
             if not expirando:
                 print(f"✅ Nenhum token expira nos próximos {dias} dias!")
@@ -145,9 +185,6 @@ class RelatorioTokens:
             print(f"⚠️  TOKENS EXPIRANDO EM {dias} DIAS")
             print("="*60)
             
-            # Ordena por dias restantes
-            expirando.sort(key=lambda x: x[2])
-            
             for token, dados, dias_restantes in expirando:
                 urgencia = "🚨 HOJE!" if dias_restantes == 0 else f"⏰ {dias_restantes} dia(s)"
                 
@@ -155,7 +192,7 @@ class RelatorioTokens:
                 print(f"   🔑 Token: {token}")
                 print(f"   ⚠️  Expira: {urgencia}")
                 print(f"   📂 {dados['categoria']}")
-                print(f"   🔗 Acessos: {len(dados['acessos'])}")
+                print(f"   🔗 Acessos: {dados.get('total_acessos', 0)}")
             
             print("="*60)
             
@@ -171,27 +208,22 @@ class RelatorioTokens:
             
             token = input("\n🔑 Digite o token para desativar: ").strip()
             
-            with open(self.arquivo_tokens, 'r', encoding='utf-8') as f:
-                tokens = json.load(f)
+            dados = self.gt.sessao.obter(token)
             
-            if token not in tokens:
+            if dados is None:
                 print("❌ Token não encontrado!")
                 return
             
-            if not tokens[token]['ativo']:
+            if not dados['ativo']:
                 print("⚠️  Token já está inativo!")
                 return
             
             # Confirma desativação
-            cliente = tokens[token]['cliente']
+            cliente = dados['cliente']
             confirma = input(f"❓ Desativar token do cliente '{cliente}'? (s/N): ").strip().lower()
             
             if confirma == 's':
-                tokens[token]['ativo'] = False
-                tokens[token]['desativado_em'] = datetime.now().isoformat()
-                
-                with open(self.arquivo_tokens, 'w', encoding='utf-8') as f:
-                    json.dump(tokens, f, indent=2, ensure_ascii=False)
+                self.gt.sessao.desativar(token)
                 
                 # Faz backup
                 self.gt.fazer_backup()
@@ -203,28 +235,23 @@ class RelatorioTokens:
         except Exception as e:
             print(f"❌ Erro ao desativar token: {e}")
     
+    @cronometrar('relatorio.listar_tokens_ativos')
     def listar_tokens_ativos(self):
         """Lista apenas tokens ativos"""
         try:
-            with open(self.arquivo_tokens, 'r', encoding='utf-8') as f:
-                tokens = json.load(f)
-            
-            ativos = []
-            agora = datetime.now()
-            
-            for token, dados in tokens.items():
-                if dados['ativo']:
-                    expira = datetime.fromisoformat(dados['expira_em'])
-                    if expira > agora:  # Não expirado
-                        dias_restantes = (expira - agora).days
-                        ativos.append((token, dados, dias_restantes))
+            if self._store_indexado():
+                agora = datetime.now()
+                ativos = [
+                    (token, dados, (datetime.fromisoformat(dados['expira_em']) - agora).days)
+                    for token, dados in self.gt.store.listar_ativos(agora)
+                ]
+            else:
+                ativos = self.obter_resumo()['lista_ativos']
             
             if not ativos:
                 print("📭 Nenhum token ativo encontrado.")
                 return
             
-            ativos.sort(key=lambda item: item[1]['cliente'])
-            
             for token, dados, dias_restantes in ativos:
                 print(f"\n👤 {dados['cliente']}")
                 print(f"   🔑 Token completo: {token}")
@@ -234,49 +261,131 @@ class RelatorioTokens:
         except Exception as e:
             print(f"❌ Erro ao listar tokens ativos: {e}")
     
-    def estatisticas_categoria(self):
-        """Mostra estatísticas por categoria"""
+    @cronometrar('relatorio.historico_acessos')
+    def historico_acessos(self, dias=30):
+        """Acessos por cliente nos últimos X dias, lidos do log em streaming"""
         try:
-            with open(self.arquivo_tokens, 'r', encoding='utf-8') as f:
-                tokens = json.load(f)
-            
-            stats = {}
-            
-            for token, dados in tokens.items():
-                categoria = dados['categoria']
-                if categoria not in stats:
-                    stats[categoria] = {
-                        'total': 0,
-                        'ativos': 0,
-                        'downloads': 0,
-                        'acessos': 0
-                    }
-                
-                stats[categoria]['total'] += 1
-                if dados['ativo']:
-                    stats[categoria]['ativos'] += 1
-                stats[categoria]['downloads'] += len(dados['fotos_baixadas'])
-                stats[categoria]['acessos'] += len(dados['acessos'])
+            desde = (datetime.now() - timedelta(days=dias)).isoformat()
+            por_token = {}
+            total = 0
+            for evento in self.log.eventos(desde=desde, tipo='acesso'):
+                quantidade, _ = por_token.get(evento['token'], (0, None))
+                por_token[evento['token']] = (quantidade + 1, evento['em'])
+                total += 1
+            
+            if not por_token:
+                print(f"📭 Nenhum acesso registrado nos últimos {dias} dias.")
+                return
+            
+            tokens = self.gt.carregar_tokens()
+            print("\n" + "="*60)
+            print(f"📜 ACESSOS NOS ÚLTIMOS {dias} DIAS")
+            print("="*60)
+            
+            for token, (quantidade, ultimo) in sorted(por_token.items(), key=lambda item: -item[1][0]):
+                dados = tokens.get(token, {})
+                print(f"\n👤 {dados.get('cliente', '(token removido)')}")
+                print(f"   🔑 Token: {token}")
+                print(f"   🔗 Acessos: {quantidade}")
+                print(f"   🕒 Último: {datetime.fromisoformat(ultimo).strftime('%d/%m/%Y às %H:%M')}")
+            
+            print(f"\n📊 Total: {total} acesso(s) de {len(por_token)} cliente(s)")
+            print("="*60)
+            
+        except Exception as e:
+            print(f"❌ Erro ao ler o log de acessos: {e}")
+    
+    @cronometrar('relatorio.relatorio_periodo')
+    def relatorio_periodo(self):
+        """Acessos e downloads por categoria e álbum, a partir dos contadores diários"""
+        try:
+            rollup = self.gt.sessao.rollup()
+            secoes = [
+                ("🔗 ACESSOS NA SEMANA POR CATEGORIA", 'acesso', 'categoria', 7),
+                ("🔗 ACESSOS EM 30 DIAS POR ÁLBUM", 'acesso', 'album', 30),
+                ("💾 DOWNLOADS EM 30 DIAS POR ÁLBUM", 'download', 'album', 30),
+            ]
+            
+            print("\n" + "="*60)
+            print("📈 ACESSOS E DOWNLOADS POR PERÍODO")
+            print("="*60)
+            
+            for titulo, tipo, dimensao, dias in secoes:
+                print(f"\n{titulo}")
+                totais = rollup.janela(tipo, dimensao, dias)
+                if not totais:
+                    print("   (nenhum registro)")
+                for chave, total in totais.most_common():
+                    print(f"   {chave}: {total}")
+            
+            print("="*60)
+            
+        except Exception as e:
+            print(f"❌ Erro ao gerar relatório por período: {e}")
+    
+    @cronometrar('relatorio.estatisticas_categoria')
+    def estatisticas_categoria(self, incluir_arquivados=None):
+        """Mostra estatísticas por categoria (opcionalmente com os tokens arquivados)"""
+        try:
+            if self._store_indexado():
+                stats = self.gt.store.estatisticas_categoria()
+            else:
+                stats = self.obter_resumo()['categorias']
+            arquivo = ArquivoFrio(arquivo_frio(self.gt.sessao.arquivo_tokens))
+            if incluir_arquivados is None and arquivo.tamanho():
+                resposta = input("❓ Incluir tokens arquivados? (s/N): ").strip().lower()
+                incluir_arquivados = resposta == 's'
+            arquivados = agregar_arquivados(arquivo)['categorias'] if incluir_arquivados else {}
             
             print("\n" + "="*60)
-            print("📊 ESTATÍSTICAS POR CATEGORIA")
+            print("📊 ESTATÍSTICAS POR CATEGORIA" + (" (COM ARQUIVADOS)" if incluir_arquivados else ""))
             print("="*60)
             
-            for categoria, dados in stats.items():
+            for categoria in list(stats) + [c for c in arquivados if c not in stats]:
+                dados = stats.get(categoria, {'total': 0, 'ativos': 0, 'acessos': 0, 'downloads': 0})
+                antigos = arquivados.get(categoria, {'total': 0, 'acessos': 0, 'downloads': 0})
                 print(f"\n📂 {categoria}")
-                print(f"   📊 Total de clientes: {dados['total']}")
+                print(f"   📊 Total de clientes: {dados['total'] + antigos['total']}")
                 print(f"   🟢 Ativos: {dados['ativos']}")
-                print(f"   🔗 Total de acessos: {dados['acessos']}")
-                print(f"   💾 Total de downloads: {dados['downloads']}")
+                if incluir_arquivados:
+                    print(f"   🧊 Arquivados: {antigos['total']}")
+                print(f"   🔗 Total de acessos: {dados['acessos'] + antigos['acessos']}")
+                print(f"   💾 Total de downloads: {dados['downloads'] + antigos['downloads']}")
             
             print("="*60)
             
         except Exception as e:
             print(f"❌ Erro ao gerar estatísticas: {e}")
+    
+    @cronometrar('relatorio.varrer_vencidos')
+    def varrer_vencidos(self):
+        """Desativa os vencidos e move para o arquivo frio os inativos antigos"""
+        try:
+            dias = input(f"\n🧊 Arquivar tokens inativos há mais de quantos dias? [{DIAS_INATIVO_PADRAO}]: ").strip()
+            if dias and not dias.isdigit():
+                print("❌ Número de dias inválido!")
+                return
+            dias = int(dias) if dias else DIAS_INATIVO_PADRAO
+            previa = varrer(self.gt.sessao, dias, simular=True)
+            if not (previa['desativados'] or previa['arquivados']):
+                print("✅ Nada a desativar ou arquivar.")
+                return
+            print(f"⚠️  {previa['desativados']} token(s) vencido(s) serão desativados")
+            print(f"🧊 {previa['arquivados']} token(s) serão movidos para {previa['arquivo']}")
+            if input("❓ Confirmar? (s/N): ").strip().lower() != 's':
+                print("❌ Operação cancelada.")
+                return
+            
+            self.gt.fazer_backup()
+            resultado = varrer(self.gt.sessao, dias)
+            print(f"✅ {resultado['desativados']} desativado(s), {resultado['arquivados']} arquivado(s), "
+                  f"{resultado['restantes']} token(s) no cadastro.")
+        except Exception as e:
+            print(f"❌ Erro na varredura: {e}")
 
-def main():
+def main(rt=None):
     """Menu principal do relatório"""
-    rt = RelatorioTokens()
+    rt = rt or RelatorioTokens()
     
     while True:
         print("\n" + "="*50)
@@ -288,7 +397,10 @@ def main():
         print("4. ❌ Desativar token")
         print("5. 🟢 Listar apenas ativos")
         print("6. 📊 Estatísticas por categoria")
-        print("7. 🚪 Voltar")
+        print("7. 📜 Acessos dos últimos 30 dias")
+        print("8. 📈 Acessos e downloads por período")
+        print("9. 🧊 Varrer vencidos e arquivar antigos")
+        print("10. 🚪 Voltar")
         
         opcao = input("\nEscolha uma opção: ").strip()
         
@@ -305,6 +417,12 @@ def main():
         elif opcao == "6":
             rt.estatisticas_categoria()
         elif opcao == "7":
+            rt.historico_acessos()
+        elif opcao == "8":
+            rt.relatorio_periodo()
+        elif opcao == "9":
+            rt.varrer_vencidos()
+        elif opcao == "10":
             break
         else:
             print("❌ Opção inválida!")
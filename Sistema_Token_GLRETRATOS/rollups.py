@@ -0,0 +1,148 @@
+import json
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from armazenamento import assinatura_arquivos, escrever_json
+
+DIMENSOES = ('token', 'album', 'categoria')
+
+
+def albuns_do_evento(evento, dados):
+    """Álbuns a que um evento se refere: o do download ou os liberados no token"""
+    if evento.get('album'):
+        return [evento['album']]
+    pastas = dados.get('pastas_permitidas') or ([dados['pasta']] if dados.get('pasta') else [])
+    return pastas
+
+
+class RollupDiario:
+    """Contadores diários de eventos por token, álbum e categoria.
+
+    ``rollups.json`` guarda ``dias -> tipo (acesso, download) -> dimensão ->
+    chave -> total``. Cada evento do log incrementa os contadores do seu dia,
+    de modo que "acessos desta semana por categoria" soma alguns dias de
+    contadores em vez de percorrer o histórico de cada token. Se o arquivo
+    sumir, ``reconstruir`` refaz tudo a partir do log de acessos.
+
+    Um evento novo não regrava o ``rollups.json``: seus incrementos vão
+    numa linha de ``rollups.pendentes.ndjson``, somada ao carregar. Quando
+    as pendências passam de ``limite_pendentes`` bytes elas são
+    incorporadas ao ``rollups.json`` e o arquivo de pendências é zerado.
+    """
+
+    def __init__(self, arquivo='logs_acesso/rollups.json', manter_dias=400, limite_pendentes=256 * 1024):
+        self.arquivo = arquivo
+        self.arquivo_pendentes = f"{os.path.splitext(arquivo)[0]}.pendentes.ndjson"
+        self.manter_dias = manter_dias
+        self.limite_pendentes = limite_pendentes
+        self.dias = None
+        self._assinatura = None
+
+    def _assinatura_atual(self):
+        return assinatura_arquivos(self.arquivo, self.arquivo_pendentes)
+
+    def carregar(self):
+        """Lê os contadores (e as pendências) se ainda não lidos ou se outro processo gravou"""
+        assinatura = self._assinatura_atual()
+        if self.dias is None or assinatura != self._assinatura:
+            try:
+                with open(self.arquivo, 'r', encoding='utf-8') as f:
+                    self.dias = json.load(f).get('dias', {})
+            except (OSError, ValueError, AttributeError):
+                self.dias = None
+                return False
+            for evento in self._pendentes():
+                self._somar_chaves(evento['dia'], evento['tipo'], evento['chaves'])
+            self._assinatura = assinatura
+        return True
+
+    def _pendentes(self):
+        try:
+            with open(self.arquivo_pendentes, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        yield json.loads(linha)
+                    except ValueError:
+                        # Linha cortada por uma escrita interrompida
+                        continue
+        except FileNotFoundError:
+            return
+
+    def salvar(self):
+        """Grava todos os contadores no rollups.json e zera as pendências"""
+        limite = (datetime.now() - timedelta(days=self.manter_dias)).date().isoformat()
+        for dia in [dia for dia in self.dias if dia < limite]:
+            del self.dias[dia]
+        try:
+            escrever_json(self.arquivo, {'dias': self.dias})
+            with open(self.arquivo_pendentes, 'w', encoding='utf-8'):
+                pass
+            self._assinatura = self._assinatura_atual()
+        except OSError as e:
+            # Sem o arquivo os contadores são reconstruídos a partir do log
+            print(f"⚠️  Não foi possível salvar os contadores diários: {e}")
+
+    def apagar(self):
+        """Descarta os contadores; a próxima consulta os reconstrói a partir do log"""
+        self.dias = None
+        for caminho in (self.arquivo, self.arquivo_pendentes):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+    @staticmethod
+    def _chaves(evento, dados):
+        return {
+            'token': [evento['token']],
+            'album': albuns_do_evento(evento, dados),
+            'categoria': [dados.get('categoria') or 'Outros'],
+        }
+
+    def _somar_chaves(self, dia, tipo, chaves):
+        contadores = self.dias.setdefault(dia, {}).setdefault(tipo, {})
+        for dimensao, valores in chaves.items():
+            por_chave = contadores.setdefault(dimensao, {})
+            for valor in valores:
+                por_chave[valor] = por_chave.get(valor, 0) + 1
+
+    def _somar(self, evento, dados):
+        self._somar_chaves(evento['em'][:10], evento['tipo'], self._chaves(evento, dados))
+
+    def contar(self, evento, dados):
+        """Incrementa os contadores (já carregados) com um evento recém-registrado"""
+        dados = dados or {}
+        pendente = {'dia': evento['em'][:10], 'tipo': evento['tipo'], 'chaves': self._chaves(evento, dados)}
+        self._somar_chaves(pendente['dia'], pendente['tipo'], pendente['chaves'])
+        try:
+            with open(self.arquivo_pendentes, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(pendente, ensure_ascii=False, separators=(',', ':')) + '\n')
+                tamanho = f.tell()
+            self._assinatura = self._assinatura_atual()
+        except OSError as e:
+            print(f"⚠️  Não foi possível salvar os contadores diários: {e}")
+            return
+        if tamanho > self.limite_pendentes:
+            self.salvar()
+
+    def reconstruir(self, log, tokens):
+        """Recalcula todos os contadores percorrendo o log em streaming"""
+        self.dias = {}
+        for evento in log.eventos():
+            self._somar(evento, tokens.get(evento.get('token'), {}))
+        self.salvar()
+
+    def janela(self, tipo, dimensao, dias, agora=None):
+        """Totais de ``tipo`` por ``dimensao`` nos últimos ``dias`` dias (hoje incluso)"""
+        if dimensao not in DIMENSOES:
+            raise ValueError(f"Dimensão desconhecida: {dimensao}")
+        agora = agora or datetime.now()
+        inicio = (agora - timedelta(days=dias - 1)).date().isoformat()
+        fim = agora.date().isoformat()
+        totais = Counter()
+        for dia, por_tipo in (self.dias or {}).items():
+            if inicio <= dia <= fim:
+                totais.update(por_tipo.get(tipo, {}).get(dimensao, {}))
+        return totais
+
+    def tamanho(self):
+        return sum(os.path.getsize(caminho) for caminho in (self.arquivo, self.arquivo_pendentes)
+                   if os.path.exists(caminho))
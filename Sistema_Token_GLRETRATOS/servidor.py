@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import time
+from datetime import datetime
+from email.utils import formatdate
+from urllib.parse import unquote, urlsplit
+from sessao import SessaoTokens
+from shards_tokens import dados_shard, hash_token
+
+MOTIVOS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 403: 'Forbidden',
+           404: 'Not Found', 405: 'Method Not Allowed', 429: 'Too Many Requests',
+           500: 'Internal Server Error'}
+
+# Manifestos de álbuns mudam a cada sincronização: sempre revalidar pelo ETag
+CACHE_ALBUNS = 'no-cache'
+CACHE_ESTATICOS = 'public, max-age=300'
+# Só o que o GitHub Pages publicaria; tokens.json, GCAPI/, backups e logs ficam de fora
+PUBLICOS = ('index.html', 'galeria.html', 'CSS/', 'JS/', 'assets/', 'fotos/')
+
+
+class LimiteTaxa:
+    """Balde de fichas por IP: ``taxa`` requisições/s com rajadas de até ``rajada``"""
+
+    def __init__(self, taxa=50.0, rajada=100):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.baldes = {}  # ip -> [fichas, instante]
+
+    def permitir(self, ip, agora=None):
+        agora = agora if agora is not None else time.monotonic()
+        fichas, instante = self.baldes.get(ip, (self.rajada, agora))
+        fichas = min(self.rajada, fichas + (agora - instante) * self.taxa)
+        if fichas < 1:
+            self.baldes[ip] = [fichas, agora]
+            return False
+        self.baldes[ip] = [fichas - 1, agora]
+        return True
+
+    def espera(self, ip):
+        """Segundos até o IP ter uma ficha de novo (para o Retry-After)"""
+        fichas = self.baldes.get(ip, (self.rajada, 0))[0]
+        return max(1, int((1 - fichas) / self.taxa + 0.999))
+
+    def limpar(self, agora=None):
+        """Esquece IPs com o balde cheio de novo"""
+        agora = agora if agora is not None else time.monotonic()
+        cheio = self.rajada / self.taxa
+        for ip in [ip for ip, (_, instante) in self.baldes.items() if agora - instante > cheio]:
+            del self.baldes[ip]
+
+
+class ServidorTokens:
+    """Serviço HTTP local que valida tokens a partir de um dicionário em memória.
+
+    ``/validate/<token>`` e ``/tokens/<sha256>.json`` (o mesmo caminho que o
+    ``JS/auth.js`` busca) são respondidos sem tocar no disco. Uma tarefa em
+    segundo plano confere a assinatura do backend e recarrega os tokens
+    quando o arquivo muda. Os demais caminhos servem os arquivos do site
+    com ETag, e os manifestos de ``fotos/`` vão com ``Cache-Control: no-cache``
+    para serem revalidados a cada abertura.
+    """
+
+    def __init__(self, raiz='.', sessao=None, limite=None, intervalo_recarga=1.0):
+        self.raiz = os.path.abspath(raiz)
+        self.sessao = sessao or SessaoTokens()
+        self.limite = limite or LimiteTaxa()
+        self.intervalo_recarga = intervalo_recarga
+        self.tokens = {}
+        self.shards = {}  # sha256 do token -> bytes do shard
+        self.versao = None
+        self.arquivos = {}  # caminho -> (mtime_ns, tamanho, etag, corpo)
+        self.recarregar()
+
+    # ----- tokens em memória -----
+
+    def recarregar(self):
+        """Relê os tokens se a sessão mudou; retorna True se houve recarga"""
+        tokens = self.sessao.tokens()
+        if self.sessao.versao == self.versao:
+            return False
+        self.tokens = tokens
+        self.shards = {
+            hash_token(token): json.dumps(dados_shard(dados), sort_keys=True,
+                                          separators=(',', ':')).encode('utf-8')
+            for token, dados in tokens.items()
+        }
+        self.versao = self.sessao.versao
+        return True
+
+    async def vigiar(self):
+        while True:
+            await asyncio.sleep(self.intervalo_recarga)
+            try:
+                if self.recarregar():
+                    print(f"🔄 Tokens recarregados: {len(self.tokens)}")
+            except Exception as e:
+                # Arquivo no meio de uma troca: tenta de novo no próximo ciclo
+                print(f"⚠️  Falha ao recarregar tokens: {e}")
+            self.limite.limpar()
+
+    def validar(self, token):
+        dados = self.tokens.get(token)
+        if dados is None:
+            return 404, {'valido': False, 'motivo': 'Token não encontrado'}
+        resposta = dados_shard(dados)
+        if not dados['ativo']:
+            resposta.update(valido=False, motivo='Token desativado')
+        elif dados['expira_em'] < datetime.now().isoformat():
+            resposta.update(valido=False, motivo='Token expirado')
+        else:
+            resposta.update(valido=True)
+        return 200, resposta
+
+    # ----- arquivos do site -----
+
+    def arquivo(self, caminho):
+        """(etag, corpo) de um arquivo da raiz, relido só quando muda"""
+        info = os.stat(caminho)
+        guardado = self.arquivos.get(caminho)
+        if guardado and guardado[:2] == (info.st_mtime_ns, info.st_size):
+            return guardado[2], guardado[3]
+        with open(caminho, 'rb') as f:
+            corpo = f.read()
+        etag = '"%s"' % hashlib.sha1(corpo).hexdigest()
+        self.arquivos[caminho] = (info.st_mtime_ns, info.st_size, etag, corpo)
+        return etag, corpo
+
+    def resolver(self, rota):
+        relativo = unquote(rota).lstrip('/') or 'index.html'
+        caminho = os.path.abspath(os.path.join(self.raiz, relativo))
+        if not caminho.startswith(self.raiz + os.sep):
+            return None
+        if os.path.isdir(caminho):
+            caminho = os.path.join(caminho, 'index.html')
+        relativo = os.path.relpath(caminho, self.raiz).replace(os.sep, '/')
+        if not relativo.startswith(PUBLICOS):
+            return None
+        return caminho
+
+    # ----- HTTP -----
+
+    def responder(self, metodo, rota, cabecalhos, ip):
+        """Retorna (status, cabeçalhos, corpo) para uma requisição"""
+        if metodo not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+        if not self.limite.permitir(ip):
+            return 429, {'Retry-After': str(self.limite.espera(ip))}, b''
+
+        rota = urlsplit(rota).path
+        if rota.startswith('/validate/'):
+            status, resposta = self.validar(unquote(rota[len('/validate/'):]))
+            return status, {'Content-Type': 'application/json; charset=utf-8',
+                            'Cache-Control': 'no-store'}, \
+                json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+
+        if rota.startswith('/tokens/') and rota.endswith('.json'):
+            shard = self.shards.get(rota[len('/tokens/'):-len('.json')])
+            if shard is None:
+                return 404, {}, b''
+            return 200, {'Content-Type': 'application/json', 'Cache-Control': 'no-cache'}, shard
+
+        caminho = self.resolver(rota)
+        if caminho is None:
+            return 403, {}, b''
+        if not os.path.isfile(caminho):
+            return 404, {}, b''
+        etag, corpo = self.arquivo(caminho)
+        tipo = mimetypes.guess_type(caminho)[0] or 'application/octet-stream'
+        relativo = os.path.relpath(caminho, self.raiz).replace(os.sep, '/')
+        extras = {
+            'ETag': etag,
+            'Cache-Control': CACHE_ALBUNS if relativo.startswith('fotos/') else CACHE_ESTATICOS,
+        }
+        if etag in [valor.strip() for valor in cabecalhos.get('if-none-match', '').split(',')]:
+            return 304, extras, b''
+        if tipo.startswith('text/') or tipo in ('application/json', 'application/javascript'):
+            tipo += '; charset=utf-8'
+        extras['Content-Type'] = tipo
+        return 200, extras, corpo
+
+    async def atender(self, leitor, escritor):
+        ip = (escritor.get_extra_info('peername') or ('?',))[0]
+        try:
+            while True:
+                try:
+                    bruto = await leitor.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                linhas = bruto.decode('latin-1').split('\r\n')
+                try:
+                    metodo, rota, versao = linhas[0].split(' ', 2)
+                except ValueError:
+                    escritor.write(self._montar(400, {}, b'', False, 'GET'))
+                    break
+                cabecalhos = {}
+                for linha in linhas[1:]:
+                    if ':' in linha:
+                        nome, valor = linha.split(':', 1)
+                        cabecalhos[nome.strip().lower()] = valor.strip()
+                conexao = cabecalhos.get('connection', '').lower()
+                manter = conexao == 'keep-alive' if versao == 'HTTP/1.0' else conexao != 'close'
+
+                try:
+                    status, extras, corpo = self.responder(metodo, rota, cabecalhos, ip)
+                except Exception as e:
+                    print(f"❌ Erro em {metodo} {rota}: {e}")
+                    status, extras, corpo = 500, {}, b''
+                escritor.write(self._montar(status, extras, corpo, manter, metodo))
+                await escritor.drain()
+                if not manter:
+                    break
+        finally:
+            escritor.close()
+
+    @staticmethod
+    def _montar(status, extras, corpo, manter, metodo):
+        cabecalhos = {
+            'Date': formatdate(usegmt=True),
+            'Content-Length': str(len(corpo)),
+            'Connection': 'keep-alive' if manter else 'close',
+        }
+        cabecalhos.update(extras)
+        cabecalho = f"HTTP/1.1 {status} {MOTIVOS.get(status, '')}\r\n" + \
+            ''.join(f"{nome}: {valor}\r\n" for nome, valor in cabecalhos.items()) + '\r\n'
+        return cabecalho.encode('latin-1') + (b'' if metodo == 'HEAD' or status == 304 else corpo)
+
+    async def servir(self, host='127.0.0.1', porta=8080):
+        servidor = await asyncio.start_server(self.atender, host, porta)
+        vigia = asyncio.ensure_future(self.vigiar())
+        print(f"🌐 Servindo {self.raiz} em http://{host}:{porta} ({len(self.tokens)} tokens)")
+        try:
+            async with servidor:
+                await servidor.serve_forever()
+        finally:
+            vigia.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço local de validação de tokens e arquivos do site")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--raiz', default='.', help="pasta do site (padrão: atual)")
+    parser.add_argument('--taxa', type=float, default=50.0, help="requisições por segundo por IP")
+    parser.add_argument('--rajada', type=int, default=100, help="rajada máxima por IP")
+    args = parser.parse_args(argv)
+
+    servidor = ServidorTokens(args.raiz, SessaoTokens(os.path.join(args.raiz, 'tokens.json'),
+                                                      os.path.join(args.raiz, 'logs_acesso')),
+                              LimiteTaxa(args.taxa, args.rajada))
+    try:
+        asyncio.run(servidor.servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        print("\n👋 Servidor encerrado.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from alocador_tokens import AlocadorTokens
+from armazenamento import (CAMPOS_HISTORICO, ConflitoEscrita, JournalTokens, abrir_store,
+                           separar_historico)
+from indice_expiracao import IndiceExpiracao, arquivo_indice
+from log_acessos import LogAcessos
+from perfil import cronometrar
+from rollups import RollupDiario
+from shards_tokens import atualizar_shards, exportar_shards
+from varredura import ArquivoFrio, arquivo_frio
+
+
+class TokensAusentes(FileNotFoundError):
+    """O arquivo de tokens não existe, mas há backups que podem ser restaurados"""
+
+
+class SessaoTokens:
+    """Estado de tokens compartilhado por todo o processo.
+
+    Guarda os tokens já lidos e só relê o backend quando a assinatura dos
+    arquivos (inode, mtime, tamanho) muda. Toda escrita passa por aqui,
+    atualizando a cópia em memória sem reler o arquivo.
+
+    Escritas acontecem sob a trava do backend (``tokens.lock``). Dentro
+    dela a assinatura é conferida de novo: se outro processo gravou desde
+    a última leitura, a cópia em memória é recarregada antes de validar e
+    aplicar a operação, então nenhuma atualização concorrente se perde.
+    """
+
+    def __init__(self, arquivo_tokens='tokens.json', pasta_logs='logs_acesso', pasta_shards=None):
+        self.arquivo_tokens = arquivo_tokens
+        self.pasta_logs = pasta_logs
+        # Shards de login lidos pela galeria (tokens/ ao lado do tokens.json)
+        self.pasta_shards = pasta_shards or os.path.join(os.path.dirname(arquivo_tokens), 'tokens')
+        self.store = abrir_store(arquivo_tokens)
+        self.log = LogAcessos(pasta_logs)
+        self.rollups = RollupDiario(os.path.join(pasta_logs, 'rollups.json'))
+        self.versao = 0
+        self._tokens = None
+        self._assinatura = None
+        self._indice = None
+        self._alocador = None
+        self._legado = False
+
+    def criar_arquivos_base(self):
+        """Cria arquivos e pastas base se não existirem.
+
+        Se o ``tokens.json`` sumiu (por exemplo, apagado pelo git num pull
+        depois de sair do repositório) mas há backups, levanta
+        ``TokensAusentes`` em vez de começar um store vazio por cima deles.
+        """
+        if not os.path.exists(self.arquivo_tokens) and self.tem_backups() and not self.tokens():
+            raise TokensAusentes(
+                f"{self.arquivo_tokens} não encontrado, mas há backups em backup_tokens/: "
+                "restaure um deles em vez de começar do zero")
+        if not os.path.exists(self.arquivo_tokens):
+            with open(self.arquivo_tokens, 'w', encoding='utf-8') as f:
+                json.dump({}, f)
+
+        if not os.path.exists('backup_tokens'):
+            os.makedirs('backup_tokens')
+
+        os.makedirs(self.pasta_logs, exist_ok=True)
+        # O antigo logs_acesso.json (uma lista JSON) vira eventos do log NDJSON
+        with self.store.trava:
+            if os.path.isfile(f"{self.pasta_logs}.json"):
+                self.log.migrar_json(f"{self.pasta_logs}.json")
+            self.tokens()
+            if self._legado:
+                self.migrar_historico()
+
+    @staticmethod
+    def tem_backups(pasta='backup_tokens'):
+        return os.path.isdir(pasta) and any(not nome.startswith('.') for nome in os.listdir(pasta))
+
+    @cronometrar('sessao.tokens')
+    def tokens(self):
+        """Dicionário de tokens atual (somente leitura para quem chama)"""
+        assinatura = self.store.assinatura()
+        if self._tokens is None or assinatura is None or assinatura != self._assinatura:
+            self._tokens = self.store.carregar()
+            self._legado = self._compactar_historico_em_memoria()
+            self._assinatura = self.store.assinatura()
+            self._indice = None
+            self._alocador = None
+            self.versao += 1
+        return self._tokens
+
+    def _compactar_historico_em_memoria(self):
+        """Troca, só na cópia em memória, as listas de tokens antigos pelos contadores.
+
+        Consultas enxergam o formato novo sem gravar nada; a gravação fica
+        para ``migrar_historico``. Retorna se havia algum token antigo.
+        """
+        legado = False
+        for token, dados in self._tokens.items():
+            if any(campo in dados for campo in CAMPOS_HISTORICO):
+                self._tokens[token] = separar_historico(dados)[0]
+                legado = True
+        return legado
+
+    def migrar_historico(self):
+        """Move as listas acessos/fotos_baixadas de tokens antigos para o log.
+
+        O registro passa a guardar só total_acessos, total_downloads e
+        ultimo_acesso; o histórico vira eventos no log de acessos e os
+        contadores diários são recalculados na próxima consulta. Roda na
+        preparação dos arquivos base, pelo ``cli.py migrate`` ou antes da
+        primeira escrita; retorna quantos tokens foram migrados.
+        """
+        with self.store.trava:
+            # Lido de novo sob a trava: outro processo pode ter migrado antes
+            tokens = self.store.carregar()
+            migrar = [token for token, dados in tokens.items()
+                      if any(campo in dados for campo in CAMPOS_HISTORICO)]
+            if migrar:
+                for token in migrar:
+                    dados, acessos, downloads = separar_historico(tokens[token])
+                    for em in acessos:
+                        self.log.registrar('acesso', token, em, migrado=True)
+                    for foto in downloads:
+                        self.log.registrar('download', token, dados['ultimo_acesso'] or dados['criado_em'],
+                                           foto=foto, migrado=True)
+                    tokens[token] = dados
+                self.store.substituir(tokens)
+                self.rollups.apagar()
+                print(f"📦 Histórico de {len(migrar)} token(s) movido para {self.pasta_logs}/")
+            self.invalidar()
+        return len(migrar)
+
+    def indice_expiracao(self, salvar=True):
+        """Índice por expiração; lido do disco ou reconstruído se defasado.
+
+        Com ``salvar=False`` (consultas) um índice reconstruído fica só em memória.
+        """
+        tokens = self.tokens()
+        if self._indice is None:
+            arquivo = arquivo_indice(self.arquivo_tokens)
+            self._indice = IndiceExpiracao.carregar(arquivo, self._assinatura, self.store, tokens)
+            if self._indice is None:
+                self._indice = IndiceExpiracao.construir(arquivo, tokens)
+                if salvar:
+                    self._indice.salvar(self._assinatura)
+        return self._indice
+
+    def alocador(self):
+        """Alocador de IDs com as chaves atuais e as do arquivo frio; refeito quando outro processo grava"""
+        tokens = self.tokens()
+        if self._alocador is None:
+            alocador = AlocadorTokens(tokens)
+            # IDs arquivados continuam nos logs e rollups: não podem voltar a ser emitidos
+            for token, _, _ in ArquivoFrio(arquivo_frio(self.arquivo_tokens)).ler():
+                alocador.reservar(token)
+            self._alocador = alocador
+        return self._alocador
+
+    def rollup(self):
+        """Contadores diários; reconstruídos a partir do log se o arquivo sumiu"""
+        if not self.rollups.carregar():
+            self.rollups.reconstruir(self.log, self.tokens())
+        return self.rollups
+
+    def obter(self, token):
+        return self.tokens().get(token)
+
+    def invalidar(self):
+        self._tokens = None
+        self._indice = None
+        self._alocador = None
+
+    # ----- caminho único de escrita -----
+
+    def _aplicar(self, registro):
+        """Espelha na cópia em memória uma escrita já gravada no backend"""
+        if self._tokens is not None:
+            # Só criações e desativações mudam o índice; acessos não o regravam
+            mudou = self._indice is not None and self._indice.aplicar(registro, self._tokens)
+            JournalTokens.aplicar(self._tokens, registro)
+            self._assinatura = self.store.assinatura()
+            if mudou:
+                self._indice.salvar(self._assinatura)
+        self._atualizar_shards(registro)
+        if self._alocador is not None and registro['op'] in ('criar', 'criar_lote'):
+            # Tokens com ID escolhido por fora do alocador também passam a contar como usados
+            for token in registro['tokens'] if registro['op'] == 'criar_lote' else (registro['token'],):
+                self._alocador.reservar(token)
+        self.versao += 1
+
+    def _atualizar_shards(self, registro):
+        """Regrava o shard de login dos tokens criados ou desativados pelo registro"""
+        if registro['op'] == 'criar_lote':
+            afetados = registro['tokens']
+        elif registro['op'] in ('criar', 'desativar'):
+            afetados = (registro['token'],)
+        else:
+            return
+        tokens = self._tokens or {}
+        try:
+            atualizar_shards({token: tokens.get(token) for token in afetados}, self.pasta_shards)
+        except OSError as e:
+            # O backend já gravou; publicar() (ao sair do menu) refaz os shards
+            print(f"⚠️  Shards de login não atualizados: {e}")
+
+    def exportar_shards(self):
+        """Deixa a pasta de shards igual ao estado atual; retorna (gravados, removidos)"""
+        try:
+            return exportar_shards(self.tokens(), self.pasta_shards)
+        except OSError as e:
+            print(f"⚠️  Shards de login não atualizados: {e}")
+            return 0, 0
+
+    @contextmanager
+    def escrita(self):
+        """Trava o backend e garante a cópia em memória na versão do disco"""
+        with self.store.trava:
+            # tokens() compara a assinatura e recarrega se outro processo gravou
+            self.tokens()
+            if self._legado:
+                self.migrar_historico()
+            yield self.tokens()
+
+    @cronometrar('sessao.criar')
+    def criar(self, token, dados):
+        with self.escrita() as tokens:
+            if token in tokens:
+                raise ConflitoEscrita(f"Token {token} já existe")
+            self.store.criar(token, dados)
+            self._aplicar({'op': 'criar', 'token': token, 'dados': dados})
+
+    @cronometrar('sessao.criar_lote')
+    def criar_lote(self, novos):
+        with self.escrita() as tokens:
+            repetidos = [token for token in novos if token in tokens]
+            if repetidos:
+                raise ConflitoEscrita(f"Token(s) já existente(s): {', '.join(repetidos)}")
+            self.store.criar_lote(novos)
+            self._aplicar({'op': 'criar_lote', 'tokens': novos})
+
+    @cronometrar('sessao.substituir')
+    def substituir(self, tokens):
+        with self.store.trava:
+            self.store.substituir(tokens)
+            self.invalidar()
+            self.versao += 1
+            self.exportar_shards()
+
+    @cronometrar('sessao.substituir_json')
+    def substituir_json(self, fluxo):
+        with self.store.trava:
+            self.store.substituir_json(fluxo)
+            self.invalidar()
+            self.versao += 1
+            self.exportar_shards()
+
+    @cronometrar('sessao.desativar')
+    def desativar(self, token, em=None):
+        with self.escrita():
+            # O horário é tomado dentro da trava para manter o journal em ordem
+            em = em or datetime.now().isoformat()
+            self.store.desativar(token, em)
+            self._aplicar({'op': 'desativar', 'token': token, 'em': em})
+
+    @cronometrar('sessao.registrar_acesso')
+    def registrar_acesso(self, token, em=None):
+        with self.escrita() as tokens:
+            em = em or datetime.now().isoformat()
+            seq = self._proxima_seq(tokens, token)
+            self.store.registrar_acesso(token, em, seq)
+            self._aplicar({'op': 'acesso', 'token': token, 'em': em, 'seq': seq})
+            self._registrar_evento('acesso', token, em)
+
+    @cronometrar('sessao.registrar_download')
+    def registrar_download(self, token, foto, album=None, em=None):
+        with self.escrita() as tokens:
+            em = em or datetime.now().isoformat()
+            seq = self._proxima_seq(tokens, token)
+            self.store.registrar_download(token, em, seq)
+            self._aplicar({'op': 'download', 'token': token, 'em': em, 'seq': seq})
+            self._registrar_evento('download', token, em, foto=foto, album=album)
+
+    @staticmethod
+    def _proxima_seq(tokens, token):
+        """Número de sequência do próximo evento do token (lido sob a trava, sempre atual)"""
+        return (tokens.get(token) or {}).get('seq', 0) + 1
+
+    def _registrar_evento(self, tipo, token, em, **extras):
+        """Anexa o evento ao log e soma-o aos contadores diários"""
+        evento = self.log.registrar(tipo, token, em, **extras)
+        if self.rollups.carregar():
+            self.rollups.contar(evento, self._tokens.get(token))
+        else:
+            self.rollup()
+
+    @cronometrar('sessao.publicar')
+    def publicar(self):
+        with self.escrita():
+            publicado = self.store.publicar()
+            # O conteúdo não muda; só a assinatura dos arquivos
+            self._assinatura = self.store.assinatura()
+            if self._indice is not None:
+                self._indice.salvar(self._assinatura)
+        return publicado
+
+
+_sessao = None
+
+
+def obter_sessao():
+    """Sessão única do processo, criada (com os arquivos base) no primeiro uso"""
+    global _sessao
+    if _sessao is None:
+        sessao = SessaoTokens()
+        sessao.criar_arquivos_base()
+        _sessao = sessao
+    return _sessao
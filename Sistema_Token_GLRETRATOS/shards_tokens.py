@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+from armazenamento import escrever_json
+
+# Únicos campos de que a galeria precisa para validar o login
+CAMPOS_GALERIA = ('ativo', 'expira_em', 'pastas_permitidas', 'downloads_permitidos')
+
+
+def hash_token(token):
+    """Nome do shard: SHA-256 do token em hexadecimal (o mesmo que JS/auth.js calcula)"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def dados_shard(dados):
+    """Recorte público de um token, sem nome nem telefone do cliente"""
+    shard = {campo: dados.get(campo) for campo in CAMPOS_GALERIA}
+    if not shard['pastas_permitidas'] and dados.get('pasta'):
+        shard['pastas_permitidas'] = [dados['pasta']]
+    shard['pastas_permitidas'] = shard['pastas_permitidas'] or []
+    shard['downloads_permitidos'] = bool(shard['downloads_permitidos'])
+    return shard
+
+
+def arquivo_manifesto(pasta):
+    """Manifesto dos shards, fora da pasta publicada (``tokens/`` → ``tokens.manifesto.json``)"""
+    return f"{os.path.normpath(pasta)}.manifesto.json"
+
+
+def _ler_manifesto(pasta):
+    # Versões anteriores gravavam o manifesto dentro da pasta publicada
+    for caminho in (arquivo_manifesto(pasta), os.path.join(pasta, '_manifesto.json')):
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            continue
+    return {}
+
+
+def _gravar_manifesto(pasta, manifesto):
+    escrever_json(arquivo_manifesto(pasta), manifesto)
+    try:
+        os.remove(os.path.join(pasta, '_manifesto.json'))
+    except FileNotFoundError:
+        pass
+
+
+def _gravar_shard(pasta, token, dados, manifesto):
+    """Grava o shard de ``token`` se o conteúdo mudou; retorna (nome, gravou)"""
+    nome = hash_token(token)
+    conteudo = json.dumps(dados_shard(dados), sort_keys=True, separators=(',', ':'))
+    assinatura = hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+    caminho = os.path.join(pasta, f"{nome}.json")
+    if manifesto.get(nome) == assinatura and os.path.exists(caminho):
+        return nome, False
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+    manifesto[nome] = assinatura
+    return nome, True
+
+
+def _remover_shard(pasta, nome):
+    try:
+        os.remove(os.path.join(pasta, f"{nome}.json"))
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def exportar_shards(tokens, pasta='tokens'):
+    """Grava um arquivo pequeno por token em ``pasta/<sha256>.json``.
+
+    Só os shards cujo conteúdo mudou são regravados e os de tokens que
+    deixaram de existir são removidos; o manifesto (fora de ``pasta``,
+    para não publicar a lista de hashes) guarda o hash do conteúdo de
+    cada shard para evitar reler os arquivos.
+    Retorna (gravados, removidos).
+    """
+    os.makedirs(pasta, exist_ok=True)
+    manifesto = _ler_manifesto(pasta)
+    novo_manifesto = {}
+    gravados = 0
+    for token, dados in tokens.items():
+        nome, gravou = _gravar_shard(pasta, token, dados, manifesto)
+        novo_manifesto[nome] = manifesto[nome]
+        gravados += gravou
+
+    removidos = sum(_remover_shard(pasta, nome) for nome in set(manifesto) - set(novo_manifesto))
+    _gravar_manifesto(pasta, novo_manifesto)
+    return gravados, removidos
+
+
+def atualizar_shards(alterados, pasta='tokens'):
+    """Atualiza só os shards de ``alterados`` ({token: dados, ou None para remover}).
+
+    Chamado a cada criação, lote ou desativação, para que o login da
+    galeria acompanhe o backend sem esperar uma exportação completa.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    manifesto = _ler_manifesto(pasta)
+    mudou = False
+    for token, dados in alterados.items():
+        if dados is None:
+            nome = hash_token(token)
+            mudou |= manifesto.pop(nome, None) is not None
+            _remover_shard(pasta, nome)
+        else:
+            mudou |= _gravar_shard(pasta, token, dados, manifesto)[1]
+    if mudou:
+        _gravar_manifesto(pasta, manifesto)
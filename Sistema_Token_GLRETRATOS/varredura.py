@@ -0,0 +1,136 @@
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+DIAS_INATIVO_PADRAO = 90
+
+
+def arquivo_frio(arquivo_tokens):
+    return f"{os.path.splitext(arquivo_tokens)[0]}.arquivados.ndjson.gz"
+
+
+def inativo_desde(dados):
+    """Quando o token deixou de valer: desativação ou expiração, o que veio antes"""
+    return min(dados.get('desativado_em') or dados['expira_em'], dados['expira_em'])
+
+
+class ArquivoFrio:
+    """Tokens mortos fora do store principal, em NDJSON comprimido com gzip.
+
+    Cada varredura acrescenta um novo membro gzip ao fim do arquivo (nada
+    é reescrito) e a leitura percorre os membros em sequência, uma linha
+    por vez, sem carregar o arquivo inteiro.
+    """
+
+    def __init__(self, arquivo='tokens.arquivados.ndjson.gz'):
+        self.arquivo = arquivo
+
+    def anexar(self, tokens, em=None):
+        em = em or datetime.now().isoformat()
+        linhas = ''.join(
+            json.dumps({'token': token, 'arquivado_em': em, 'dados': dados},
+                       ensure_ascii=False, separators=(',', ':')) + '\n'
+            for token, dados in tokens.items()
+        )
+        with open(self.arquivo, 'ab') as bruto:
+            with gzip.GzipFile(fileobj=bruto, mode='wb') as f:
+                f.write(linhas.encode('utf-8'))
+            bruto.flush()
+            os.fsync(bruto.fileno())
+
+    def ler(self):
+        """Gera (token, dados, arquivado_em) na ordem em que foram arquivados"""
+        if not os.path.exists(self.arquivo):
+            return
+        with gzip.open(self.arquivo, 'rt', encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    registro = json.loads(linha)
+                    yield registro['token'], registro['dados'], registro['arquivado_em']
+
+    def obter(self, token):
+        """Última versão arquivada de um token, ou None"""
+        encontrado = None
+        for arquivado, dados, _ in self.ler():
+            if arquivado == token:
+                encontrado = dados
+        return encontrado
+
+    def tamanho(self):
+        return os.path.getsize(self.arquivo) if os.path.exists(self.arquivo) else 0
+
+
+def varrer(sessao, dias_inativo=DIAS_INATIVO_PADRAO, arquivo=None, agora=None, simular=False):
+    """Desativa os tokens vencidos e arquiva os inativos há mais de ``dias_inativo`` dias.
+
+    Os vencidos vêm do índice de expiração (busca binária, sem percorrer
+    todos). Tudo acontece sob a trava do backend: o arquivo frio é gravado
+    e sincronizado antes do store principal ser trocado pelos restantes,
+    então uma queda no meio pode repetir um token no arquivo, mas não perdê-lo.
+    """
+    agora = agora or datetime.now()
+    arquivo = arquivo or ArquivoFrio(arquivo_frio(sessao.arquivo_tokens))
+    limite = (agora - timedelta(days=dias_inativo)).isoformat()
+    em = agora.isoformat()
+
+    with sessao.escrita() as tokens:
+        vencidos = {token for _, token in sessao.indice_expiracao().vencidos(agora)}
+        restantes, arquivar = {}, {}
+        for token, dados in tokens.items():
+            if token in vencidos:
+                dados = dict(dados, ativo=False, desativado_em=em)
+            if not dados['ativo'] and inativo_desde(dados) < limite:
+                arquivar[token] = dados
+            else:
+                restantes[token] = dados
+        resultado = {
+            'quando': em,
+            'desativados': len(vencidos),
+            'arquivados': len(arquivar),
+            'restantes': len(restantes),
+            'arquivo': arquivo.arquivo,
+            'simulado': simular,
+        }
+        if simular or not (vencidos or arquivar):
+            return resultado
+        if arquivar:
+            arquivo.anexar(arquivar, em)
+        sessao.substituir(restantes)
+    return resultado
+
+
+def agendar(sessao, intervalo_horas=24.0, dias_inativo=DIAS_INATIVO_PADRAO, ao_varrer=None, vezes=None,
+            varrer=varrer):
+    """Roda ``varrer`` a cada ``intervalo_horas`` (para sempre, ou ``vezes`` vezes)"""
+    rodadas = 0
+    while vezes is None or rodadas < vezes:
+        resultado = varrer(sessao, dias_inativo)
+        if ao_varrer:
+            ao_varrer(resultado)
+        rodadas += 1
+        if vezes is None or rodadas < vezes:
+            time.sleep(intervalo_horas * 3600)
+
+
+def agregar_arquivados(arquivo):
+    """Totais por categoria dos tokens arquivados, lendo o arquivo frio em streaming"""
+    resumo = {'total': 0, 'acessos': 0, 'downloads': 0, 'categorias': {}}
+    vistos = set()
+    for token, dados, _ in arquivo.ler():
+        if token in vistos:  # repetido por uma varredura interrompida
+            continue
+        vistos.add(token)
+        acessos = dados.get('total_acessos', 0)
+        downloads = dados.get('total_downloads', 0)
+        categoria = resumo['categorias'].setdefault(dados['categoria'], {
+            'total': 0, 'ativos': 0, 'downloads': 0, 'acessos': 0
+        })
+        categoria['total'] += 1
+        categoria['acessos'] += acessos
+        categoria['downloads'] += downloads
+        resumo['total'] += 1
+        resumo['acessos'] += acessos
+        resumo['downloads'] += downloads
+    return resumo